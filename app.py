@@ -1,22 +1,14 @@
 import streamlit as st
 import sqlite3
-import pandas as pd
-import pickle
-import requests
-import json
-import plotly.express as px
-import plotly.graph_objects as go
 from datetime import datetime, timedelta
-import os
 from pathlib import Path
-import numpy as np
-import pickle
-
-with open('models/crop.pkl', 'rb') as file:
-    crop_model = pickle.load(file)
-
-with open('models/fertilizer.pkl', 'rb') as file:
-    fertilizer_model = pickle.load(file)
+from prediction_cache import FERTILIZER_RESOLUTION, cached_prediction, quantize, stats as prediction_cache_stats
+from model_registry import loaded_models
+from instrumentation import MODEL_SECONDS, PAGE_SECONDS, SQL_SECONDS, can_view_metrics, get_server, histograms, render, timed
+from database import get_pool, fetch_one, fetch_all, execute, read_sql
+from listings import BEST_MATCH, PAGE_SIZES, SORTS, fetch_page
+from price_alerts import DIRECTIONS, get_engine, user_alerts
+from orders import PLACED, PROCESSING, SOLD_OUT, STATUSES as ORDER_STATUSES, fetch_orders, place_order, transition
 
 # Page configuration
 st.set_page_config(
@@ -82,104 +74,19 @@ st.markdown("""
 </style>
 """, unsafe_allow_html=True)
 
-# Database setup
-DB_PATH = 'smart_agriculture.db'
-
-def init_database():
-    """Initialize the database with required tables"""
-    conn = sqlite3.connect(DB_PATH)
-    cursor = conn.cursor()
-    
-    # Users table
-    cursor.execute('''
-        CREATE TABLE IF NOT EXISTS users (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            name TEXT NOT NULL,
-            phone TEXT UNIQUE NOT NULL,
-            email TEXT,
-            location TEXT,
-            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-        )
-    ''')
-    
-    # Crops table
-    cursor.execute('''
-        CREATE TABLE IF NOT EXISTS crops (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            name TEXT NOT NULL,
-            description TEXT,
-            price REAL NOT NULL,
-            quantity INTEGER NOT NULL,
-            unit TEXT DEFAULT 'kg',
-            user_id INTEGER,
-            image_url TEXT,
-            category TEXT,
-            harvest_date DATE,
-            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-            FOREIGN KEY (user_id) REFERENCES users (id)
-        )
-    ''')
-    
-    # Orders table
-    cursor.execute('''
-        CREATE TABLE IF NOT EXISTS orders (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            crop_id INTEGER,
-            buyer_id INTEGER,
-            seller_id INTEGER,
-            quantity INTEGER,
-            total_price REAL,
-            status TEXT DEFAULT 'pending',
-            order_date TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-            FOREIGN KEY (crop_id) REFERENCES crops (id),
-            FOREIGN KEY (buyer_id) REFERENCES users (id),
-            FOREIGN KEY (seller_id) REFERENCES users (id)
-        )
-    ''')
-    
-    # Price history table
-    cursor.execute('''
-        CREATE TABLE IF NOT EXISTS price_history (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            crop_name TEXT NOT NULL,
-            price REAL NOT NULL,
-            market TEXT,
-            date DATE,
-            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-        )
-    ''')
-    
-    conn.commit()
-    conn.close()
-
-# Initialize database
-init_database()
-
-def predict_crop(N, P, K, temperature, humidity, ph, rainfall):
-    try:
-        input_data = np.array([[N, P, K, temperature, humidity, ph, rainfall]])
-        prediction = crop_model.predict(input_data)
-        return prediction[0]
-    except Exception as e:
-        return f"Error in prediction: {str(e)}"
-
+@timed(MODEL_SECONDS, model='fertilizer')
 def predict_fertilizer(N, P, K, crop, soil_type, temperature, humidity, moisture):
     """
     Predict fertilizer using trained model.
     """
+    from fast_inference import get_fertilizer_predictor
+    
+    inputs = {'N': N, 'P': P, 'K': K, 'crop': crop, 'soil_type': soil_type,
+              'temperature': temperature, 'humidity': humidity, 'moisture': moisture}
     try:
-        input_data = pd.DataFrame([{
-            'Temparature': temperature,      # Exact spelling from CSV
-            'Humidity ': humidity,           # Note: trailing space
-            'Moisture': moisture,
-            'Soil Type': soil_type,
-            'Crop Type': crop,
-            'Nitrogen': N,
-            'Potassium': K,
-            'Phosphorous': P
-        }])
-        prediction = fertilizer_model.predict(input_data)
-        return prediction[0]
+        # Same result as the pickled pipeline, without building a DataFrame per call
+        return cached_prediction('fertilizer', inputs, FERTILIZER_RESOLUTION,
+                                 lambda: str(get_fertilizer_predictor().predict_one(*quantize(inputs, FERTILIZER_RESOLUTION))))
     except Exception as e:
         return f"Prediction error: {str(e)}"
 
@@ -195,49 +102,71 @@ if 'user_name' not in st.session_state:
 # Authentication functions
 def login_user(phone):
     """Login user with phone number"""
-    conn = sqlite3.connect(DB_PATH)
-    cursor = conn.cursor()
-    cursor.execute("SELECT * FROM users WHERE phone = ?", (phone,))
-    user = cursor.fetchone()
-    conn.close()
-    return user
+    return fetch_one("SELECT * FROM users WHERE phone = ?", (phone,))
 
 def register_user(name, phone, email="", location=""):
     """Register new user"""
-    conn = sqlite3.connect(DB_PATH)
-    cursor = conn.cursor()
     try:
-        cursor.execute("INSERT INTO users (name, phone, email, location) VALUES (?, ?, ?, ?)",
-                      (name, phone, email, location))
-        conn.commit()
-        user_id = cursor.lastrowid
-        conn.close()
-        return user_id
+        cursor = execute("INSERT INTO users (name, phone, email, location) VALUES (?, ?, ?, ?)",
+                         (name, phone, email, location))
+        return cursor.lastrowid
     except sqlite3.IntegrityError:
-        conn.close()
         return None
 
+def get_stats(user_id):
+    """Return (global, user) counters from the trigger-maintained stats table"""
+    empty = {'listings': 0, 'purchases': 0, 'sales': 0, 'earnings': 0, 'users': 0}
+    with get_pool().connection() as conn:
+        cursor = conn.cursor()
+        cursor.row_factory = sqlite3.Row
+        rows = {row['user_id']: dict(row) for row in cursor.execute(
+            "SELECT * FROM stats WHERE user_id IN (0, ?)", (user_id,))}
+    return rows.get(0, empty), rows.get(user_id, empty)
+
 # Weather API function
 def get_weather_data(lat, lon):
-    """Get weather data from OpenWeatherMap API"""
-    api_key = "7e8545f84e0a5f340abc6b9f0e78ef8a"  # Your API key
-    url = f"https://api.openweathermap.org/data/2.5/weather?lat={lat}&lon={lon}&appid={api_key}&units=metric"
+    """Get weather data from OpenWeatherMap API, through the shared weather cache"""
+    from weather import get_weather
     
-    try:
-        response = requests.get(url, timeout=5)
-        if response.status_code == 200:
-            return response.json()
-    except:
-        pass
-    return None
+    return get_weather(lat, lon)
+
+# Pagination helpers
+def page_cursor(key, filters):
+    """Return the keyset cursor of the page currently shown for a feed"""
+    state = st.session_state.get(key)
+    if state is None or state['filters'] != filters:
+        # New filters start again from the first page
+        state = st.session_state[key] = {'filters': filters, 'cursors': [None]}
+    return state['cursors'][-1]
+
+def show_pager(key, next_cursor):
+    """Display previous/next controls for a feed paginated with page_cursor"""
+    cursors = st.session_state[key]['cursors']
+    col1, col2, col3 = st.columns([1, 2, 1])
+    with col1:
+        if st.button("⬅️ Previous", key=f"{key}_prev", disabled=len(cursors) == 1):
+            cursors.pop()
+            st.rerun()
+    with col2:
+        st.caption(f"Page {len(cursors)}")
+    with col3:
+        if st.button("Next ➡️", key=f"{key}_next", disabled=next_cursor is None):
+            cursors.append(next_cursor)
+            st.rerun()
 
 # Main application
 def main():
+    # Price alerts are matched in the background whichever page is open
+    get_engine()
+    # Serves /metrics when instrumentation and a metrics port are configured
+    get_server()
+    
     if not st.session_state.logged_in:
         show_login_page()
     else:
         show_main_app()
 
+@timed(PAGE_SECONDS)
 def show_login_page():
     """Display login/registration page"""
     st.markdown('<h1 class="main-header">🌾 Smart Agriculture Platform</h1>', unsafe_allow_html=True)
@@ -282,6 +211,7 @@ def show_login_page():
                 else:
                     st.error("Please fill in required fields")
 
+@timed(PAGE_SECONDS)
 def show_main_app():
     """Display main application interface"""
     # Sidebar navigation
@@ -301,6 +231,11 @@ def show_main_app():
             st.session_state.user_name = None
             st.rerun()
     
+    # Hidden page, only reachable by URL while instrumentation is on, for admins
+    if st.query_params.get("page") == "metrics" and can_view_metrics(st.session_state.user_id):
+        show_metrics()
+        return
+    
     # Main content based on selected menu
     if menu == "🏠 Dashboard":
         show_dashboard()
@@ -319,27 +254,17 @@ def show_main_app():
     elif menu == "👤 Profile":
         show_profile()
 
+@timed(PAGE_SECONDS)
 def show_dashboard():
     """Display dashboard with overview"""
     st.markdown('<h1 class="main-header">🏠 Dashboard</h1>', unsafe_allow_html=True)
     
     # Get statistics
-    conn = sqlite3.connect(DB_PATH)
-    cursor = conn.cursor()
-    
-    cursor.execute("SELECT COUNT(*) FROM crops")
-    total_crops = cursor.fetchone()[0]
-    
-    cursor.execute("SELECT COUNT(*) FROM orders")
-    total_orders = cursor.fetchone()[0]
-    
-    cursor.execute("SELECT COUNT(*) FROM users")
-    total_users = cursor.fetchone()[0]
-    
-    cursor.execute("SELECT COUNT(*) FROM crops WHERE user_id = ?", (st.session_state.user_id,))
-    my_crops = cursor.fetchone()[0]
-    
-    conn.close()
+    totals, mine = get_stats(st.session_state.user_id)
+    total_crops = totals['listings']
+    total_orders = totals['sales']
+    total_users = totals['users']
+    my_crops = mine['listings']
     
     # Metrics row
     col1, col2, col3, col4 = st.columns(4)
@@ -383,21 +308,20 @@ def show_dashboard():
     st.markdown("---")
     
     st.subheader("📈 Recent Market Activity")
-    conn = sqlite3.connect(DB_PATH)
-    recent_crops = pd.read_sql_query("""
+    recent_crops = read_sql("""
         SELECT c.name, c.price, c.quantity, u.name as seller, c.created_at
         FROM crops c 
         JOIN users u ON c.user_id = u.id 
         ORDER BY c.created_at DESC 
         LIMIT 5
-    """, conn)
-    conn.close()
+    """)
     
     if not recent_crops.empty:
         st.dataframe(recent_crops, use_container_width=True)
     else:
         st.info("No recent activity")
 
+@timed(PAGE_SECONDS)
 def show_marketplace():
     """Display marketplace for buying/selling crops"""
     st.markdown('<h1 class="main-header">🛒 Marketplace</h1>', unsafe_allow_html=True)
@@ -408,47 +332,35 @@ def show_marketplace():
         st.subheader("Available Crops")
         
         # Filters
-        col1, col2, col3 = st.columns(3)
+        col1, col2, col3, col4 = st.columns([3, 2, 2, 1])
         with col1:
-            search_term = st.text_input("🔍 Search crops", placeholder="Enter crop name...")
+            search_term = st.text_input("🔍 Search crops", placeholder="Search name, description or category...")
         with col2:
             category_filter = st.selectbox("📂 Category", ["All", "Grains", "Vegetables", "Fruits", "Pulses"])
         with col3:
-            sort_by = st.selectbox("🔢 Sort by", ["Price (Low to High)", "Price (High to Low)", "Newest", "Quantity"])
-        
-        # Get crops from database
-        conn = sqlite3.connect(DB_PATH)
-        query = """
-            SELECT c.*, u.name as seller_name, u.phone as seller_phone 
-            FROM crops c 
-            JOIN users u ON c.user_id = u.id 
-            WHERE c.user_id != ?
-        """
-        params = [st.session_state.user_id]
-        
-        if search_term:
-            query += " AND c.name LIKE ?"
-            params.append(f"%{search_term}%")
-        
-        if category_filter != "All":
-            query += " AND c.category = ?"
-            params.append(category_filter)
+            sort_options = list(SORTS)
+            if search_term:
+                sort_options.insert(0, BEST_MATCH)
+            sort_by = st.selectbox("🔢 Sort by", sort_options)
+        with col4:
+            page_size = st.selectbox("📄 Per page", PAGE_SIZES)
         
-        # Apply sorting
-        if sort_by == "Price (Low to High)":
-            query += " ORDER BY c.price ASC"
-        elif sort_by == "Price (High to Low)":
-            query += " ORDER BY c.price DESC"
-        elif sort_by == "Newest":
-            query += " ORDER BY c.created_at DESC"
-        else:
-            query += " ORDER BY c.quantity DESC"
-        
-        crops_df = pd.read_sql_query(query, conn, params=params)
-        conn.close()
+        # Get one page of crops from database
+        filters = (search_term, category_filter, sort_by, page_size)
+        with get_pool().connection() as conn:
+            crops, next_cursor = fetch_page(
+                conn,
+                sort=sort_by,
+                after=page_cursor("buy_page", filters),
+                page_size=page_size,
+                exclude_user=st.session_state.user_id,
+                in_stock=True,
+                search_term=search_term,
+                category=None if category_filter == "All" else category_filter,
+            )
         
-        if not crops_df.empty:
-            for _, crop in crops_df.iterrows():
+        if crops:
+            for crop in crops:
                 with st.container():
                     st.markdown(f"""
                     <div class="crop-card">
@@ -471,26 +383,23 @@ def show_marketplace():
                         )
                     with col3:
                         if st.button(f"🛒 Buy", key=f"buy_{crop['id']}"):
-                            # Create order
-                            conn = sqlite3.connect(DB_PATH)
-                            cursor = conn.cursor()
-                            total_price = quantity_to_buy * crop['price']
-                            cursor.execute("""
-                                INSERT INTO orders (crop_id, buyer_id, seller_id, quantity, total_price)
-                                VALUES (?, ?, ?, ?, ?)
-                            """, (crop['id'], st.session_state.user_id, crop['user_id'], quantity_to_buy, total_price))
-                            
-                            # Update crop quantity
-                            new_quantity = crop['quantity'] - quantity_to_buy
-                            cursor.execute("UPDATE crops SET quantity = ? WHERE id = ?", (new_quantity, crop['id']))
+                            result = place_order(st.session_state.user_id, int(crop['id']), int(quantity_to_buy))
                             
-                            conn.commit()
-                            conn.close()
-                            
-                            st.success(f"Order placed successfully! Total: ${total_price}")
-                            st.rerun()
+                            if result.status == PLACED:
+                                st.success(f"Order placed successfully! Total: ${result.total_price}")
+                                st.rerun()
+                            elif result.status == PROCESSING:
+                                st.warning("Order is still being processed, check My Orders")
+                            elif result.status == SOLD_OUT and result.remaining:
+                                st.error(f"Only {result.remaining} {crop['unit']} left, please order less")
+                            elif result.status == SOLD_OUT:
+                                st.error("Sorry, this crop has just sold out")
+                            else:
+                                st.error("This listing is no longer available")
                     
                     st.markdown("---")
+            
+            show_pager("buy_page", next_cursor)
         else:
             st.info("No crops available for purchase")
     
@@ -516,14 +425,10 @@ def show_marketplace():
             
             if submitted:
                 if crop_name and price > 0 and quantity > 0:
-                    conn = sqlite3.connect(DB_PATH)
-                    cursor = conn.cursor()
-                    cursor.execute("""
+                    execute("""
                         INSERT INTO crops (name, description, price, quantity, unit, user_id, image_url, category, harvest_date)
                         VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
                     """, (crop_name, description, price, quantity, unit, st.session_state.user_id, image_url, category, harvest_date))
-                    conn.commit()
-                    conn.close()
                     
                     st.success("Crop listing added successfully!")
                     st.rerun()
@@ -534,14 +439,15 @@ def show_marketplace():
         st.subheader("My Crop Listings")
         
         # Show user's crops
-        conn = sqlite3.connect(DB_PATH)
-        my_crops_df = pd.read_sql_query("""
-            SELECT * FROM crops WHERE user_id = ? ORDER BY created_at DESC
-        """, conn, params=[st.session_state.user_id])
-        conn.close()
+        with get_pool().connection() as conn:
+            my_crops, my_next_cursor = fetch_page(
+                conn,
+                after=page_cursor("my_listings_page", ()),
+                owner=st.session_state.user_id,
+            )
         
-        if not my_crops_df.empty:
-            for _, crop in my_crops_df.iterrows():
+        if my_crops:
+            for crop in my_crops:
                 col1, col2, col3 = st.columns([3, 1, 1])
                 
                 with col1:
@@ -553,11 +459,7 @@ def show_marketplace():
                 
                 with col3:
                     if st.button("🗑️ Delete", key=f"delete_{crop['id']}"):
-                        conn = sqlite3.connect(DB_PATH)
-                        cursor = conn.cursor()
-                        cursor.execute("DELETE FROM crops WHERE id = ?", (crop['id'],))
-                        conn.commit()
-                        conn.close()
+                        execute("DELETE FROM crops WHERE id = ?", (int(crop['id']),))
                         st.success("Crop deleted successfully!")
                         st.rerun()
                 
@@ -571,13 +473,9 @@ def show_marketplace():
                         col_save, col_cancel = st.columns(2)
                         with col_save:
                             if st.form_submit_button("💾 Save"):
-                                conn = sqlite3.connect(DB_PATH)
-                                cursor = conn.cursor()
-                                cursor.execute("""
+                                execute("""
                                     UPDATE crops SET price = ?, quantity = ?, description = ? WHERE id = ?
-                                """, (new_price, new_quantity, new_description, crop['id']))
-                                conn.commit()
-                                conn.close()
+                                """, (new_price, new_quantity, new_description, int(crop['id'])))
                                 
                                 st.session_state[f"editing_{crop['id']}"] = False
                                 st.success("Crop updated successfully!")
@@ -587,37 +485,54 @@ def show_marketplace():
                             if st.form_submit_button("❌ Cancel"):
                                 st.session_state[f"editing_{crop['id']}"] = False
                                 st.rerun()
+            
+            show_pager("my_listings_page", my_next_cursor)
         else:
             st.info("You haven't listed any crops yet")
 
+@timed(PAGE_SECONDS)
 def show_price_comparison():
     """Display price comparison and market trends"""
+    import pandas as pd
+    import plotly.express as px
+    from price_analytics import ROLLING_WINDOW, market_prices, price_summary, price_trends, refresh_rollup
+    
     st.markdown('<h1 class="main-header">📊 Price Comparison</h1>', unsafe_allow_html=True)
     
-    # Sample data for demonstration
-    sample_data = {
-        'Rice': {'current': 45, 'last_week': 42, 'last_month': 40},
-        'Wheat': {'current': 35, 'last_week': 36, 'last_month': 32},
-        'Maize': {'current': 28, 'last_week': 30, 'last_month': 26},
-        'Cotton': {'current': 85, 'last_week': 82, 'last_month': 80},
-        'Sugarcane': {'current': 15, 'last_week': 15, 'last_month': 14},
-    }
+    with get_pool().connection() as conn:
+        refresh_rollup(conn)
+        summary = price_summary(conn)
+    
+    if summary.empty:
+        st.info("No market price data yet")
+        return
+    
+    crop_names = summary['crop_name'].tolist()
     
     # Current prices comparison
     st.subheader("💰 Current Market Prices ($/kg)")
     
+    shown = st.multiselect("Crops", crop_names, default=crop_names[:5])
+    shown_summary = summary[summary['crop_name'].isin(shown)]
+    
     cols = st.columns(5)
-    for i, (crop, prices) in enumerate(sample_data.items()):
+    for i, prices in enumerate(shown_summary.itertuples()):
         with cols[i % 5]:
-            change = prices['current'] - prices['last_week']
-            change_color = "green" if change >= 0 else "red"
-            arrow = "↗️" if change >= 0 else "↘️"
+            if pd.isna(prices.week_change):
+                change_text = "No price a week earlier"
+                change_color = "gray"
+            else:
+                change_color = "green" if prices.week_change >= 0 else "red"
+                arrow = "↗️" if prices.week_change >= 0 else "↘️"
+                change_text = f"{arrow} ${abs(prices.week_change):.2f} from last week"
+            month_text = "" if pd.isna(prices.month_change_pct) else f"{prices.month_change_pct:+.1f}% vs last month"
             
             st.markdown(f"""
             <div style="background: white; padding: 1rem; border-radius: 10px; text-align: center; border: 1px solid #ddd;">
-                <h4>{crop}</h4>
-                <h2 style="color: #2E8B57;">${prices['current']}</h2>
-                <p style="color: {change_color};">{arrow} ${abs(change)} from last week</p>
+                <h4>{prices.crop_name}</h4>
+                <h2 style="color: #2E8B57;">${prices.current:.2f}</h2>
+                <p style="color: {change_color};">{change_text}</p>
+                <p style="color: gray;">{month_text}</p>
             </div>
             """, unsafe_allow_html=True)
     
@@ -626,128 +541,190 @@ def show_price_comparison():
     # Price trend chart
     st.subheader("📈 Price Trends (Last 30 Days)")
     
-    # Generate sample trend data
-    import numpy as np
-    dates = pd.date_range(start='2024-01-01', end='2024-01-30', freq='D')
-    
-    trend_data = {}
-    for crop in sample_data.keys():
-        base_price = sample_data[crop]['current']
-        # Generate realistic price fluctuations
-        prices = base_price + np.random.normal(0, 2, len(dates))
-        trend_data[crop] = prices
-    
-    trend_df = pd.DataFrame(trend_data, index=dates)
-    
-    fig = px.line(trend_df, x=trend_df.index, y=trend_df.columns, 
-                  title="Crop Price Trends", 
-                  labels={'index': 'Date', 'value': 'Price ($/kg)'})
-    st.plotly_chart(fig, use_container_width=True)
+    if shown:
+        with get_pool().connection() as conn:
+            trend_df = price_trends(conn, shown)
+        
+        trend_long = pd.concat([
+            trend_df.assign(series='Daily average', price=trend_df['avg_price']),
+            trend_df.assign(series=f'{ROLLING_WINDOW}-day mean', price=trend_df['rolling_mean']),
+        ])
+        fig = px.line(trend_long, x='date', y='price', color='crop_name', line_dash='series',
+                      title="Crop Price Trends",
+                      labels={'date': 'Date', 'price': 'Price ($/kg)', 'crop_name': 'Crop', 'series': ''})
+        st.plotly_chart(fig, use_container_width=True)
+    else:
+        st.info("Select crops to see their price trends")
     
     # Regional price comparison
     st.subheader("🌍 Regional Price Comparison")
     
-    regions = ['Tbilisi', 'Kutaisi', 'Puti', 'Batumi', 'Signagi']
-    selected_crop = st.selectbox("Select Crop for Regional Comparison", list(sample_data.keys()))
+    selected_crop = st.selectbox("Select Crop for Regional Comparison", crop_names)
     
-    regional_prices = {
-        'Region': regions,
-        'Price ($/kg)': [sample_data[selected_crop]['current'] + np.random.randint(-5, 6) for _ in regions]
-    }
+    with get_pool().connection() as conn:
+        regional_df = market_prices(conn, selected_crop)
     
-    regional_df = pd.DataFrame(regional_prices)
+    regional_df = regional_df.rename(columns={'market': 'Region', 'price': 'Price ($/kg)'})
     
     fig_bar = px.bar(regional_df, x='Region', y='Price ($/kg)', 
                      title=f"{selected_crop} Prices Across Regions",
-                     color='Price ($/kg)', color_continuous_scale='Viridis')
+                     color='Price ($/kg)', color_continuous_scale='Viridis',
+                     hover_data=['date', 'spread'])
     st.plotly_chart(fig_bar, use_container_width=True)
     
+    if len(regional_df) > 1:
+        col1, col2 = st.columns(2)
+        with col1:
+            st.metric("Cheapest Market", regional_df['Region'].iloc[0], f"${regional_df['Price ($/kg)'].iloc[0]:.2f}")
+        with col2:
+            spread = regional_df['Price ($/kg)'].iloc[-1] - regional_df['Price ($/kg)'].iloc[0]
+            st.metric("Market Spread", f"${spread:.2f}")
+    
     # Price alerts
     st.subheader("🔔 Price Alerts")
     
+    engine = get_engine()
+    
     col1, col2 = st.columns(2)
     with col1:
-        alert_crop = st.selectbox("Crop", list(sample_data.keys()), key="alert_crop")
+        alert_crop = st.selectbox("Crop", crop_names, key="alert_crop")
         target_price = st.number_input("Target Price ($/kg)", min_value=1.0, step=0.1)
-        alert_type = st.selectbox("Alert Type", ["Price Drop Below", "Price Rise Above"])
+        alert_type = st.selectbox("Alert Type", list(DIRECTIONS))
+        
+        if st.button("🔔 Set Price Alert"):
+            engine.create_alert(st.session_state.user_id, alert_crop, DIRECTIONS[alert_type], target_price)
+            st.success(f"Alert set for {alert_crop} when {alert_type.lower()} ${target_price}")
     
     with col2:
         st.write("### Current Alerts")
-        st.info("No active price alerts set")
+        alerts = user_alerts(st.session_state.user_id)
+        active = [alert for alert in alerts if alert[4] == 'active']
+        triggered = [alert for alert in alerts if alert[4] == 'triggered']
+        
+        if not active:
+            st.info("No active price alerts set")
+        for alert_id, crop, direction, threshold, _, created_at, _, _, _ in active:
+            alert_col1, alert_col2 = st.columns([3, 1])
+            with alert_col1:
+                st.write(f"**{crop}** {direction} ${threshold:.2f}")
+            with alert_col2:
+                if st.button("Cancel", key=f"cancel_alert_{alert_id}"):
+                    engine.cancel_alert(alert_id, st.session_state.user_id)
+                    st.rerun()
         
-    if st.button("🔔 Set Price Alert"):
-        st.success(f"Alert set for {alert_crop} when price {alert_type.lower()} ${target_price}")
+        if triggered:
+            st.write("### Triggered Alerts")
+            for _, crop, direction, threshold, _, _, triggered_at, price, market in triggered[:10]:
+                st.warning(f"{crop} went {direction} ${threshold:.2f}: ${price:.2f} at {market or 'unknown market'} ({triggered_at})")
 
+@timed(PAGE_SECONDS)
 def show_weather():
     """Display weather information"""
+    import numpy as np
+    import pandas as pd
+    from weather import fetch_many, parse_locations
+    
     st.markdown('<h1 class="main-header">🌤️ Weather Information</h1>', unsafe_allow_html=True)
     
-    # Location input
-    col1, col2 = st.columns(2)
-    with col1:
-        latitude = st.number_input("🌐 Latitude", value=28.6139, format="%.4f")
-    with col2:
-        longitude = st.number_input("🌐 Longitude", value=77.2090, format="%.4f")
+    tab1, tab2 = st.tabs(["📍 Single Location", "🚜 Farm Fleet"])
+    
+    with tab1:
+        # Location input
+        col1, col2 = st.columns(2)
+        with col1:
+            latitude = st.number_input("🌐 Latitude", value=28.6139, format="%.4f")
+        with col2:
+            longitude = st.number_input("🌐 Longitude", value=77.2090, format="%.4f")
     
-    if st.button("🔍 Get Weather Data"):
-        weather_data = get_weather_data(latitude, longitude)
+        if st.button("🔍 Get Weather Data"):
+            weather_data = get_weather_data(latitude, longitude)
         
-        if weather_data:
-            # Current weather
-            st.subheader("🌡️ Current Weather")
+            if weather_data:
+                # Current weather
+                st.subheader("🌡️ Current Weather")
             
-            col1, col2, col3, col4 = st.columns(4)
+                col1, col2, col3, col4 = st.columns(4)
             
-            with col1:
-                st.metric("Temperature", f"{weather_data['main']['temp']:.1f}°C", 
-                         f"Feels like {weather_data['main']['feels_like']:.1f}°C")
+                with col1:
+                    st.metric("Temperature", f"{weather_data['main']['temp']:.1f}°C", 
+                             f"Feels like {weather_data['main']['feels_like']:.1f}°C")
             
-            with col2:
-                st.metric("Humidity", f"{weather_data['main']['humidity']}%")
+                with col2:
+                    st.metric("Humidity", f"{weather_data['main']['humidity']}%")
             
-            with col3:
-                st.metric("Pressure", f"{weather_data['main']['pressure']} hPa")
+                with col3:
+                    st.metric("Pressure", f"{weather_data['main']['pressure']} hPa")
             
-            with col4:
-                st.metric("Wind Speed", f"{weather_data['wind']['speed']} m/s")
+                with col4:
+                    st.metric("Wind Speed", f"{weather_data['wind']['speed']} m/s")
             
-            # Weather description
-            st.markdown(f"""
-            <div class="success-box">
-                <h4>☁️ {weather_data['weather'][0]['description'].title()}</h4>
-                <p>Location: {weather_data['name']}</p>
-            </div>
-            """, unsafe_allow_html=True)
+                # Weather description
+                st.markdown(f"""
+                <div class="success-box">
+                    <h4>☁️ {weather_data['weather'][0]['description'].title()}</h4>
+                    <p>Location: {weather_data['name']}</p>
+                </div>
+                """, unsafe_allow_html=True)
             
-            # Agricultural recommendations based on weather
-            st.subheader("🌾 Agricultural Recommendations")
+                # Agricultural recommendations based on weather
+                st.subheader("🌾 Agricultural Recommendations")
             
-            temp = weather_data['main']['temp']
-            humidity = weather_data['main']['humidity']
+                temp = weather_data['main']['temp']
+                humidity = weather_data['main']['humidity']
             
-            recommendations = []
+                recommendations = []
             
-            if temp > 35:
-                recommendations.append("🔥 High temperature alert! Ensure adequate irrigation.")
-            elif temp < 10:
-                recommendations.append("🥶 Low temperature warning! Protect crops from frost.")
+                if temp > 35:
+                    recommendations.append("🔥 High temperature alert! Ensure adequate irrigation.")
+                elif temp < 10:
+                    recommendations.append("🥶 Low temperature warning! Protect crops from frost.")
             
-            if humidity > 80:
-                recommendations.append("💧 High humidity detected! Monitor for fungal diseases.")
-            elif humidity < 30:
-                recommendations.append("🏜️ Low humidity! Increase irrigation frequency.")
+                if humidity > 80:
+                    recommendations.append("💧 High humidity detected! Monitor for fungal diseases.")
+                elif humidity < 30:
+                    recommendations.append("🏜️ Low humidity! Increase irrigation frequency.")
             
-            if weather_data.get('rain'):
-                recommendations.append("🌧️ Rain expected! Good for crop growth but monitor for waterlogging.")
+                if weather_data.get('rain'):
+                    recommendations.append("🌧️ Rain expected! Good for crop growth but monitor for waterlogging.")
             
-            if not recommendations:
-                recommendations.append("✅ Weather conditions are favorable for farming!")
+                if not recommendations:
+                    recommendations.append("✅ Weather conditions are favorable for farming!")
             
-            for rec in recommendations:
-                st.info(rec)
+                for rec in recommendations:
+                    st.info(rec)
         
-        else:
-            st.error("Unable to fetch weather data. Please check your coordinates or try again later.")
+            else:
+                st.error("Unable to fetch weather data. Please check your coordinates or try again later.")
+    
+    with tab2:
+        st.subheader("Weather for many plots at once")
+        locations_text = st.text_area(
+            "📋 Locations (one per line: 'lat, lon' or a place name)",
+            placeholder="28.6139, 77.2090\n19.0760, 72.8777\nHyderabad",
+            height=150,
+        )
+        include_users = st.checkbox("Include every registered user's location")
+        
+        if st.button("🔄 Refresh Fleet Weather"):
+            locations = parse_locations(locations_text)
+            if include_users:
+                rows = fetch_all("SELECT DISTINCT location FROM users WHERE TRIM(IFNULL(location, '')) != ''")
+                locations.extend(row[0] for row in rows)
+            
+            if locations:
+                with st.spinner(f"Fetching weather for {len(locations)} locations..."):
+                    fleet_df = fetch_many(locations)
+                
+                sources = fleet_df['source'].value_counts()
+                col1, col2, col3 = st.columns(3)
+                col1.metric("Locations", len(fleet_df))
+                col2.metric("From Cache", int(sources.get('cache', 0)))
+                col3.metric("Failed", int(sources.get('error', 0)))
+                
+                st.dataframe(fleet_df, use_container_width=True)
+                st.download_button("📥 Download CSV", fleet_df.to_csv(index=False), "fleet_weather.csv", "text/csv")
+            else:
+                st.error("Please enter at least one location")
     
     # 7-day forecast (mock data)
     st.subheader("📅 7-Day Forecast")
@@ -771,12 +748,20 @@ def show_weather():
     forecast_df = pd.DataFrame(forecast_data)
     st.dataframe(forecast_df, use_container_width=True)
 
+@timed(PAGE_SECONDS)
 def show_crop_recommendation():
     """Display crop recommendation system"""
+    from recommendation import crop_guide, suggest
+    
     st.markdown('<h1 class="main-header">🌱 Crop Recommendation</h1>', unsafe_allow_html=True)
     
     st.info("Get personalized crop recommendations based on soil and climate conditions")
     
+    mode = st.radio("Mode", ["🧪 Single Field", "📄 Batch Upload"], horizontal=True, label_visibility="collapsed")
+    if mode == "📄 Batch Upload":
+        show_batch_crop_recommendation()
+        return
+    
     with st.form("crop_recommendation_form"):
         st.subheader("🧪 Soil Parameters")
         
@@ -798,10 +783,16 @@ def show_crop_recommendation():
         submitted = st.form_submit_button("🔍 Get Recommendation")
         
         if submitted:
-            # Get crop prediction
-            recommended_crop = predict_crop(nitrogen, phosphorus, potassium, temperature, humidity, ph, rainfall)
+            # One predict_proba call ranks the pick and its alternatives
+            try:
+                suggestions = suggest(nitrogen, phosphorus, potassium, temperature, humidity, ph, rainfall)
+            except Exception as e:
+                st.error(f"Error in prediction: {str(e)}")
+                return
+            recommended_crop, confidence = suggestions[0]
             
             st.success(f"### Recommended Crop: {recommended_crop}")
+            st.caption(f"Model confidence: {confidence:.0%}")
             
             # Display reasoning
             st.subheader("📋 Analysis Summary")
@@ -822,43 +813,9 @@ def show_crop_recommendation():
                 st.write(f"- Rainfall: {rainfall}mm")
             
             # Crop details
-            crop_info = {
-                'Rice': {
-                    'season': 'Kharif (June-November)',
-                    'water_req': 'High (1200-1800mm)',
-                    'soil_type': 'Clay loam, well-drained',
-                    'tips': 'Ensure proper water management and pest control'
-                },
-                'Wheat': {
-                    'season': 'Rabi (November-April)', 
-                    'water_req': 'Moderate (400-600mm)',
-                    'soil_type': 'Well-drained loamy soil',
-                    'tips': 'Plant after monsoon, ensure proper fertilization'
-                },
-                'Cotton': {
-                    'season': 'Kharif (April-December)',
-                    'water_req': 'Moderate (500-800mm)', 
-                    'soil_type': 'Deep, well-drained black soil',
-                    'tips': 'Monitor for bollworm attacks, proper spacing'
-                },
-                'Maize': {
-                    'season': 'Kharif & Rabi',
-                    'water_req': 'Moderate (500-800mm)',
-                    'soil_type': 'Well-drained fertile soil',
-                    'tips': 'Ensure proper seed spacing and weed control'
-                },
-                'Sugarcane': {
-                    'season': 'Year-round',
-                    'water_req': 'High (1500-2500mm)',
-                    'soil_type': 'Deep, fertile, well-drained soil',
-                    'tips': 'Requires consistent water supply and fertilization'
-                }
-            }
-            
-            if recommended_crop in crop_info:
-                info = crop_info[recommended_crop]
-                
-                st.subheader(f"🌾 {recommended_crop} Cultivation Guide")
+            info = crop_guide().get(recommended_crop)
+            if info is not None:
+                st.subheader(f"🌾 {recommended_crop.title()} Cultivation Guide")
                 
                 col1, col2 = st.columns(2)
                 with col1:
@@ -877,21 +834,80 @@ def show_crop_recommendation():
             
             # Alternative crops
             st.subheader("🔄 Alternative Recommendations")
-            alternatives = ['Rice', 'Wheat', 'Cotton', 'Maize', 'Barley', 'Potato']
-            alternatives = [crop for crop in alternatives if crop != recommended_crop][:3]
-            
-            cols = st.columns(3)
-            for i, alt_crop in enumerate(alternatives):
-                with cols[i]:
-                    st.markdown(f"""
-                    <div style="background: #f0f8f0; padding: 1rem; border-radius: 10px; text-align: center;">
-                        <h4>{alt_crop}</h4>
-                        <p>Suitability: {np.random.randint(70, 90)}%</p>
-                    </div>
-                    """, unsafe_allow_html=True)
+            alternatives = suggestions[1:]
+            if not alternatives:
+                st.info("The model sees no other crop as suitable for these conditions")
+            else:
+                cols = st.columns(len(alternatives))
+                for col, (alt_crop, probability) in zip(cols, alternatives):
+                    with col:
+                        st.markdown(f"""
+                        <div style="background: #f0f8f0; padding: 1rem; border-radius: 10px; text-align: center;">
+                            <h4>{alt_crop}</h4>
+                            <p>Suitability: {probability:.0%}</p>
+                        </div>
+                        """, unsafe_allow_html=True)
+
+@timed(PAGE_SECONDS)
+def show_batch_crop_recommendation():
+    """Recommend crops for every field in an uploaded soil-lab sheet"""
+    import plotly.express as px
+    from recommendation import read_sheet, recommend_batch, template as recommendation_template
+    
+    st.subheader("📄 Soil-Lab Sheet")
+    st.write("Upload a CSV or Excel file with one field per row and the columns "
+             "N, P, K, temperature, humidity, ph and rainfall.")
+    
+    st.download_button(
+        "📥 Download Template",
+        recommendation_template().to_csv(index=False),
+        file_name="crop_recommendation_template.csv",
+        mime="text/csv",
+    )
+    
+    uploaded = st.file_uploader("Soil-lab sheet", type=["csv", "xlsx", "xls"])
+    if uploaded is None:
+        return
+    
+    try:
+        results = recommend_batch(read_sheet(uploaded, uploaded.name))
+    except ValueError as e:
+        st.error(f"Could not read {uploaded.name}: {e}")
+        return
+    
+    scored = results['error'].isna()
+    col1, col2, col3 = st.columns(3)
+    with col1:
+        st.metric("Fields", len(results))
+    with col2:
+        st.metric("Recommended", int(scored.sum()))
+    with col3:
+        st.metric("Rows with Errors", int((~scored).sum()))
+    
+    if scored.any():
+        counts = results.loc[scored, 'recommended_crop'].value_counts().reset_index()
+        counts.columns = ['Crop', 'Fields']
+        fig = px.bar(counts, x='Crop', y='Fields', title="Recommended Crops", color='Fields',
+                     color_continuous_scale='Greens')
+        st.plotly_chart(fig, use_container_width=True)
+    
+    if not scored.all():
+        st.warning(f"{int((~scored).sum())} row(s) could not be scored; see the error column")
+    
+    st.dataframe(results, use_container_width=True)
+    
+    st.download_button(
+        "📥 Download Results",
+        results.to_csv(index=False),
+        file_name=f"crop_recommendations_{Path(uploaded.name).stem}.csv",
+        mime="text/csv",
+    )
 
+@timed(PAGE_SECONDS)
 def show_fertilizer_recommendation():
     """Display fertilizer recommendation system"""
+    import pandas as pd
+    
     st.markdown('<h1 class="main-header">🧪 Fertilizer Recommendation</h1>', unsafe_allow_html=True)
     
     st.info("Get optimal fertilizer recommendations for your crops")
@@ -1012,28 +1028,40 @@ def show_fertilizer_recommendation():
                 for rec in recommendations:
                     st.info(rec)
 
+@timed(PAGE_SECONDS)
 def show_orders():
     """Display order management"""
     st.markdown('<h1 class="main-header">📦 Order Management</h1>', unsafe_allow_html=True)
     
     tab1, tab2 = st.tabs(["📥 My Purchases", "📤 My Sales"])
     
+    status_color = {
+        'pending': '🟡',
+        'confirmed': '🟢',
+        'delivered': '✅',
+        'cancelled': '🔴'
+    }
+    
     with tab1:
         st.subheader("Your Purchase Orders")
         
-        conn = sqlite3.connect(DB_PATH)
-        purchase_orders = pd.read_sql_query("""
-            SELECT o.*, c.name as crop_name, c.price, u.name as seller_name, u.phone as seller_phone
-            FROM orders o
-            JOIN crops c ON o.crop_id = c.id  
-            JOIN users u ON o.seller_id = u.id
-            WHERE o.buyer_id = ?
-            ORDER BY o.order_date DESC
-        """, conn, params=[st.session_state.user_id])
-        conn.close()
+        col1, col2 = st.columns([3, 1])
+        with col1:
+            purchase_status = st.selectbox("Status", ["All"] + [status.title() for status in ORDER_STATUSES],
+                                           key="purchase_status")
+        with col2:
+            purchase_page_size = st.selectbox("📄 Per page", PAGE_SIZES, key="purchase_page_size")
+        
+        with get_pool().connection() as conn:
+            purchase_orders, next_cursor = fetch_orders(
+                conn, 'buyer', st.session_state.user_id,
+                status=None if purchase_status == "All" else purchase_status.lower(),
+                after=page_cursor("purchase_page", (purchase_status, purchase_page_size)),
+                page_size=purchase_page_size,
+            )
         
-        if not purchase_orders.empty:
-            for _, order in purchase_orders.iterrows():
+        if purchase_orders:
+            for order in purchase_orders:
                 with st.container():
                     col1, col2, col3 = st.columns([2, 1, 1])
                     
@@ -1044,26 +1072,13 @@ def show_orders():
                         st.write(f"Total: ${order['total_price']}")
                     
                     with col2:
-                        status_color = {
-                            'pending': '🟡',
-                            'confirmed': '🟢', 
-                            'delivered': '✅',
-                            'cancelled': '🔴'
-                        }
                         st.write(f"Status: {status_color.get(order['status'], '⚪')} {order['status'].title()}")
                         st.write(f"Date: {order['order_date'][:10]}")
                     
                     with col3:
                         if order['status'] == 'pending':
                             if st.button(f"❌ Cancel", key=f"cancel_purchase_{order['id']}"):
-                                conn = sqlite3.connect(DB_PATH)
-                                cursor = conn.cursor()
-                                cursor.execute("UPDATE orders SET status = 'cancelled' WHERE id = ?", (order['id'],))
-                                # Return quantity to crop
-                                cursor.execute("UPDATE crops SET quantity = quantity + ? WHERE id = ?", 
-                                             (order['quantity'], order['crop_id']))
-                                conn.commit()
-                                conn.close()
+                                transition('cancel', st.session_state.user_id, [order['id']])
                                 st.success("Order cancelled successfully!")
                                 st.rerun()
                         
@@ -1071,27 +1086,43 @@ def show_orders():
                             st.write(f"📞 Contact: {order['seller_phone']}")
                     
                     st.markdown("---")
+            
+            show_pager("purchase_page", next_cursor)
         else:
             st.info("No purchase orders found")
     
     with tab2:
         st.subheader("Your Sales Orders")
         
-        conn = sqlite3.connect(DB_PATH)
-        sales_orders = pd.read_sql_query("""
-            SELECT o.*, c.name as crop_name, c.price, u.name as buyer_name, u.phone as buyer_phone
-            FROM orders o
-            JOIN crops c ON o.crop_id = c.id
-            JOIN users u ON o.buyer_id = u.id  
-            WHERE o.seller_id = ?
-            ORDER BY o.order_date DESC
-        """, conn, params=[st.session_state.user_id])
-        conn.close()
+        col1, col2 = st.columns([3, 1])
+        with col1:
+            sales_status = st.selectbox("Status", ["All"] + [status.title() for status in ORDER_STATUSES],
+                                        key="sales_status")
+        with col2:
+            sales_page_size = st.selectbox("📄 Per page", PAGE_SIZES, key="sales_page_size")
+        
+        with get_pool().connection() as conn:
+            sales_orders, next_cursor = fetch_orders(
+                conn, 'seller', st.session_state.user_id,
+                status=None if sales_status == "All" else sales_status.lower(),
+                after=page_cursor("sales_page", (sales_status, sales_page_size)),
+                page_size=sales_page_size,
+            )
         
-        if not sales_orders.empty:
-            for _, order in sales_orders.iterrows():
-                with st.container():
-                    col1, col2, col3 = st.columns([2, 1, 1])
+        if sales_orders:
+            # Ticking orders inside a form does not rerun the page; the
+            # selected ones are all updated in one go on submit
+            with st.form("sales_orders_form"):
+                select_all = st.checkbox("Select all on this page")
+                selected = []
+                
+                for order in sales_orders:
+                    col0, col1, col2 = st.columns([0.3, 2, 1])
+                    
+                    with col0:
+                        if order['status'] in ('pending', 'confirmed'):
+                            if st.checkbox("Select", key=f"select_sale_{order['id']}", label_visibility="collapsed"):
+                                selected.append(order['id'])
                     
                     with col1:
                         st.write(f"**{order['crop_name']}**")
@@ -1101,65 +1132,42 @@ def show_orders():
                         st.write(f"Total: ${order['total_price']}")
                     
                     with col2:
-                        status_color = {
-                            'pending': '🟡',
-                            'confirmed': '🟢',
-                            'delivered': '✅', 
-                            'cancelled': '🔴'
-                        }
                         st.write(f"Status: {status_color.get(order['status'], '⚪')} {order['status'].title()}")
                         st.write(f"Date: {order['order_date'][:10]}")
                     
-                    with col3:
-                        if order['status'] == 'pending':
-                            col_confirm, col_reject = st.columns(2)
-                            with col_confirm:
-                                if st.button("✅", key=f"confirm_sale_{order['id']}", help="Confirm Order"):
-                                    conn = sqlite3.connect(DB_PATH)
-                                    cursor = conn.cursor()
-                                    cursor.execute("UPDATE orders SET status = 'confirmed' WHERE id = ?", (order['id'],))
-                                    conn.commit()
-                                    conn.close()
-                                    st.success("Order confirmed!")
-                                    st.rerun()
-                            
-                            with col_reject:
-                                if st.button("❌", key=f"reject_sale_{order['id']}", help="Reject Order"):
-                                    conn = sqlite3.connect(DB_PATH)
-                                    cursor = conn.cursor()
-                                    cursor.execute("UPDATE orders SET status = 'cancelled' WHERE id = ?", (order['id'],))
-                                    # Return quantity to crop
-                                    cursor.execute("UPDATE crops SET quantity = quantity + ? WHERE id = ?", 
-                                                 (order['quantity'], order['crop_id']))
-                                    conn.commit()
-                                    conn.close()
-                                    st.success("Order rejected!")
-                                    st.rerun()
-                        
-                        elif order['status'] == 'confirmed':
-                            if st.button("📦 Mark Delivered", key=f"deliver_{order['id']}"):
-                                conn = sqlite3.connect(DB_PATH)
-                                cursor = conn.cursor() 
-                                cursor.execute("UPDATE orders SET status = 'delivered' WHERE id = ?", (order['id'],))
-                                conn.commit()
-                                conn.close()
-                                st.success("Order marked as delivered!")
-                                st.rerun()
-                    
                     st.markdown("---")
+                
+                col_confirm, col_reject, col_deliver = st.columns(3)
+                with col_confirm:
+                    confirm = st.form_submit_button("✅ Confirm Selected")
+                with col_reject:
+                    reject = st.form_submit_button("❌ Reject Selected")
+                with col_deliver:
+                    deliver = st.form_submit_button("📦 Mark Selected Delivered")
+            
+            action = 'confirm' if confirm else 'reject' if reject else 'deliver' if deliver else None
+            if action:
+                if select_all:
+                    selected = [order['id'] for order in sales_orders]
+                if not selected:
+                    st.warning("Select at least one order")
+                else:
+                    changed = transition(action, st.session_state.user_id, selected)
+                    skipped = len(selected) - changed
+                    st.success(f"Updated {changed} order(s)" + (f", skipped {skipped} in another state" if skipped else ""))
+                    st.rerun()
+            
+            show_pager("sales_page", next_cursor)
         else:
             st.info("No sales orders found")
 
+@timed(PAGE_SECONDS)
 def show_profile():
     """Display user profile management"""
     st.markdown('<h1 class="main-header">👤 User Profile</h1>', unsafe_allow_html=True)
     
     # Get user data
-    conn = sqlite3.connect(DB_PATH)
-    cursor = conn.cursor()
-    cursor.execute("SELECT * FROM users WHERE id = ?", (st.session_state.user_id,))
-    user = cursor.fetchone()
-    conn.close()
+    user = fetch_one("SELECT * FROM users WHERE id = ?", (st.session_state.user_id,))
     
     if user:
         col1, col2 = st.columns(2)
@@ -1174,13 +1182,9 @@ def show_profile():
                 location = st.text_input("Location", value=user[4] or "")
                 
                 if st.form_submit_button("💾 Update Profile"):
-                    conn = sqlite3.connect(DB_PATH)
-                    cursor = conn.cursor()
-                    cursor.execute("""
+                    execute("""
                         UPDATE users SET name = ?, email = ?, location = ? WHERE id = ?
                     """, (name, email, location, st.session_state.user_id))
-                    conn.commit()
-                    conn.close()
                     
                     st.session_state.user_name = name
                     st.success("Profile updated successfully!")
@@ -1190,22 +1194,11 @@ def show_profile():
             st.subheader("📊 Account Statistics")
             
             # Get user statistics
-            conn = sqlite3.connect(DB_PATH)
-            
-            cursor = conn.cursor()
-            cursor.execute("SELECT COUNT(*) FROM crops WHERE user_id = ?", (st.session_state.user_id,))
-            total_listings = cursor.fetchone()[0]
-            
-            cursor.execute("SELECT COUNT(*) FROM orders WHERE buyer_id = ?", (st.session_state.user_id,))
-            total_purchases = cursor.fetchone()[0]
-            
-            cursor.execute("SELECT COUNT(*) FROM orders WHERE seller_id = ?", (st.session_state.user_id,))
-            total_sales = cursor.fetchone()[0]
-            
-            cursor.execute("SELECT SUM(total_price) FROM orders WHERE seller_id = ? AND status = 'delivered'", (st.session_state.user_id,))
-            total_earnings = cursor.fetchone()[0] or 0
-            
-            conn.close()
+            _, mine = get_stats(st.session_state.user_id)
+            total_listings = mine['listings']
+            total_purchases = mine['purchases']
+            total_sales = mine['sales']
+            total_earnings = round(mine['earnings'], 2)
             
             st.metric("🌾 Total Crop Listings", total_listings)
             st.metric("🛒 Total Purchases", total_purchases)
@@ -1223,17 +1216,14 @@ def show_profile():
             if st.button("🗑️ Delete Account", use_container_width=True, type="secondary"):
                 st.warning("This action cannot be undone!")
                 if st.button("⚠️ Confirm Delete", type="secondary"):
-                    conn = sqlite3.connect(DB_PATH)
-                    cursor = conn.cursor()
-                    
-                    # Delete user data
-                    cursor.execute("DELETE FROM orders WHERE buyer_id = ? OR seller_id = ?", 
-                                 (st.session_state.user_id, st.session_state.user_id))
-                    cursor.execute("DELETE FROM crops WHERE user_id = ?", (st.session_state.user_id,))
-                    cursor.execute("DELETE FROM users WHERE id = ?", (st.session_state.user_id,))
-                    
-                    conn.commit()
-                    conn.close()
+                    with get_pool().transaction() as conn:
+                        cursor = conn.cursor()
+                        
+                        # Delete user data
+                        cursor.execute("DELETE FROM orders WHERE buyer_id = ? OR seller_id = ?", 
+                                     (st.session_state.user_id, st.session_state.user_id))
+                        cursor.execute("DELETE FROM crops WHERE user_id = ?", (st.session_state.user_id,))
+                        cursor.execute("DELETE FROM users WHERE id = ?", (st.session_state.user_id,))
                     
                     # Logout
                     st.session_state.logged_in = False
@@ -1243,6 +1233,46 @@ def show_profile():
                     st.success("Account deleted successfully!")
                     st.rerun()
 
+def show_metrics():
+    """Display timings from the instrumentation registry, cache counters and loaded models"""
+    import pandas as pd
+    
+    st.markdown('<h1 class="main-header">⏱️ Metrics</h1>', unsafe_allow_html=True)
+    
+    st.download_button("⬇️ Prometheus text", render(), file_name="metrics.txt", mime="text/plain")
+    
+    sections = [("🗄️ SQL Statements", SQL_SECONDS, 'statement'),
+                ("🤖 Model Calls", MODEL_SECONDS, 'function'),
+                ("📄 Pages", PAGE_SECONDS, 'function')]
+    for title, name, label in sections:
+        st.subheader(title)
+        rows = []
+        for _, labels, histogram in histograms(name):
+            _, total, count = histogram.snapshot()
+            rows.append({
+                label: labels[label],
+                'calls': count,
+                'total (ms)': round(total * 1000, 1),
+                'mean (ms)': round(total / count * 1000, 2) if count else None,
+                'p50 (ms)': round(histogram.quantile(0.5) * 1000, 2) if count else None,
+                'p95 (ms)': round(histogram.quantile(0.95) * 1000, 2) if count else None,
+                'p99 (ms)': round(histogram.quantile(0.99) * 1000, 2) if count else None,
+            })
+        if rows:
+            st.dataframe(pd.DataFrame(rows).sort_values('total (ms)', ascending=False),
+                         use_container_width=True, hide_index=True)
+        else:
+            st.info("Nothing recorded yet")
+    
+    col1, col2 = st.columns(2)
+    with col1:
+        st.subheader("🧠 Prediction Cache")
+        st.json(prediction_cache_stats())
+    with col2:
+        st.subheader("📦 Loaded Models")
+        st.dataframe(pd.DataFrame([info._asdict() for info in loaded_models()]),
+                     use_container_width=True, hide_index=True)
+
 # Run the application
 if __name__ == "__main__":
     main()
\ No newline at end of file
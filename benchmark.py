@@ -0,0 +1,332 @@
+"""Latency benchmarks for model inference, page queries and full page reruns
+
+    python benchmark.py                                   # every suite on the 10k database
+    python benchmark.py --sizes 10k 1m --suites queries   # queries on bigger databases
+    python benchmark.py --output after.json --compare before.json
+
+Generated databases are built once per size with setup_db.generate() and
+reused from --data-dir. Every case reports p50, p95 and p99 in
+milliseconds. --compare exits non-zero when a case's p50 or p95 got slower
+than the baseline by more than --threshold.
+"""
+import json
+import os
+import platform
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import date, datetime, timezone
+
+import numpy as np
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+
+# Rows per table for each database size; "10m" takes a while to generate
+SIZES = {
+    '10k': dict(users=1_000, listings=10_000, orders=10_000, ticks=10_000),
+    '1m': dict(users=100_000, listings=1_000_000, orders=1_000_000, ticks=1_000_000),
+    '10m': dict(users=1_000_000, listings=10_000_000, orders=10_000_000, ticks=10_000_000),
+}
+SUITES = ['inference', 'queries', 'pages']
+SEED = 0
+# Fixed so every run generates the same databases
+AS_OF = date(2026, 1, 1)
+
+REPEAT = 200
+PAGE_REPEAT = 20
+WARMUP = 5
+BATCH_ROWS = 1000
+THRESHOLD = 0.2
+# Differences below this are timer noise, whatever the ratio
+MIN_DELTA_MS = 0.05
+
+# Queries app.py runs directly, mirrored here like query_plans.py does
+STATS = "SELECT * FROM stats WHERE user_id IN (0, ?)"
+RECENT_ACTIVITY = """
+    SELECT c.name, c.price, c.quantity, u.name as seller, c.created_at
+    FROM crops c
+    JOIN users u ON c.user_id = u.id
+    ORDER BY c.created_at DESC
+    LIMIT 5
+"""
+PROFILE = "SELECT * FROM users WHERE id = ?"
+
+PAGES = {
+    'dashboard': "🏠 Dashboard",
+    'marketplace': "🛒 Marketplace",
+    'orders': "📦 My Orders",
+    'profile': "👤 Profile",
+    'crop_recommendation': "🌱 Crop Recommendation",
+    'fertilizer_recommendation': "🧪 Fertilizer Recommendation",
+}
+
+
+def measure(call, repeat=REPEAT, warmup=WARMUP):
+    """Run call warmup + repeat times; returns the timed durations in ms"""
+    for _ in range(warmup):
+        call()
+    timings = []
+    for _ in range(repeat):
+        started = time.perf_counter_ns()
+        call()
+        timings.append((time.perf_counter_ns() - started) / 1e6)
+    return timings
+
+
+def summarize(timings):
+    p50, p95, p99 = np.percentile(timings, [50, 95, 99])
+    return {
+        'n': len(timings),
+        'p50_ms': round(float(p50), 4),
+        'p95_ms': round(float(p95), 4),
+        'p99_ms': round(float(p99), 4),
+        'mean_ms': round(float(np.mean(timings)), 4),
+        'min_ms': round(float(np.min(timings)), 4),
+    }
+
+
+def database_path(data_dir, size):
+    """Generated database for size, built on first use"""
+    from setup_db import generate
+
+    path = os.path.join(data_dir, f"bench-{size}-seed{SEED}.db")
+    if not os.path.exists(path):
+        os.makedirs(data_dir, exist_ok=True)
+        print(f"Generating the {size} database at {path}...", flush=True)
+        generate(path, seed=SEED, as_of=AS_OF, **SIZES[size])
+    return path
+
+
+def bench_users(conn):
+    """(heavy, typical) user ids: the top seller and one from the middle"""
+    heavy = conn.execute("SELECT user_id FROM stats WHERE user_id > 0 ORDER BY sales DESC LIMIT 1").fetchone()[0]
+    count = conn.execute("SELECT COUNT(*) FROM stats WHERE user_id > 0").fetchone()[0]
+    typical = conn.execute("SELECT user_id FROM stats WHERE user_id > 0 ORDER BY sales, user_id LIMIT 1 OFFSET ?",
+                           (count // 2,)).fetchone()[0]
+    return heavy, typical
+
+
+def inference_cases(repeat):
+    """Single-row and batch latency of the crop and fertilizer models"""
+    from fast_inference import NUMERIC, get_crop_predictor, get_fertilizer_predictor
+    from prediction_cache import PredictionCache
+    from recommendation import FEATURES, recommend_batch, suggest
+    import pandas as pd
+    import prediction_cache
+
+    rng = np.random.default_rng(SEED)
+    crop = get_crop_predictor()
+    fertilizer = get_fertilizer_predictor()
+    field = (90, 42, 43, 20.9, 82.0, 6.5, 202.9)
+    plot = (40, 30, 25, 'Wheat', 'Loamy', 26, 52, 40)
+
+    sheet = pd.DataFrame(rng.uniform([0, 5, 5, 10, 15, 4, 20], [140, 145, 205, 43, 99, 9.9, 298],
+                                     (BATCH_ROWS, len(FEATURES))), columns=FEATURES)
+    soils, crops = fertilizer.categories
+    categorical = np.column_stack([rng.choice(soils, BATCH_ROWS), rng.choice(crops, BATCH_ROWS)])
+    numeric = rng.uniform([25, 50, 25, 4, 0, 0], [38, 72, 65, 42, 19, 42], (BATCH_ROWS, len(NUMERIC)))
+
+    # Cached lookups run against a private in-memory cache, so the shared
+    # tier and the app's process-wide counters are left alone
+    cache = PredictionCache(shared=False)
+    saved, prediction_cache.cache = prediction_cache.cache, cache
+    try:
+        suggest(*field)
+        cases = {
+            'inference.crop.single': measure(lambda: crop.predict_proba_one(*field), repeat),
+            'inference.crop.suggest_cached': measure(lambda: suggest(*field), repeat),
+            f'inference.crop.batch_{BATCH_ROWS}': measure(lambda: recommend_batch(sheet), max(repeat // 10, 10)),
+            'inference.fertilizer.single': measure(lambda: fertilizer.predict_one(*plot), repeat),
+            f'inference.fertilizer.batch_{BATCH_ROWS}': measure(
+                lambda: fertilizer.predict_arrays(categorical, numeric), max(repeat // 10, 10)),
+        }
+    finally:
+        prediction_cache.cache = saved
+    return cases
+
+
+def query_cases(path, size, repeat):
+    """Every query the dashboard, marketplace, orders and profile pages run"""
+    from database import connect
+    from listings import SORTS, fetch_page
+    from orders import fetch_orders
+
+    conn = connect(path)
+    heavy, typical = bench_users(conn)
+
+    def page(**kwargs):
+        return lambda: fetch_page(conn, exclude_user=typical, in_stock=True, **kwargs)
+
+    _, listings_cursor = fetch_page(conn, exclude_user=typical, in_stock=True)
+    _, purchases_cursor = fetch_orders(conn, 'buyer', heavy)
+    calls = {
+        'dashboard.stats': lambda: conn.execute(STATS, (typical,)).fetchall(),
+        'dashboard.recent_activity': lambda: conn.execute(RECENT_ACTIVITY).fetchall(),
+        'marketplace.search': page(search_term="tomato", sort="Best Match"),
+        'marketplace.search_short': page(search_term="ri"),
+        'marketplace.search_typo': page(search_term="tomatto", sort="Best Match"),
+        'marketplace.category': page(category="Vegetables", sort="Price (Low to High)"),
+        'marketplace.next_page': page(after=listings_cursor),
+        'marketplace.my_listings': lambda: fetch_page(conn, owner=heavy),
+        'orders.purchases': lambda: fetch_orders(conn, 'buyer', typical),
+        'orders.purchases_next_page': lambda: fetch_orders(conn, 'buyer', heavy, after=purchases_cursor),
+        'orders.sales': lambda: fetch_orders(conn, 'seller', heavy),
+        'orders.sales_pending': lambda: fetch_orders(conn, 'seller', heavy, status='pending'),
+        'profile.user': lambda: conn.execute(PROFILE, (typical,)).fetchone(),
+        'profile.stats': lambda: conn.execute(STATS, (heavy,)).fetchall(),
+    }
+    for sort in SORTS:
+        name = sort.lower().replace(' (', '_').replace(')', '').replace(' ', '_')
+        calls[f'marketplace.sort.{name}'] = page(sort=sort)
+    try:
+        return {f'queries.{size}.{name}': measure(call, repeat) for name, call in calls.items()}
+    finally:
+        conn.close()
+
+
+def page_cases(path, size, repeat):
+    """Full script reruns of each page through Streamlit's AppTest, logged in as a typical user"""
+    from streamlit.testing.v1 import AppTest
+
+    import database
+
+    database.use_database(path)
+    with database.get_pool().connection() as conn:
+        _, typical = bench_users(conn)
+        name = conn.execute("SELECT name FROM users WHERE id = ?", (typical,)).fetchone()[0]
+
+    app = AppTest.from_file(os.path.join(BASE_DIR, 'app.py'), default_timeout=120)
+    app.session_state.logged_in = True
+    app.session_state.user_id = typical
+    app.session_state.user_name = name
+    app.run()
+
+    cases = {}
+    for key, label in PAGES.items():
+        app.sidebar.selectbox[0].set_value(label)
+
+        def rerun():
+            app.run()
+            if app.exception:
+                raise RuntimeError(f"{label} raised: {app.exception[0].message}")
+
+        cases[f'pages.{size}.{key}'] = measure(rerun, repeat, warmup=1)
+    return cases
+
+
+def run(suites=SUITES, sizes=('10k',), data_dir=None, repeat=REPEAT, page_repeat=PAGE_REPEAT):
+    """Run the selected suites and return the results document"""
+    data_dir = data_dir or os.path.join(tempfile.gettempdir(), 'agrimart-bench')
+    timings = {}
+    if 'inference' in suites:
+        print("inference...", flush=True)
+        timings.update(inference_cases(repeat))
+    for size in sizes:
+        if not {'queries', 'pages'} & set(suites):
+            break
+        path = database_path(data_dir, size)
+        if 'queries' in suites:
+            print(f"queries on {size}...", flush=True)
+            timings.update(query_cases(path, size, repeat))
+        if 'pages' in suites:
+            try:
+                import streamlit.testing.v1  # noqa: F401
+            except ImportError:
+                print("pages: streamlit is not installed, skipping", file=sys.stderr)
+            else:
+                print(f"pages on {size}...", flush=True)
+                timings.update(page_cases(path, size, page_repeat))
+
+    return {
+        'meta': {
+            'created': datetime.now(timezone.utc).isoformat(timespec='seconds'),
+            'commit': _git_commit(),
+            'python': platform.python_version(),
+            'platform': platform.platform(),
+            'suites': list(suites),
+            'sizes': list(sizes),
+        },
+        'results': {name: summarize(values) for name, values in timings.items()},
+    }
+
+
+def _git_commit():
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], cwd=BASE_DIR, capture_output=True,
+                              text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def compare(baseline, current, threshold=THRESHOLD, min_delta_ms=MIN_DELTA_MS):
+    """Return (name, metric, baseline ms, current ms) for every case that regressed"""
+    regressions = []
+    for name, result in current['results'].items():
+        before = baseline['results'].get(name)
+        if before is None:
+            continue
+        for metric in ('p50_ms', 'p95_ms'):
+            old, new = before[metric], result[metric]
+            if new > old * (1 + threshold) and new - old > min_delta_ms:
+                regressions.append((name, metric, old, new))
+    return regressions
+
+
+def print_results(document, baseline=None):
+    results = document['results']
+    width = max((len(name) for name in results), default=10)
+    print(f"{'case':<{width}}  {'p50':>10}  {'p95':>10}  {'p99':>10}" + (f"  {'vs base':>8}" if baseline else ""))
+    for name, result in results.items():
+        line = f"{name:<{width}}  {result['p50_ms']:>8.3f}ms  {result['p95_ms']:>8.3f}ms  {result['p99_ms']:>8.3f}ms"
+        before = baseline['results'].get(name) if baseline else None
+        if before and before['p50_ms'] > 0:
+            line += f"  {result['p50_ms'] / before['p50_ms']:>7.2f}x"
+        print(line)
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--suites", nargs="+", choices=SUITES, default=SUITES)
+    parser.add_argument("--sizes", nargs="+", choices=list(SIZES), default=['10k'],
+                        help="generated database sizes for the query and page suites")
+    parser.add_argument("--data-dir", help="where generated databases are kept (default: a temp directory)")
+    parser.add_argument("--repeat", type=int, default=REPEAT, help="timed runs per inference and query case")
+    parser.add_argument("--page-repeat", type=int, default=PAGE_REPEAT, help="timed reruns per page")
+    parser.add_argument("--output", default="benchmark.json", help="results file (default: %(default)s)")
+    parser.add_argument("--compare", metavar="BASELINE", help="flag regressions against this results file")
+    parser.add_argument("--against", metavar="RESULTS",
+                        help="with --compare, compare this results file instead of running the benchmarks")
+    parser.add_argument("--threshold", type=float, default=THRESHOLD,
+                        help="allowed slowdown as a fraction (default: %(default)s)")
+    args = parser.parse_args()
+
+    baseline = None
+    if args.compare:
+        with open(args.compare) as file:
+            baseline = json.load(file)
+
+    if args.against:
+        if baseline is None:
+            parser.error("--against needs --compare")
+        with open(args.against) as file:
+            document = json.load(file)
+    else:
+        document = run(args.suites, args.sizes, args.data_dir, args.repeat, args.page_repeat)
+        with open(args.output, 'w') as file:
+            json.dump(document, file, indent=2)
+            file.write("\n")
+
+    print_results(document, baseline)
+    if not args.against:
+        print(f"Wrote {args.output}")
+
+    if baseline is not None:
+        regressions = compare(baseline, document, args.threshold)
+        for name, metric, old, new in regressions:
+            print(f"REGRESSION {name} {metric}: {old:.3f}ms -> {new:.3f}ms ({new / old:.2f}x)", file=sys.stderr)
+        if regressions:
+            sys.exit(1)
+        print(f"No regressions beyond {args.threshold:.0%} against {args.compare}")
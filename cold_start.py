@@ -0,0 +1,89 @@
+"""Check that a fresh app.py worker renders the login page without page-only dependencies
+
+    python cold_start.py                 # default budget
+    python cold_start.py --budget 100 --top 20
+
+Runs app.py as a bare script under `python -X importtime` on a scratch
+database, the way a new worker renders the login page. Exits non-zero when
+a module that only some pages need was imported, or when the imports after
+Streamlit's own took longer than the budget in milliseconds.
+"""
+import os
+import re
+import subprocess
+import sys
+import tempfile
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+
+# Imported by the pages that use them, never by the login page. Streamlit
+# itself imports plotly's lazy package stub for its chart theme, so the
+# check is on plotly.express, which drags in pandas and numpy.
+LAZY = ['plotly.express', 'pandas', 'numpy', 'sklearn', 'requests', 'pyarrow']
+BUDGET_MS = 150.0
+
+# Import Streamlit first so its own import time is reported separately
+DRIVER = """
+import runpy, sys
+import streamlit
+sys.path.insert(0, {base!r})
+runpy.run_path({script!r}, run_name='__main__')
+"""
+IMPORT_LINE = re.compile(r'import time:\s+(\d+) \|\s+(\d+) \|( *)(\S+)')
+
+
+def measure(script=os.path.join(BASE_DIR, 'app.py')):
+    """[(module, self us, cumulative us, depth)] of every import made after Streamlit's"""
+    with tempfile.TemporaryDirectory() as scratch:
+        env = dict(os.environ, AGRIMART_DB_PATH=os.path.join(scratch, 'cold-start.db'))
+        result = subprocess.run(
+            [sys.executable, '-X', 'importtime', '-c', DRIVER.format(base=BASE_DIR, script=script)],
+            cwd=scratch, env=env, capture_output=True, text=True, timeout=300,
+        )
+    if result.returncode != 0:
+        raise SystemExit(f"app.py failed to start:\n{result.stderr[-2000:]}")
+
+    imports = []
+    for line in result.stderr.splitlines():
+        match = IMPORT_LINE.match(line)
+        if match:
+            imports.append((match[4], int(match[1]), int(match[2]), (len(match[3]) - 1) // 2))
+    # Everything up to the streamlit entry is interpreter start-up and Streamlit itself
+    start = next(i for i, (module, _, _, depth) in enumerate(imports) if module == 'streamlit' and depth == 0)
+    return imports[start + 1:]
+
+
+def check(imports, budget_ms=BUDGET_MS):
+    """Return a list of problems; empty when the cold start is within bounds"""
+    problems = []
+    loaded = {module for module, *_ in imports}
+    for lazy in LAZY:
+        if lazy in loaded:
+            problems.append(f"{lazy} was imported while rendering the login page")
+    total_ms = sum(cumulative for _, _, cumulative, depth in imports if depth == 0) / 1000
+    if total_ms > budget_ms:
+        problems.append(f"imports after Streamlit took {total_ms:.0f}ms, over the {budget_ms:.0f}ms budget")
+    return problems
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--budget", type=float, default=BUDGET_MS,
+                        help="milliseconds allowed for imports after Streamlit's (default: %(default)s)")
+    parser.add_argument("--top", type=int, default=10, help="slowest top-level imports to list")
+    args = parser.parse_args()
+
+    imports = measure()
+    top_level = sorted((entry for entry in imports if entry[3] == 0), key=lambda entry: -entry[2])
+    print(f"Imports after Streamlit: {sum(entry[2] for entry in top_level) / 1000:.1f}ms")
+    for module, _, cumulative, _ in top_level[:args.top]:
+        print(f"  {cumulative / 1000:>8.1f}ms  {module}")
+
+    problems = check(imports, args.budget)
+    for problem in problems:
+        print(f"FAIL {problem}")
+    if problems:
+        sys.exit(1)
+    print("OK")
@@ -0,0 +1,94 @@
+"""Full-text search over crop listings backed by the crops_fts trigram index"""
+import difflib
+import re
+
+# Trigram index needs at least this many characters per search word
+MIN_TERM_LENGTH = 3
+
+# Typo fallback: how many trigram-ranked listings to collect words from, how
+# close a word has to be (difflib ratio) to count as the same word, and how
+# many close words to search for in place of each misspelt one
+FUZZY_CANDIDATES = 200
+FUZZY_CUTOFF = 0.75
+FUZZY_ALTERNATIVES = 3
+
+_WORD = re.compile(r"\w+")
+
+
+def _words(text):
+    return [word.lower() for word in _WORD.findall(text or "")]
+
+
+def match_expression(term):
+    """Build an FTS5 query that matches every word of term as a substring
+
+    Returns None when no word is long enough for the trigram index.
+    """
+    words = [word for word in _words(term) if len(word) >= MIN_TERM_LENGTH]
+    if not words:
+        return None
+    return " ".join(f'"{word}"' for word in words)
+
+
+def fuzzy_expression(term):
+    """Build an FTS5 query matching any trigram of term"""
+    trigrams = []
+    for word in _words(term):
+        for i in range(len(word) - MIN_TERM_LENGTH + 1):
+            trigram = word[i:i + MIN_TERM_LENGTH]
+            if trigram not in trigrams:
+                trigrams.append(trigram)
+    if not trigrams:
+        return None
+    return " OR ".join(f'"{trigram}"' for trigram in trigrams)
+
+
+def corrected_expression(conn, term, limit=FUZZY_CANDIDATES):
+    """Build an FTS5 query for term with each word replaced by the listed words close to it
+
+    The closest listings by shared trigrams only supply the vocabulary; the
+    corrected query is matched against every listing. Returns None when some
+    word has nothing close to it.
+    """
+    expression = fuzzy_expression(term)
+    if expression is None:
+        return None
+    rows = conn.execute("""
+        SELECT name, category, description FROM crops_fts
+        WHERE crops_fts MATCH ?
+        ORDER BY rank
+        LIMIT ?
+    """, (expression, limit)).fetchall()
+    vocabulary = sorted({word for row in rows for word in _words(" ".join(filter(None, row)))
+                         if len(word) >= MIN_TERM_LENGTH})
+    groups = []
+    for word in _words(term):
+        if len(word) < MIN_TERM_LENGTH:
+            continue
+        close = difflib.get_close_matches(word, vocabulary, n=FUZZY_ALTERNATIVES, cutoff=FUZZY_CUTOFF)
+        if not close:
+            return None
+        groups.append("(" + " OR ".join(f'"{match}"' for match in close) + ")")
+    return " AND ".join(groups)
+
+
+def search_join(conn, term):
+    """Return (join_sql, params, rank_sql) restricting crops c to listings matching term
+
+    Exact substring matches on name, description or category win. When there
+    are none the words are corrected to the closest ones in the listings and
+    those are matched instead, through the same join, so the caller's filters
+    and paging see every corrected hit. Returns None for terms too short for
+    the trigram index.
+    """
+    expression = match_expression(term)
+    if expression is None:
+        return None
+    if conn.execute("SELECT 1 FROM crops_fts WHERE crops_fts MATCH ? LIMIT 1", (expression,)).fetchone() is None:
+        # No correction matches nothing; the exact expression already does that
+        expression = corrected_expression(conn, term) or expression
+    return (
+        "JOIN (SELECT rowid AS crop_id, rank FROM crops_fts WHERE crops_fts MATCH ?) hit ON hit.crop_id = c.id",
+        [expression],
+        "hit.rank",
+    )
@@ -0,0 +1,168 @@
+import os
+import queue
+import sqlite3
+import threading
+from contextlib import contextmanager
+
+from instrumentation import connection_factory
+from migrations import migrate
+
+# Database setup
+DB_PATH = os.environ.get('AGRIMART_DB_PATH', 'smart_agriculture.db')
+
+# Streamlit runs every session's script in its own thread; this caps how many
+# of them can hold a connection at the same time.
+POOL_SIZE = int(os.environ.get('AGRIMART_DB_POOL_SIZE', '8'))
+POOL_TIMEOUT = 30.0
+BUSY_TIMEOUT_MS = 5000
+STATEMENT_CACHE_SIZE = 256
+
+# Applied to every pooled connection
+PRAGMAS = (
+    "PRAGMA journal_mode = WAL",
+    "PRAGMA synchronous = NORMAL",
+    "PRAGMA mmap_size = 268435456",
+    "PRAGMA cache_size = -16000",
+    "PRAGMA temp_store = MEMORY",
+    f"PRAGMA busy_timeout = {BUSY_TIMEOUT_MS}",
+)
+
+
+class PoolTimeout(Exception):
+    """Raised when no pooled connection frees up in time"""
+
+
+def connect(path=DB_PATH):
+    """Open a connection configured like the pooled ones"""
+    conn = sqlite3.connect(
+        path,
+        timeout=BUSY_TIMEOUT_MS / 1000,
+        check_same_thread=False,
+        cached_statements=STATEMENT_CACHE_SIZE,
+        factory=connection_factory(),
+    )
+    for pragma in PRAGMAS:
+        conn.execute(pragma)
+    return conn
+
+
+class ConnectionPool:
+    """Thread-safe pool of long-lived SQLite connections"""
+
+    def __init__(self, path=DB_PATH, size=POOL_SIZE, timeout=POOL_TIMEOUT):
+        self.path = path
+        self.size = size
+        self.timeout = timeout
+        self._idle = queue.LifoQueue()
+        self._slots = threading.BoundedSemaphore(size)
+        self._all = []
+        self._lock = threading.Lock()
+
+    def _open(self):
+        conn = connect(self.path)
+        with self._lock:
+            self._all.append(conn)
+        return conn
+
+    @contextmanager
+    def connection(self):
+        """Borrow a connection for the duration of the with block"""
+        if not self._slots.acquire(timeout=self.timeout):
+            raise PoolTimeout(f"No free database connection after {self.timeout}s")
+        try:
+            try:
+                conn = self._idle.get_nowait()
+            except queue.Empty:
+                conn = self._open()
+            try:
+                yield conn
+            finally:
+                # Never hand an open transaction to the next borrower
+                if conn.in_transaction:
+                    conn.rollback()
+                self._idle.put(conn)
+        finally:
+            self._slots.release()
+
+    @contextmanager
+    def transaction(self):
+        """Borrow a connection and commit on success, roll back on error"""
+        with self.connection() as conn:
+            try:
+                yield conn
+            except BaseException:
+                conn.rollback()
+                raise
+            conn.commit()
+
+    def close(self):
+        """Close every connection the pool has opened"""
+        with self._lock:
+            conns, self._all = self._all, []
+        for conn in conns:
+            conn.close()
+        self._idle = queue.LifoQueue()
+
+
+_pool = None
+_pool_path = DB_PATH
+_pool_lock = threading.Lock()
+
+
+def get_pool():
+    """Return the process-wide connection pool, migrating the schema on first use"""
+    global _pool
+    if _pool is None:
+        with _pool_lock:
+            if _pool is None:
+                pool = ConnectionPool(_pool_path)
+                with pool.connection() as conn:
+                    migrate(conn)
+                _pool = pool
+    return _pool
+
+
+def use_database(path):
+    """Point the process-wide pool at another database file, e.g. a generated one
+
+    Closes the current pool; the next get_pool() opens and migrates path.
+    """
+    global _pool, _pool_path
+    with _pool_lock:
+        pool, _pool, _pool_path = _pool, None, path
+    if pool is not None:
+        pool.close()
+
+
+def fetch_one(query, params=()):
+    """Run a query and return its first row"""
+    with get_pool().connection() as conn:
+        return conn.execute(query, params).fetchone()
+
+
+def fetch_all(query, params=()):
+    """Run a query and return all rows"""
+    with get_pool().connection() as conn:
+        return conn.execute(query, params).fetchall()
+
+
+def fetch_value(query, params=(), default=None):
+    """Run a query and return the first column of its first row"""
+    row = fetch_one(query, params)
+    if row is None or row[0] is None:
+        return default
+    return row[0]
+
+
+def execute(query, params=()):
+    """Run a single write statement in its own transaction and return the cursor"""
+    with get_pool().transaction() as conn:
+        return conn.execute(query, params)
+
+
+def read_sql(query, params=()):
+    """Run a query and return the result as a DataFrame"""
+    import pandas as pd
+
+    with get_pool().connection() as conn:
+        return pd.read_sql_query(query, conn, params=list(params))
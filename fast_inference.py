@@ -0,0 +1,543 @@
+"""Compiled inference paths for the fertilizer pipeline and the crop tree
+
+The pickled pipeline (ColumnTransformer -> OneHotEncoder -> StandardScaler ->
+RandomForestClassifier) needs a pandas DataFrame with the training column
+names and pays several milliseconds of validation per call. FertilizerPredictor
+precomputes the one-hot maps, scaler parameters and flattened trees into
+NumPy arrays once and gives the same predictions from plain arrays.
+
+The arrays are exported to models/fertilizer.npz, which the model registry
+memory-maps instead of unpickling fertilizer.pkl as long as the export's
+source checksum matches the pickle on disk. Re-export after retraining.
+CropPredictor compiles the crop decision tree when it is loaded.
+
+    python fast_inference.py                  # parity check and timings
+    python fast_inference.py --samples 100000
+    python fast_inference.py --export models/fertilizer.npz
+    python fast_inference.py --crop           # same check for the crop tree
+"""
+import os
+import struct
+import zipfile
+
+import numpy as np
+
+from instrumentation import MODEL_SECONDS, timed
+from model_registry import get_model
+
+# Training column names, quirks included
+CATEGORICAL = ['Soil Type', 'Crop Type']
+NUMERIC = ['Temparature', 'Humidity ', 'Moisture', 'Nitrogen', 'Potassium', 'Phosphorous']
+# Crop model inputs, used when the tree was fitted without feature names
+CROP_FEATURES = ['N', 'P', 'K', 'temperature', 'humidity', 'ph', 'rainfall']
+
+# Bumped whenever the arrays stored in the .npz change meaning
+FORMAT_VERSION = 2
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+PICKLE_PATH = os.path.join(BASE_DIR, 'models', 'fertilizer.pkl')
+COMPILED_PATH = os.path.join(BASE_DIR, 'models', 'fertilizer.npz')
+
+# Size of a zip local file header before its name and extra field
+_ZIP_LOCAL_HEADER = struct.Struct('<4s5H3I2H')
+
+
+def _read_npz(path, mmap=True):
+    """Read every array of an .npz without pickle, memory-mapping stored members
+
+    np.load ignores mmap_mode for .npz files, so the offset of each member's
+    data inside the zip is worked out here and mapped directly.
+    """
+    arrays = {}
+    with zipfile.ZipFile(path) as archive, open(path, 'rb') as file:
+        for member in archive.infolist():
+            name = member.filename[:-len('.npy')] if member.filename.endswith('.npy') else member.filename
+            if not mmap or member.compress_type != zipfile.ZIP_STORED:
+                with archive.open(member) as data:
+                    arrays[name] = np.lib.format.read_array(data, allow_pickle=False)
+                continue
+            file.seek(member.header_offset)
+            header = _ZIP_LOCAL_HEADER.unpack(file.read(_ZIP_LOCAL_HEADER.size))
+            if header[0] != b'PK\x03\x04':
+                raise ValueError(f"{path} is not a valid .npz file")
+            file.seek(header[-2] + header[-1], os.SEEK_CUR)
+            version = np.lib.format.read_magic(file)
+            read_header = np.lib.format.read_array_header_1_0 if version == (1, 0) else np.lib.format.read_array_header_2_0
+            shape, fortran_order, dtype = read_header(file)
+            if dtype.hasobject:
+                raise ValueError(f"{path} stores Python objects in {name}")
+            if 0 in shape:
+                arrays[name] = np.empty(shape, dtype=dtype)
+                continue
+            arrays[name] = np.memmap(path, dtype=dtype, mode='r', offset=file.tell(), shape=shape,
+                                     order='F' if fortran_order else 'C')
+    return arrays
+
+
+# Rows evaluated together by the vectorized traversal; bounds its (rows x trees) work arrays
+BATCH_ROWS = 8192
+# Below this many rows the per-tree leaf values are gathered and summed in one step
+SMALL_BATCH = 64
+
+
+class FertilizerPredictor:
+    """Array-based equivalent of the fitted fertilizer pipeline
+
+    All trees live in flat arrays: feature, threshold and children per node,
+    with each tree's root in roots. A negative left child marks a leaf and
+    encodes its row in leaf_values as -1 - row. The arrays can be saved to
+    an uncompressed .npz and memory-mapped back without pickle.
+    """
+
+    def __init__(self, categories, mean, scale, classes, roots, feature, threshold, left, right, leaf_values,
+                 source=None):
+        self.source = source
+        self.categories = [np.asarray(values) for values in categories]
+        # Category -> output column, per categorical input
+        self.category_columns = []
+        offset = 0
+        for values in self.categories:
+            self.category_columns.append({value: offset + i for i, value in enumerate(values.tolist())})
+            offset += len(values)
+        self.n_onehot = offset
+        self.n_features = offset + len(NUMERIC)
+
+        self.mean = mean
+        self.scale = scale
+        self.classes = classes
+        self.roots = roots
+        self.feature = feature
+        self.threshold = threshold
+        self.left = left
+        self.right = right
+        self.leaf_values = leaf_values
+
+    @classmethod
+    def from_pipeline(cls, pipeline):
+        """Flatten a fitted preprocessor -> scaler -> RandomForestClassifier pipeline"""
+        preprocessor = pipeline.named_steps['preprocessor']
+        scaler = pipeline.named_steps['scaler']
+        forest = pipeline.named_steps['classifier']
+
+        columns = {name: list(columns) for name, _, columns in preprocessor.transformers_}
+        encoder = preprocessor.named_transformers_['nominal'].named_steps['onehot']
+        if columns.get('nominal') != CATEGORICAL or columns.get('remainder') != NUMERIC:
+            raise ValueError("Fertilizer pipeline columns do not match the compiled layout")
+        if encoder.drop is not None:
+            raise ValueError("Compiled one-hot encoding does not support drop")
+        if encoder.handle_unknown != 'error':
+            # The compiled lookup cannot reproduce ignored or infrequent categories
+            raise ValueError(f"Compiled one-hot encoding needs handle_unknown='error', "
+                             f"not {encoder.handle_unknown!r}")
+
+        n_features = sum(len(values) for values in encoder.categories_) + len(NUMERIC)
+        # Subtracting zero and dividing by one leave the values bit-for-bit unchanged
+        mean = scaler.mean_ if scaler.with_mean else np.zeros(n_features)
+        scale = scaler.scale_ if scaler.with_std else np.ones(n_features)
+
+        n_classes = len(forest.classes_)
+        roots, features, thresholds, lefts, rights, values = [], [], [], [], [], []
+        node_offset = leaf_offset = 0
+        for estimator in forest.estimators_:
+            tree = estimator.tree_
+            is_leaf = tree.children_left < 0
+            leaf_rows = np.cumsum(is_leaf) - 1 + leaf_offset
+            roots.append(node_offset)
+            features.append(np.where(is_leaf, 0, tree.feature))
+            thresholds.append(tree.threshold)
+            lefts.append(np.where(is_leaf, -1 - leaf_rows, tree.children_left + node_offset))
+            rights.append(np.where(is_leaf, -1, tree.children_right + node_offset))
+            values.append(tree.value[is_leaf, 0, :n_classes])
+            node_offset += tree.node_count
+            leaf_offset += int(is_leaf.sum())
+
+        return cls(
+            categories=[np.asarray(values, dtype=str) for values in encoder.categories_],
+            mean=np.asarray(mean, dtype=np.float64),
+            scale=np.asarray(scale, dtype=np.float64),
+            classes=np.asarray(forest.classes_, dtype=str),
+            roots=np.asarray(roots, dtype=np.int32),
+            feature=np.concatenate(features).astype(np.int32),
+            threshold=np.concatenate(thresholds).astype(np.float64),
+            left=np.concatenate(lefts).astype(np.int32),
+            right=np.concatenate(rights).astype(np.int32),
+            leaf_values=np.concatenate(values).astype(np.float64),
+            source=pipeline,
+        )
+
+    def save(self, path, source_sha256=''):
+        """Write the arrays to an uncompressed .npz, replacing path atomically
+
+        source_sha256 is the checksum of the pickle the pipeline was loaded
+        from; load() can refuse the export once that pickle has changed.
+        """
+        arrays = {
+            'format_version': np.array(FORMAT_VERSION),
+            'source_sha256': np.array(source_sha256),
+            'mean': self.mean,
+            'scale': self.scale,
+            'classes': self.classes,
+            'roots': self.roots,
+            'feature': self.feature,
+            'threshold': self.threshold,
+            'left': self.left,
+            'right': self.right,
+            'leaf_values': self.leaf_values,
+        }
+        for i, values in enumerate(self.categories):
+            arrays[f'categories_{i}'] = values
+        # Readers may have the old file memory-mapped, so never write into it
+        temporary = f"{path}.tmp"
+        with open(temporary, 'wb') as file:
+            np.savez(file, **arrays)
+        os.replace(temporary, path)
+
+    @classmethod
+    def load(cls, path, mmap=True, source_sha256=None):
+        """Load a predictor saved by save(); arrays are memory-mapped unless mmap is False
+
+        Raises ValueError when source_sha256 is given and the export was not
+        built from the pickle with that checksum.
+        """
+        arrays = _read_npz(path, mmap)
+        version = int(arrays.pop('format_version'))
+        if version != FORMAT_VERSION:
+            raise ValueError(f"{path} has compiled format {version}, expected {FORMAT_VERSION}")
+        built_from = str(arrays.pop('source_sha256'))
+        if source_sha256 is not None and built_from != source_sha256:
+            raise ValueError(f"{path} was built from a pickle with sha256 {built_from[:12] or 'unknown'}, "
+                             f"not {source_sha256[:12]}")
+        categories = [arrays.pop(f'categories_{i}') for i in range(len(CATEGORICAL))]
+        return cls(categories=categories, source=path, **arrays)
+
+    def encode(self, categorical, numeric):
+        """Build the scaled feature matrix from (n, 2) categories and (n, 6) numbers"""
+        categorical = np.asarray(categorical, dtype=object).reshape(-1, len(CATEGORICAL))
+        numeric = np.asarray(numeric, dtype=np.float64).reshape(-1, len(NUMERIC))
+        n = len(numeric)
+        X = np.zeros((n, self.n_features))
+        rows = np.arange(n)
+        for j, columns in enumerate(self.category_columns):
+            index = np.fromiter((columns.get(value, -1) for value in categorical[:, j]), dtype=np.intp, count=n)
+            if (index < 0).any():
+                unknown = sorted({str(value) for value in categorical[index < 0, j]})
+                raise ValueError(f"Unknown {CATEGORICAL[j]}: {', '.join(unknown)}")
+            X[rows, index] = 1.0
+        X[:, self.n_onehot:] = numeric
+        X -= self.mean
+        X /= self.scale
+        return X
+
+    def apply(self, X):
+        """Leaf row reached in every tree, as an (n, trees) array, for float32 rows X"""
+        n, n_trees = len(X), len(self.roots)
+        values = X.ravel()
+        nodes = np.tile(np.asarray(self.roots, dtype=np.intp), n)
+        offsets = np.repeat(np.arange(n, dtype=np.intp) * X.shape[1], n_trees)
+        # (row, tree) pairs still on an internal node; they drop out as they reach leaves
+        active = np.flatnonzero(self.left[nodes] >= 0)
+        while len(active):
+            current = nodes[active]
+            # Same test as sklearn: the float32 value against the float64 threshold
+            go_left = values[offsets[active] + self.feature[current]] <= self.threshold[current]
+            current = np.where(go_left, self.left[current], self.right[current])
+            nodes[active] = current
+            active = active[self.left[current] >= 0]
+        return (-1 - self.left[nodes]).reshape(n, n_trees)
+
+    @timed(MODEL_SECONDS, model='fertilizer')
+    def predict_proba_arrays(self, categorical, numeric):
+        X = np.ascontiguousarray(self.encode(categorical, numeric), dtype=np.float32)
+        proba = np.zeros((len(X), len(self.classes)))
+        for start in range(0, len(X), BATCH_ROWS):
+            leaves = self.apply(X[start:start + BATCH_ROWS])
+            batch = proba[start:start + BATCH_ROWS]
+            # Tree by tree, so the sum adds up exactly as RandomForestClassifier does.
+            # Reducing the middle axis also adds in tree order; it saves a
+            # Python loop for the few rows a form submits.
+            if len(leaves) < SMALL_BATCH:
+                np.add.reduce(self.leaf_values.take(leaves, axis=0), axis=1, out=batch)
+                continue
+            for tree in range(leaves.shape[1]):
+                batch += self.leaf_values.take(leaves[:, tree], axis=0)
+        proba /= len(self.roots)
+        return proba
+
+    def predict_arrays(self, categorical, numeric):
+        """Predict from (n, 2) [soil type, crop type] and (n, 6) numbers in NUMERIC order"""
+        return self.classes.take(self.predict_proba_arrays(categorical, numeric).argmax(axis=1))
+
+    def _split(self, records):
+        # DataFrame, dict of columns or iterable of dicts keyed by the training columns
+        if hasattr(records, 'columns') or isinstance(records, dict):
+            columns = records
+        else:
+            records = list(records)
+            columns = {name: [record[name] for record in records] for name in CATEGORICAL + NUMERIC}
+        categorical = np.column_stack([np.asarray(columns[name], dtype=object) for name in CATEGORICAL])
+        numeric = np.column_stack([np.asarray(columns[name], dtype=np.float64) for name in NUMERIC])
+        return categorical, numeric
+
+    def predict_proba(self, records):
+        return self.predict_proba_arrays(*self._split(records))
+
+    def predict(self, records):
+        """Predict for records keyed by the training column names"""
+        return self.predict_arrays(*self._split(records))
+
+    def predict_one(self, N, P, K, crop, soil_type, temperature, humidity, moisture):
+        """Predict one fertilizer with the arguments of app.predict_fertilizer"""
+        return self.predict_arrays([[soil_type, crop]], [[temperature, humidity, moisture, N, K, P]])[0]
+
+
+_predictor = None
+
+
+def get_fertilizer_predictor():
+    """Return a predictor for the currently loaded fertilizer model, rebuilt when it is reloaded"""
+    global _predictor
+    model = get_model('fertilizer')
+    if isinstance(model, FertilizerPredictor):
+        # Loaded straight from the compiled .npz
+        return model
+    predictor = _predictor
+    if predictor is None or predictor.source is not model:
+        predictor = _predictor = FertilizerPredictor.from_pipeline(model)
+    return predictor
+
+
+class CropPredictor:
+    """Compiled form of the crop DecisionTreeClassifier
+
+    Batches walk the tree level by level with NumPy indexing; leaves point
+    at themselves, so every row just takes max_depth steps. Single rows go
+    through a generated nested-if function instead, which costs a few
+    comparisons rather than sklearn's input validation.
+    """
+
+    def __init__(self, model):
+        self.source = model
+        tree = model.tree_
+        self.classes_ = model.classes_
+        self.features = [str(name) for name in getattr(model, 'feature_names_in_', CROP_FEATURES)]
+        is_leaf = tree.children_left < 0
+        nodes = np.arange(tree.node_count)
+        self.feature = np.where(is_leaf, 0, tree.feature).astype(np.intp)
+        self.threshold = tree.threshold.copy()
+        self.left = np.where(is_leaf, nodes, tree.children_left).astype(np.intp)
+        self.right = np.where(is_leaf, nodes, tree.children_right).astype(np.intp)
+        self.max_depth = tree.max_depth
+
+        # Per node: predict() takes the argmax of the raw values, predict_proba()
+        # divides them by their sum; both are done here once, the same way
+        raw = tree.value[:, 0, :len(self.classes_)]
+        self.node_class = raw.argmax(axis=1)
+        normalizer = raw.sum(axis=1)
+        normalizer[normalizer == 0.0] = 1.0
+        self.node_proba = raw / normalizer[:, None]
+
+        self.code = self._generate(tree)
+        namespace = {}
+        exec(compile(self.code, f"<compiled crop tree {id(model):x}>", 'exec'), namespace)
+        self._walk = namespace['walk']
+
+    def _generate(self, tree):
+        """Python source of walk(*features) -> leaf node id"""
+        lines = [f"def walk({', '.join(self.features)}):"]
+
+        def emit(node, depth):
+            indent = '    ' * depth
+            if tree.children_left[node] < 0:
+                lines.append(f"{indent}return {node}")
+                return
+            # repr() round-trips the float64 threshold exactly
+            lines.append(f"{indent}if {self.features[tree.feature[node]]} <= {float(tree.threshold[node])!r}:")
+            emit(tree.children_left[node], depth + 1)
+            lines.append(f"{indent}else:")
+            emit(tree.children_right[node], depth + 1)
+
+        emit(0, 1)
+        return "\n".join(lines) + "\n"
+
+    def apply(self, X):
+        """Leaf node of every row of X, walking one level per step"""
+        # sklearn compares the float32 value against the float64 threshold
+        X = np.asarray(X, dtype=np.float32).reshape(-1, len(self.features))
+        rows = np.arange(len(X))
+        nodes = np.zeros(len(X), dtype=np.intp)
+        for _ in range(self.max_depth):
+            go_left = X[rows, self.feature[nodes]] <= self.threshold[nodes]
+            nodes = np.where(go_left, self.left[nodes], self.right[nodes])
+        return nodes
+
+    @timed(MODEL_SECONDS, model='crop')
+    def predict_proba(self, X):
+        return self.node_proba.take(self.apply(X), axis=0)
+
+    def predict(self, X):
+        return self.classes_.take(self.node_class.take(self.apply(X)))
+
+    def apply_one(self, *values):
+        # Round through float32 like sklearn's validation does
+        return self._walk(*np.array(values, dtype=np.float32).tolist())
+
+    @timed(MODEL_SECONDS, model='crop')
+    def predict_proba_one(self, N, P, K, temperature, humidity, ph, rainfall):
+        """Class probabilities for one field, in classes_ order"""
+        return self.node_proba[self.apply_one(N, P, K, temperature, humidity, ph, rainfall)]
+
+    def predict_one(self, N, P, K, temperature, humidity, ph, rainfall):
+        """Recommended crop for one field"""
+        return self.classes_[self.node_class[self.apply_one(N, P, K, temperature, humidity, ph, rainfall)]]
+
+
+_crop_predictor = None
+
+
+def get_crop_predictor():
+    """Return a compiled predictor for the currently loaded crop model, rebuilt when it is reloaded"""
+    global _crop_predictor
+    model = get_model('crop')
+    predictor = _crop_predictor
+    if predictor is None or predictor.source is not model:
+        predictor = _crop_predictor = CropPredictor(model)
+    return predictor
+
+
+def _sample_records(pipeline, n, seed):
+    """Training rows plus n random rows over every category and the training ranges"""
+    import pandas as pd
+
+    data = pd.read_csv(os.path.join(BASE_DIR, 'data', 'fertilizer.csv'))
+    encoder = pipeline.named_steps['preprocessor'].named_transformers_['nominal'].named_steps['onehot']
+    rng = np.random.default_rng(seed)
+    sample = {name: rng.choice(categories, n) for name, categories in zip(CATEGORICAL, encoder.categories_)}
+    for name in NUMERIC:
+        low, high = data[name].min(), data[name].max()
+        # Half whole numbers like the form sends, half arbitrary floats
+        values = rng.uniform(low - 5, high + 5, n)
+        values[: n // 2] = np.round(values[: n // 2])
+        sample[name] = values
+    return pd.concat([data[CATEGORICAL + NUMERIC], pd.DataFrame(sample)], ignore_index=True)
+
+
+def _check_crop(samples, seed):
+    """Compare CropPredictor with the crop model on recommendation.csv plus random rows"""
+    import time
+
+    import pandas as pd
+
+    model = get_model('crop')
+    predictor = CropPredictor(model)
+    data = pd.read_csv(os.path.join(BASE_DIR, 'data', 'recommendation.csv'))
+    X = data[predictor.features].to_numpy(dtype=np.float64)
+    rng = np.random.default_rng(seed)
+    low, high = X.min(axis=0), X.max(axis=0)
+    # Half rounded to the form's resolution, half arbitrary floats
+    random = rng.uniform(low - 5, high + 5, (samples, X.shape[1]))
+    random[: samples // 2] = np.round(random[: samples // 2], 1)
+
+    passed = True
+    for label, rows in [("recommendation.csv", X), ("random", random)]:
+        frame = pd.DataFrame(rows, columns=predictor.features)
+        expected = model.predict(frame)
+        expected_proba = model.predict_proba(frame)
+        batch = int((predictor.predict(rows) != expected).sum())
+        proba_equal = np.array_equal(predictor.predict_proba(rows), expected_proba)
+        single = sum(predictor.predict_one(*row) != crop for row, crop in zip(rows.tolist(), expected))
+        single_proba = all(np.array_equal(predictor.predict_proba_one(*row), proba)
+                           for row, proba in zip(rows.tolist(), expected_proba))
+        passed = passed and batch == 0 and single == 0 and proba_equal and single_proba
+        print(f"{label}, {len(rows):,} rows: {batch} batch and {single} single-row mismatches, "
+              f"probabilities {'identical' if proba_equal and single_proba else 'differ'}")
+
+    one = X[:1]
+    row = X[0].tolist()
+    for label, call in [("sklearn, one row", lambda: model.predict(one)),
+                        ("compiled, one row", lambda: predictor.predict_one(*row))]:
+        started = time.perf_counter()
+        for _ in range(1000):
+            call()
+        print(f"{label}: {(time.perf_counter() - started) / 1000 * 1e6:.1f} us")
+    for label, call in [("sklearn, batch", lambda: model.predict(random)),
+                        ("compiled, batch", lambda: predictor.predict(random))]:
+        started = time.perf_counter()
+        call()
+        print(f"{label}: {(time.perf_counter() - started) * 1000:.1f} ms")
+    return passed
+
+
+if __name__ == "__main__":
+    import argparse
+    import hashlib
+    import pickle
+    import sys
+    import tempfile
+    import time
+
+    parser = argparse.ArgumentParser(description="Check the compiled fertilizer path against the pickled pipeline")
+    parser.add_argument("--samples", type=int, default=20000, help="random rows on top of the training data")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--pickle", default=PICKLE_PATH, help="fitted pipeline (default: %(default)s)")
+    parser.add_argument("--export", metavar="PATH", help="write the compiled .npz here if the check passes")
+    parser.add_argument("--crop", action="store_true", help="check the compiled crop tree instead")
+    args = parser.parse_args()
+
+    if args.crop:
+        sys.exit(0 if _check_crop(args.samples, args.seed) else 1)
+
+    started = time.perf_counter()
+    with open(args.pickle, 'rb') as file:
+        data = file.read()
+    pipeline = pickle.loads(data)
+    pickle_ms = (time.perf_counter() - started) * 1000
+    compiled = FertilizerPredictor.from_pipeline(pipeline)
+
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, 'fertilizer.npz')
+        compiled.save(path)
+        started = time.perf_counter()
+        predictor = FertilizerPredictor.load(path)
+        npz_ms = (time.perf_counter() - started) * 1000
+        print(f"load: pickle {pickle_ms:.1f} ms ({os.path.getsize(args.pickle):,} bytes), "
+              f"npz {npz_ms:.1f} ms ({os.path.getsize(path):,} bytes)")
+
+        records = _sample_records(pipeline, args.samples, args.seed)
+        frame = records[list(pipeline.feature_names_in_)]
+
+        expected_proba = pipeline.predict_proba(frame)
+        expected = pipeline.predict(frame)
+        passed = True
+        for label, candidate in [("compiled", compiled), ("npz", predictor)]:
+            actual_proba = candidate.predict_proba(records)
+            # Small batches take the one-step sum; check those on the training rows
+            small = np.vstack([candidate.predict_proba(records.iloc[start:start + SMALL_BATCH // 2])
+                               for start in range(0, len(frame) - args.samples, SMALL_BATCH // 2)])
+            proba_equal = np.array_equal(expected_proba[:len(small)], small)
+            mismatches = int((expected != candidate.predict(records)).sum())
+            proba_equal = proba_equal and np.array_equal(expected_proba, actual_proba)
+            passed = passed and mismatches == 0 and proba_equal
+            print(f"{label}, {len(records):,} rows: {mismatches} prediction mismatches, "
+                  f"probabilities {'identical' if proba_equal else 'differ'}")
+
+        one = frame.iloc[[0]]
+        row = one.iloc[0]
+        args_one = (row['Nitrogen'], row['Phosphorous'], row['Potassium'], row['Crop Type'], row['Soil Type'],
+                    row['Temparature'], row['Humidity '], row['Moisture'])
+        for label, call in [("pipeline, one row", lambda: pipeline.predict(one)),
+                            ("npz, one row", lambda: predictor.predict_one(*args_one))]:
+            started = time.perf_counter()
+            for _ in range(200):
+                call()
+            print(f"{label}: {(time.perf_counter() - started) / 200 * 1000:.3f} ms")
+        for label, call in [("pipeline, batch", lambda: pipeline.predict(frame)),
+                            ("npz, batch", lambda: predictor.predict(records))]:
+            started = time.perf_counter()
+            call()
+            print(f"{label}: {(time.perf_counter() - started) * 1000:.1f} ms")
+
+    if not passed:
+        sys.exit(1)
+    if args.export:
+        compiled.save(args.export, hashlib.sha256(data).hexdigest())
+        print(f"Wrote {args.export}")
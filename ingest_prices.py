@@ -0,0 +1,182 @@
+"""Stream mandi price feeds (CSV or Parquet) into price_history
+
+    python ingest_prices.py prices.csv
+    python ingest_prices.py feed.parquet --batch-size 100000 --price-scale 0.01
+
+Files are read in chunks, so memory stays bounded however large the feed.
+Each chunk is normalized, then upserted on (crop_name, date, market) with
+executemany inside one transaction. A tick for a day and market that already
+exists replaces the old price.
+"""
+import logging
+import os
+import sys
+import time
+
+import pandas as pd
+
+from database import DB_PATH, connect
+from migrations import migrate
+from price_alerts import AlertEngine
+from price_analytics import refresh_rollup
+
+logger = logging.getLogger(__name__)
+
+BATCH_SIZE = 50000
+UNKNOWN_MARKET = 'Unknown'
+
+# Lower-cased feed headers -> price_history column; covers the data.gov.in
+# (Agmarknet) daily price exports as well as our own column names
+COLUMN_ALIASES = {
+    'crop_name': 'crop_name', 'crop': 'crop_name', 'commodity': 'crop_name',
+    'price': 'price', 'modal_price': 'price', 'modal price': 'price',
+    'modal_price (rs./quintal)': 'price', 'modal price (rs./quintal)': 'price',
+    'market': 'market', 'mandi': 'market', 'market_name': 'market', 'market name': 'market',
+    'date': 'date', 'arrival_date': 'date', 'arrival date': 'date', 'price date': 'date',
+}
+
+# Normalized crop name -> the name the marketplace uses
+CROP_ALIASES = {
+    'Paddy': 'Rice',
+    'Paddy(Dhan)(Common)': 'Rice',
+    'Corn': 'Maize',
+    'Soyabean': 'Soybean',
+    'Soya Bean': 'Soybean',
+}
+
+UPSERT = """
+    INSERT INTO price_history (crop_name, price, market, date) VALUES (?, ?, ?, ?)
+    ON CONFLICT (crop_name, date, market) DO UPDATE SET
+        price = excluded.price,
+        created_at = CURRENT_TIMESTAMP
+    WHERE price IS NOT excluded.price
+"""
+
+
+def normalize_name(names):
+    """Trim, collapse whitespace and title-case a Series of names"""
+    return names.astype('string').str.strip().str.replace(r'\s+', ' ', regex=True).str.title()
+
+
+def normalize(chunk, price_scale=1.0, dayfirst=False):
+    """Map a raw feed chunk to clean (crop_name, price, market, date) rows
+
+    Returns (frame, rejected) where rejected counts rows without a crop,
+    a positive price or a parseable date.
+    """
+    chunk = chunk.rename(columns=lambda column: COLUMN_ALIASES.get(column.strip().lower(), column))
+    missing = {'crop_name', 'price', 'date'} - set(chunk.columns)
+    if missing:
+        raise ValueError(f"Feed is missing columns: {', '.join(sorted(missing))}")
+
+    frame = pd.DataFrame({
+        'crop_name': normalize_name(chunk['crop_name']).replace(CROP_ALIASES),
+        'price': pd.to_numeric(chunk['price'], errors='coerce') * price_scale,
+        'market': normalize_name(chunk['market']) if 'market' in chunk else pd.Series(pd.NA, index=chunk.index, dtype='string'),
+        'date': pd.to_datetime(chunk['date'], errors='coerce', dayfirst=dayfirst).dt.strftime('%Y-%m-%d'),
+    })
+    # NULLs never conflict in the unique index, so give unnamed markets a name
+    frame['market'] = frame['market'].replace('', pd.NA).fillna(UNKNOWN_MARKET)
+    valid = frame['crop_name'].notna() & (frame['crop_name'] != '') & (frame['price'] > 0) & frame['date'].notna()
+    frame = frame[valid]
+    # Within a chunk the last tick for a (crop, date, market) wins, as it would in the upsert
+    frame = frame.drop_duplicates(['crop_name', 'date', 'market'], keep='last')
+    return frame, int((~valid).sum())
+
+
+def read_chunks(path, batch_size=BATCH_SIZE):
+    """Yield DataFrames of at most batch_size rows from a CSV or Parquet file"""
+    if path.lower().endswith(('.parquet', '.pq')):
+        import pyarrow.parquet as pq
+
+        for batch in pq.ParquetFile(path).iter_batches(batch_size=batch_size):
+            yield batch.to_pandas()
+    else:
+        yield from pd.read_csv(path, chunksize=batch_size, dtype=str, keep_default_na=True)
+
+
+def ingest(conn, path, batch_size=BATCH_SIZE, price_scale=1.0, dayfirst=False, alerts=True, progress=None):
+    """Upsert every row of a feed file; returns (read, written, rejected)
+
+    Each chunk is written in its own transaction. With alerts on, the ticks
+    are also matched against the active price alerts in that transaction.
+    Every tick is matched by exactly one owner: when the alert worker has
+    caught up, this matches the whole chunk and moves its watermark past
+    the new rows; otherwise the worker keeps the inserted rows and only the
+    updated ones, which it never sees again, are matched here.
+    """
+    engine = AlertEngine() if alerts else None
+    read = written = rejected = 0
+    for chunk in read_chunks(path, batch_size):
+        read += len(chunk)
+        frame, bad = normalize(chunk, price_scale, dayfirst)
+        rejected += bad
+        rows = list(frame.astype(object).where(frame.notna(), None).itertuples(index=False, name=None))
+        # The write lock up front keeps the ids read here valid until commit
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            last_id, watermark = conn.execute("""
+                SELECT (SELECT IFNULL(MAX(id), 0) FROM price_history), last_tick_id
+                FROM price_alert_state WHERE id = 0
+            """).fetchone()
+            written += conn.executemany(UPSERT, rows).rowcount
+            if engine is not None:
+                if watermark >= last_id:
+                    engine.match_ticks(conn, [(crop_name, price, market) for crop_name, price, market, _ in rows])
+                    conn.execute("""
+                        UPDATE price_alert_state SET last_tick_id = (SELECT IFNULL(MAX(id), 0) FROM price_history)
+                        WHERE id = 0
+                    """)
+                else:
+                    inserted = set(conn.execute("SELECT crop_name, price, market, date FROM price_history WHERE id > ?",
+                                                (last_id,)).fetchall())
+                    engine.match_ticks(conn, [(crop_name, price, market) for crop_name, price, market, date in rows
+                                              if (crop_name, price, market, date) not in inserted])
+            conn.commit()
+        except BaseException:
+            conn.rollback()
+            if engine is not None:
+                # Matched alerts were already taken out of the book
+                engine.reload()
+            raise
+        if progress is not None:
+            progress(read, written, rejected)
+    refresh_rollup(conn)
+    return read, written, rejected
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("paths", nargs="+", help="CSV or Parquet feed files")
+    parser.add_argument("--db", default=DB_PATH, help="database file (default: %(default)s)")
+    parser.add_argument("--batch-size", type=int, default=BATCH_SIZE, help="rows per chunk and transaction")
+    parser.add_argument("--price-scale", type=float, default=1.0,
+                        help="multiply prices by this, e.g. 0.01 for Rs/quintal to Rs/kg")
+    parser.add_argument("--dayfirst", action="store_true", help="parse dates as DD/MM/YYYY")
+    parser.add_argument("--no-alerts", action="store_true", help="do not match ticks against price alerts")
+    args = parser.parse_args()
+
+    conn = connect(args.db)
+    migrate(conn)
+    status = 0
+    for path in args.paths:
+        if not os.path.exists(path):
+            print(f"{path}: no such file", file=sys.stderr)
+            status = 1
+            continue
+        started = time.perf_counter()
+
+        def progress(read, written, rejected):
+            elapsed = time.perf_counter() - started
+            print(f"\r{path}: {read:,} rows read, {written:,} written, {rejected:,} rejected "
+                  f"({read / elapsed:,.0f} rows/s)", end="", flush=True)
+
+        read, written, rejected = ingest(conn, path, args.batch_size, args.price_scale, args.dayfirst,
+                                         alerts=not args.no_alerts, progress=progress)
+        elapsed = time.perf_counter() - started
+        print(f"\r{path}: {read:,} rows read, {written:,} written, {rejected:,} rejected "
+              f"in {elapsed:.1f}s ({read / max(elapsed, 1e-9):,.0f} rows/s)")
+    conn.close()
+    sys.exit(status)
@@ -0,0 +1,352 @@
+"""Opt-in timing of SQL statements, model calls and page renders
+
+    AGRIMART_INSTRUMENTATION=1 streamlit run app.py
+    AGRIMART_INSTRUMENTATION=1 AGRIMART_METRICS_PORT=9464 streamlit run app.py   # also serve /metrics
+    AGRIMART_INSTRUMENTATION=1 AGRIMART_ADMIN_USER_IDS=1,7 streamlit run app.py  # metrics page for users 1 and 7
+
+Durations go into an in-process registry of histograms, rendered in the
+Prometheus text format by render(), served over HTTP when a metrics port is
+set and shown on the app's hidden metrics page (?page=metrics).
+
+Statement labels are SQL text and the page also shows cache and model
+details, so neither is public: /metrics listens on 127.0.0.1 unless
+AGRIMART_METRICS_HOST says otherwise, and the metrics page is only shown
+to the logged-in users listed in AGRIMART_ADMIN_USER_IDS (nobody when unset).
+
+Switched off, timed() hands back the undecorated function and database
+connections are plain sqlite3 ones, so nothing is measured or wrapped.
+"""
+import logging
+import os
+import sqlite3
+import threading
+import time
+from bisect import bisect_left
+from functools import wraps
+
+logger = logging.getLogger(__name__)
+
+ENABLED = os.environ.get('AGRIMART_INSTRUMENTATION', '0') == '1'
+# 0 keeps the registry in-process only
+METRICS_PORT = int(os.environ.get('AGRIMART_METRICS_PORT', '0'))
+# Interface /metrics listens on; '' or 0.0.0.0 exposes it beyond this host
+METRICS_HOST = os.environ.get('AGRIMART_METRICS_HOST', '127.0.0.1')
+# Comma-separated user ids allowed on the ?page=metrics page
+ADMIN_USER_IDS = frozenset(int(user_id) for user_id in os.environ.get('AGRIMART_ADMIN_USER_IDS', '').split(',')
+                           if user_id.strip())
+
+# Upper bounds in seconds, from a cached statement to a slow page render
+BUCKETS = (0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+SQL_SECONDS = 'agrimart_sql_seconds'
+MODEL_SECONDS = 'agrimart_model_seconds'
+PAGE_SECONDS = 'agrimart_page_seconds'
+HELP = {
+    SQL_SECONDS: "SQL statement time from execute through the last fetched row",
+    MODEL_SECONDS: "Model prediction calls",
+    PAGE_SECONDS: "Page functions of app.py, including the widgets they render",
+}
+# Statements are labelled by their text; keep long ones readable
+STATEMENT_LABEL_LENGTH = 160
+
+
+class Histogram:
+    """Cumulative-bucket histogram of durations in seconds"""
+
+    def __init__(self, buckets=BUCKETS):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.sum = 0.0
+        self.count = 0
+        self._lock = threading.Lock()
+
+    def observe(self, seconds):
+        with self._lock:
+            self.counts[bisect_left(self.buckets, seconds)] += 1
+            self.sum += seconds
+            self.count += 1
+
+    def snapshot(self):
+        """(per-bucket counts, sum, count), read consistently"""
+        with self._lock:
+            return list(self.counts), self.sum, self.count
+
+    def quantile(self, q):
+        """Estimate the q quantile by interpolating inside its bucket, like Prometheus does"""
+        counts, _, count = self.snapshot()
+        if count == 0:
+            return None
+        rank = q * count
+        seen = 0
+        for i, bucket_count in enumerate(counts):
+            if seen + bucket_count >= rank and bucket_count:
+                if i == len(self.buckets):
+                    # Beyond the last bound there is nothing to interpolate towards
+                    return self.buckets[-1]
+                lower = self.buckets[i - 1] if i else 0.0
+                return lower + (self.buckets[i] - lower) * (rank - seen) / bucket_count
+            seen += bucket_count
+        return self.buckets[-1]
+
+
+class Registry:
+    """Histograms keyed on metric name and label values"""
+
+    def __init__(self, buckets=BUCKETS):
+        self.buckets = buckets
+        self._histograms = {}
+        self._lock = threading.Lock()
+
+    def observe(self, name, seconds, **labels):
+        key = (name, tuple(sorted(labels.items())))
+        histogram = self._histograms.get(key)
+        if histogram is None:
+            with self._lock:
+                histogram = self._histograms.setdefault(key, Histogram(self.buckets))
+        histogram.observe(seconds)
+
+    def histograms(self, name=None):
+        """[(name, labels, Histogram)], optionally of one metric only"""
+        with self._lock:
+            items = list(self._histograms.items())
+        return [(metric, dict(labels), histogram) for (metric, labels), histogram in sorted(items)
+                if name is None or metric == name]
+
+    def render(self):
+        """Every histogram in the Prometheus text exposition format"""
+        lines = []
+        current = None
+        for name, labels, histogram in self.histograms():
+            if name != current:
+                current = name
+                lines.append(f"# HELP {name} {HELP.get(name, name)}")
+                lines.append(f"# TYPE {name} histogram")
+            counts, total, count = histogram.snapshot()
+            cumulative = 0
+            for bound, bucket_count in zip(list(self.buckets) + ['+Inf'], counts):
+                cumulative += bucket_count
+                lines.append(f"{name}_bucket{_labels(labels, le=bound)} {cumulative}")
+            lines.append(f"{name}_sum{_labels(labels)} {total!r}")
+            lines.append(f"{name}_count{_labels(labels)} {count}")
+        return "\n".join(lines) + "\n"
+
+    def clear(self):
+        with self._lock:
+            self._histograms.clear()
+
+
+def _labels(labels, **extra):
+    pairs = list(labels.items()) + list(extra.items())
+    if not pairs:
+        return ""
+    escaped = (str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n') for _, value in pairs)
+    return "{" + ",".join(f'{key}="{value}"' for (key, _), value in zip(pairs, escaped)) + "}"
+
+
+# Shared by every Streamlit session in this process
+registry = Registry()
+
+
+def observe(name, seconds, **labels):
+    """Record one duration in the process-wide registry"""
+    registry.observe(name, seconds, **labels)
+
+
+def histograms(name=None):
+    """[(name, labels, Histogram)] of the process-wide registry"""
+    return registry.histograms(name)
+
+
+def render():
+    """The process-wide registry in the Prometheus text format"""
+    return registry.render()
+
+
+def timed(name, **labels):
+    """Decorator recording each call's duration under name, labelled with the function
+
+    Returns the function itself when instrumentation is off.
+    """
+    def decorate(function):
+        if not ENABLED:
+            return function
+        call_labels = dict(labels, function=function.__qualname__)
+
+        @wraps(function)
+        def wrapper(*args, **kwargs):
+            started = time.perf_counter()
+            try:
+                return function(*args, **kwargs)
+            finally:
+                # Also reached by st.rerun() and st.stop(), which raise out of pages
+                registry.observe(name, time.perf_counter() - started, **call_labels)
+        return wrapper
+    return decorate
+
+
+def statement_label(sql):
+    """Whitespace-collapsed statement text, cut to STATEMENT_LABEL_LENGTH"""
+    text = " ".join(sql.split())
+    return text if len(text) <= STATEMENT_LABEL_LENGTH else text[:STATEMENT_LABEL_LENGTH - 3] + "..."
+
+
+class InstrumentedCursor(sqlite3.Cursor):
+    """Cursor that times each statement across execute and every fetch of its rows
+
+    A statement is recorded once its rows are exhausted, the cursor runs the
+    next statement or the cursor goes away.
+    """
+
+    def __init__(self, connection):
+        super().__init__(connection)
+        self._sql = None
+        self._elapsed = 0.0
+
+    def _timed(self, method, *args):
+        started = time.perf_counter()
+        try:
+            return method(*args)
+        finally:
+            self._elapsed += time.perf_counter() - started
+
+    def _finish(self):
+        if self._sql is None:
+            return
+        sql, elapsed, self._sql, self._elapsed = self._sql, self._elapsed, None, 0.0
+        registry.observe(SQL_SECONDS, elapsed, statement=statement_label(sql))
+        if logger.isEnabledFor(logging.DEBUG):
+            traced = self.connection.take_traced()
+            logger.debug("%.3fms %s", elapsed * 1000, " | ".join(traced) or statement_label(sql))
+
+    def execute(self, sql, parameters=()):
+        self._finish()
+        self._sql = sql
+        self.connection.take_traced()
+        try:
+            return self._timed(super().execute, sql, parameters)
+        finally:
+            if self.description is None:
+                # Writes and DDL return no rows; they are done already
+                self._finish()
+
+    def executemany(self, sql, seq_of_parameters):
+        self._finish()
+        self._sql = sql
+        self.connection.take_traced()
+        try:
+            return self._timed(super().executemany, sql, seq_of_parameters)
+        finally:
+            self._finish()
+
+    def fetchone(self):
+        row = self._timed(super().fetchone)
+        if row is None:
+            self._finish()
+        return row
+
+    def fetchmany(self, size=None):
+        rows = self._timed(super().fetchmany, self.arraysize if size is None else size)
+        if not rows:
+            self._finish()
+        return rows
+
+    def fetchall(self):
+        try:
+            return self._timed(super().fetchall)
+        finally:
+            self._finish()
+
+    def __next__(self):
+        try:
+            return self._timed(super().__next__)
+        except StopIteration:
+            self._finish()
+            raise
+
+    def close(self):
+        self._finish()
+        super().close()
+
+    def __del__(self):
+        self._finish()
+
+
+class InstrumentedConnection(sqlite3.Connection):
+    """Connection whose cursors time their statements
+
+    sqlite3's trace callback reports every statement SQLite starts, trigger
+    bodies included; the debug log lists them next to each duration.
+    """
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._traced = []
+        self.set_trace_callback(self._traced.append)
+
+    def take_traced(self):
+        traced, self._traced[:] = list(self._traced), []
+        return traced
+
+    def cursor(self, factory=InstrumentedCursor):
+        return super().cursor(factory)
+
+
+def connection_factory():
+    """Connection class for sqlite3.connect(factory=...)"""
+    return InstrumentedConnection if ENABLED else sqlite3.Connection
+
+
+def can_view_metrics(user_id):
+    """Whether the logged-in user_id may open the metrics page"""
+    return ENABLED and user_id in ADMIN_USER_IDS
+
+
+def _metrics_server(port, host=METRICS_HOST):
+    # http.server is only imported by processes that serve metrics
+    from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+    class MetricsHandler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            if self.path.split('?')[0] != '/metrics':
+                self.send_error(404)
+                return
+            body = render().encode()
+            self.send_response(200)
+            self.send_header('Content-Type', 'text/plain; version=0.0.4; charset=utf-8')
+            self.send_header('Content-Length', str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, format, *args):
+            logger.debug("metrics: " + format, *args)
+
+    server = ThreadingHTTPServer((host, port), MetricsHandler)
+    server.daemon_threads = True
+    return server
+
+
+_server = None
+_server_lock = threading.Lock()
+
+
+def get_server(port=METRICS_PORT, host=METRICS_HOST):
+    """Serve GET /metrics on host:port from a daemon thread; started once per process
+
+    Returns None when instrumentation is off, no port is set or the port is taken.
+    """
+    global _server
+    if not ENABLED or not port:
+        return None
+    if _server is None:
+        with _server_lock:
+            if _server is None:
+                try:
+                    server = _metrics_server(port, host)
+                except OSError:
+                    logger.exception("Could not serve metrics on %s:%d", host, port)
+                    # Do not retry on every rerun
+                    _server = False
+                    return None
+                threading.Thread(target=server.serve_forever, name='agrimart-metrics', daemon=True).start()
+                _server = server
+    return _server or None
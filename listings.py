@@ -0,0 +1,89 @@
+"""Keyset-paginated crop listing feeds for the marketplace"""
+import sqlite3
+
+from crop_search import search_join
+
+PAGE_SIZES = [10, 25, 50]
+PAGE_SIZE = PAGE_SIZES[0]
+
+# Sort option -> (column, direction); every sort is tie-broken on c.id so the
+# (key, id) pair of the last row on a page is a stable cursor.
+SORTS = {
+    "Price (Low to High)": ("c.price", "ASC"),
+    "Price (High to Low)": ("c.price", "DESC"),
+    "Newest": ("c.created_at", "DESC"),
+    "Quantity": ("c.quantity", "DESC"),
+}
+BEST_MATCH = "Best Match"
+
+
+def page_query(conn, sort="Newest", after=None, page_size=PAGE_SIZE,
+               exclude_user=None, owner=None, in_stock=False, search_term="", category=None):
+    """Build the (sql, params) fetch_page runs; query_plans checks the same statements"""
+    params = []
+    where = []
+    rank_column = None
+
+    search = search_join(conn, search_term) if search_term else None
+    if search:
+        _, join_params, rank_column = search
+        params.extend(join_params)
+    elif search_term:
+        # Too short for the trigram index, match on the name prefix
+        where.append("c.name LIKE ?")
+        params.append(f"{search_term}%")
+
+    if exclude_user is not None:
+        where.append("c.user_id != ?")
+        params.append(exclude_user)
+    if owner is not None:
+        where.append("c.user_id = ?")
+        params.append(owner)
+    if in_stock:
+        # Unary + keeps the planner on the sort index instead of a quantity range
+        where.append("+c.quantity > 0")
+    if category:
+        where.append("c.category = ?")
+        params.append(category)
+
+    if sort == BEST_MATCH and rank_column:
+        key, direction = rank_column, "ASC"
+    else:
+        key, direction = SORTS.get(sort, SORTS["Newest"])
+
+    query = f"""
+        SELECT c.*, u.name as seller_name, u.phone as seller_phone, {key} as sort_key
+        FROM crops c
+        JOIN users u ON c.user_id = u.id
+    """
+    if search:
+        query += " " + search[0]
+
+    if after is not None:
+        where.append(f"({key}, c.id) {'>' if direction == 'ASC' else '<'} (?, ?)")
+        params.extend(after)
+
+    if where:
+        query += " WHERE " + " AND ".join(where)
+    query += f" ORDER BY {key} {direction}, c.id {direction} LIMIT ?"
+    # One extra row tells us whether there is a next page
+    params.append(page_size + 1)
+    return query, params
+
+
+def fetch_page(conn, sort="Newest", after=None, page_size=PAGE_SIZE,
+               exclude_user=None, owner=None, in_stock=False, search_term="", category=None):
+    """Fetch one page of listings
+
+    after is the cursor returned for the previous page (None for the first).
+    Returns (rows, next_cursor); next_cursor is None on the last page.
+    """
+    query, params = page_query(conn, sort, after, page_size, exclude_user, owner, in_stock, search_term, category)
+    cursor = conn.cursor()
+    cursor.row_factory = sqlite3.Row
+    rows = cursor.execute(query, params).fetchall()
+    if len(rows) <= page_size:
+        return rows, None
+
+    rows = rows[:page_size]
+    return rows, (rows[-1]["sort_key"], rows[-1]["id"])
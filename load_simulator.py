@@ -0,0 +1,271 @@
+"""Drive many concurrent app sessions and report how the app holds up as concurrency rises
+
+    python load_simulator.py                            # 1, 4, 16 and 32 sessions on the 10k database
+    python load_simulator.py --levels 8 64 --duration 60
+    python load_simulator.py --db smart_agriculture.db --output load.json
+
+Every session is a farmer's morning visit replayed through Streamlit's
+AppTest: log in with login_user, browse and page the marketplace, buy a
+listing, submit both recommendation forms and check the orders page and
+dashboard. Sessions repeat visits until the level's --duration is up.
+
+AppTest patches process-wide Streamlit state on every run, so each session
+gets its own forked worker process, like a server replica per session on
+one database file. That contends for SQLite locks at least as hard as the
+threads of a single server do.
+
+The run works on a copy of the source database, so the orders it places
+never reach the original. Per level it reports throughput, rerun latency
+percentiles per step and the number of "database is locked" errors, both
+raised into the page and swallowed and logged by background writers.
+"""
+import json
+import logging
+import multiprocessing
+import os
+import random
+import shutil
+import sys
+import tempfile
+import time
+from collections import Counter, defaultdict
+
+from benchmark import BASE_DIR, SIZES, database_path, summarize
+
+LEVELS = [1, 4, 16, 32]
+DURATION = 30.0
+# All workers of a level start together once every one of them is forked
+START_DELAY = 2.0
+RUN_TIMEOUT = 120
+LOCKED = "database is locked"
+
+PAGES = {
+    'dashboard': "🏠 Dashboard",
+    'marketplace': "🛒 Marketplace",
+    'crop_recommendation': "🌱 Crop Recommendation",
+    'fertilizer_recommendation': "🧪 Fertilizer Recommendation",
+    'orders': "📦 My Orders",
+}
+# Form inputs and the ranges farmers type into them
+CROP_FORM = {
+    "Nitrogen (N)": (0, 140), "Phosphorus (P)": (5, 145), "Potassium (K)": (5, 205),
+    "pH Level": (3.5, 9.9), "Temperature (°C)": (9, 43), "Humidity (%)": (15, 99), "Rainfall (mm)": (21, 298),
+}
+FERTILIZER_FORM = {
+    "Soil Nitrogen (kg/ha)": (4, 42), "Soil Phosphorus (kg/ha)": (0, 42), "Soil Potassium (kg/ha)": (0, 19),
+    "Soil Moisture (%)": (25, 65), "Fertilizer Temperature (°C)": (25, 38), "Fertilizer Humidity (%)": (50, 72),
+}
+
+
+class LockCounter(logging.Handler):
+    """Counts logged exceptions caused by a locked database"""
+
+    def __init__(self):
+        super().__init__()
+        self.count = 0
+
+    def emit(self, record):
+        if record.exc_info and LOCKED in str(record.exc_info[1]):
+            self.count += 1
+
+
+class Session:
+    """One simulated farmer; every step is one timed script rerun"""
+
+    def __init__(self, phone, rng):
+        from streamlit.testing.v1 import AppTest
+
+        self.app = AppTest.from_file(os.path.join(BASE_DIR, 'app.py'), default_timeout=RUN_TIMEOUT)
+        self.phone = phone
+        self.rng = rng
+        self.samples = []
+
+    def step(self, name, action=None):
+        """Apply action to the widgets, rerun and record (step, ms, outcome)"""
+        started = time.perf_counter()
+        try:
+            if action is not None:
+                action(self.app)
+            self.app.run()
+        except Exception as error:
+            # The run itself failed, e.g. timed out; the visit cannot go on
+            self.samples.append((name, (time.perf_counter() - started) * 1000, _outcome(str(error))))
+            raise
+        outcome = 'ok'
+        if self.app.exception:
+            outcome = _outcome(self.app.exception[0].message)
+        self.samples.append((name, (time.perf_counter() - started) * 1000, outcome))
+        return outcome
+
+    def open(self, page):
+        return self.step(page, lambda app: app.sidebar.selectbox[0].set_value(PAGES[page]))
+
+    def fill(self, app, fields, submit):
+        for label, (low, high) in fields.items():
+            widget = _labelled(app.number_input, label)
+            value = self.rng.uniform(low, high)
+            widget.set_value(round(value, 1) if isinstance(widget.value, float) else int(value))
+        _labelled(app.button, submit).click()
+
+    def visit(self):
+        self.step('login_page')
+        self.step('login', lambda app: (_labelled(app.text_input, "📱 Phone Number").input(self.phone),
+                                        _labelled(app.button, "🚀 Login").click()))
+        if not self.app.session_state.logged_in:
+            raise RuntimeError(f"Could not log in as {self.phone}")
+
+        self.open('marketplace')
+        pager = [button for button in self.app.button if button.key == 'buy_page_next']
+        if pager and not pager[0].disabled and self.rng.random() < 0.5:
+            self.step('marketplace_next_page', lambda app: app.button(key='buy_page_next').click())
+        listings = [button.key for button in self.app.button
+                    if button.key and button.key.startswith('buy_') and button.key[4:].isdigit()]
+        if listings:
+            self.step('buy', lambda app: app.button(key=self.rng.choice(listings)).click())
+
+        self.open('crop_recommendation')
+        self.step('crop_form', lambda app: self.fill(app, CROP_FORM, "🔍 Get Recommendation"))
+        self.open('fertilizer_recommendation')
+        self.step('fertilizer_form', lambda app: self.fill(app, FERTILIZER_FORM, "🔬 Get Fertilizer Recommendation"))
+        self.open('orders')
+        self.open('dashboard')
+
+
+def _labelled(elements, label):
+    return next(element for element in elements if element.label == label)
+
+
+def _outcome(message):
+    return 'locked' if LOCKED in message else 'error'
+
+
+def _worker(path, phone, seed, start, deadline, results):
+    import database
+
+    locks = LockCounter()
+    logging.getLogger().addHandler(locks)
+    database.use_database(path)
+    rng = random.Random(seed)
+    samples, visits, failed = [], 0, Counter()
+
+    time.sleep(max(0.0, start - time.time()))
+    while time.time() < deadline:
+        session = Session(phone, rng)
+        try:
+            session.visit()
+            visits += 1
+        except Exception as error:
+            failed[type(error).__name__] += 1
+        samples.extend(session.samples)
+    results.put({'samples': samples, 'visits': visits, 'failed': dict(failed), 'logged_locked': locks.count})
+
+
+def phones(path, count, seed=0):
+    """count distinct phone numbers of users that exist in path"""
+    from database import connect
+
+    conn = connect(path)
+    try:
+        rows = conn.execute("SELECT phone FROM users WHERE phone IS NOT NULL AND phone != '' ORDER BY id").fetchall()
+    finally:
+        conn.close()
+    if not rows:
+        raise SystemExit(f"No users with a phone number in {path}")
+    rng = random.Random(seed)
+    picked = rng.sample(rows, min(count, len(rows)))
+    # Levels bigger than the user table share accounts between sessions
+    return [picked[i % len(picked)][0] for i in range(count)]
+
+
+def run_level(path, sessions, duration=DURATION, seed=0):
+    """Run sessions concurrent workers for duration seconds and summarize them"""
+    context = multiprocessing.get_context('fork')
+    results = context.Queue()
+    start = time.time() + START_DELAY
+    deadline = start + duration
+    workers = [context.Process(target=_worker, args=(path, phone, seed * 100_003 + i, start, deadline, results))
+               for i, phone in enumerate(phones(path, sessions, seed))]
+    for worker in workers:
+        worker.start()
+    reports = [results.get() for _ in workers]
+    for worker in workers:
+        worker.join()
+    elapsed = time.time() - start
+
+    samples = [sample for report in reports for sample in report['samples']]
+    outcomes = Counter(outcome for _, _, outcome in samples)
+    by_step = defaultdict(list)
+    for step, ms, _ in samples:
+        by_step[step].append(ms)
+    failed = Counter()
+    for report in reports:
+        failed.update(report['failed'])
+    return {
+        'sessions': sessions,
+        'seconds': round(elapsed, 2),
+        'visits': sum(report['visits'] for report in reports),
+        'failed_visits': dict(failed),
+        'reruns': len(samples),
+        'reruns_per_second': round(len(samples) / elapsed, 2),
+        'locked_errors': outcomes['locked'],
+        'logged_locked_errors': sum(report['logged_locked'] for report in reports),
+        'other_errors': outcomes['error'],
+        'latency': summarize([ms for _, ms, _ in samples]) if samples else None,
+        'steps': {step: summarize(values) for step, values in sorted(by_step.items())},
+    }
+
+
+def print_level(level):
+    latency = level['latency'] or {'p50_ms': 0, 'p95_ms': 0, 'p99_ms': 0}
+    print(f"{level['sessions']:>8}  {level['visits']:>6}  {level['reruns_per_second']:>9.1f}  "
+          f"{latency['p50_ms']:>8.0f}ms  {latency['p95_ms']:>8.0f}ms  {latency['p99_ms']:>8.0f}ms  "
+          f"{level['locked_errors']:>6}  {level['logged_locked_errors']:>6}  {level['other_errors']:>6}", flush=True)
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--db", help="database to copy and load (default: the generated --size database)")
+    parser.add_argument("--size", choices=list(SIZES), default='10k', help="generated database size (default: %(default)s)")
+    parser.add_argument("--data-dir", help="where generated databases are kept (default: a temp directory)")
+    parser.add_argument("--levels", nargs="+", type=int, default=LEVELS, help="concurrent sessions per level")
+    parser.add_argument("--duration", type=float, default=DURATION, help="seconds per level (default: %(default)s)")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output", help="also write the results to this JSON file")
+    parser.add_argument("-v", "--verbose", action="store_true", help="show the steps of every level")
+    args = parser.parse_args()
+
+    source = args.db or database_path(args.data_dir or os.path.join(tempfile.gettempdir(), 'agrimart-bench'), args.size)
+    if not os.path.exists(source):
+        parser.error(f"{source} does not exist")
+
+    # Load the app's dependencies and models once so every forked session shares them
+    import app  # noqa: F401
+    from fast_inference import get_crop_predictor, get_fertilizer_predictor
+
+    get_crop_predictor()
+    get_fertilizer_predictor()
+
+    with tempfile.TemporaryDirectory() as scratch:
+        levels = []
+        print(f"{'sessions':>8}  {'visits':>6}  {'reruns/s':>9}  {'p50':>10}  {'p95':>10}  {'p99':>10}  "
+              f"{'locked':>6}  {'logged':>6}  {'errors':>6}")
+        for sessions in args.levels:
+            path = os.path.join(scratch, f"load-{sessions}.db")
+            shutil.copy(source, path)
+            level = run_level(path, sessions, args.duration, args.seed)
+            levels.append(level)
+            print_level(level)
+            if args.verbose:
+                for step, result in level['steps'].items():
+                    print(f"    {step:<26} {result['n']:>6}  p50 {result['p50_ms']:>8.0f}ms  "
+                          f"p95 {result['p95_ms']:>8.0f}ms  p99 {result['p99_ms']:>8.0f}ms")
+
+    if args.output:
+        with open(args.output, 'w') as file:
+            json.dump({'source': source, 'duration': args.duration, 'levels': levels}, file, indent=2)
+            file.write("\n")
+        print(f"Wrote {args.output}")
+    if any(level['locked_errors'] or level['logged_locked_errors'] for level in levels):
+        sys.exit(1)
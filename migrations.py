@@ -0,0 +1,431 @@
+"""Versioned schema migrations keyed on PRAGMA user_version
+
+This is the only place tables, indexes and triggers are defined. Append new
+migrations to MIGRATIONS; never edit one that has already shipped.
+"""
+import logging
+import sqlite3
+
+logger = logging.getLogger(__name__)
+
+MIGRATIONS = [
+    (1, "Create users, crops, orders and price_history tables", """
+        CREATE TABLE IF NOT EXISTS users (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            name TEXT NOT NULL,
+            phone TEXT UNIQUE NOT NULL,
+            email TEXT,
+            location TEXT,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        );
+
+        CREATE TABLE IF NOT EXISTS crops (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            name TEXT NOT NULL,
+            description TEXT,
+            price REAL NOT NULL,
+            quantity INTEGER NOT NULL,
+            unit TEXT DEFAULT 'kg',
+            user_id INTEGER,
+            image_url TEXT,
+            category TEXT,
+            harvest_date DATE,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            FOREIGN KEY (user_id) REFERENCES users (id)
+        );
+
+        CREATE TABLE IF NOT EXISTS orders (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            crop_id INTEGER,
+            buyer_id INTEGER,
+            seller_id INTEGER,
+            quantity INTEGER,
+            total_price REAL,
+            status TEXT DEFAULT 'pending',
+            order_date TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            FOREIGN KEY (crop_id) REFERENCES crops (id),
+            FOREIGN KEY (buyer_id) REFERENCES users (id),
+            FOREIGN KEY (seller_id) REFERENCES users (id)
+        );
+
+        CREATE TABLE IF NOT EXISTS price_history (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            crop_name TEXT NOT NULL,
+            price REAL NOT NULL,
+            market TEXT,
+            date DATE,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        );
+    """),
+    (2, "Add secondary indexes for marketplace, orders and profile queries", """
+        -- Marketplace sorts, with and without a category filter
+        CREATE INDEX IF NOT EXISTS idx_crops_price ON crops (price);
+        CREATE INDEX IF NOT EXISTS idx_crops_created_at ON crops (created_at);
+        CREATE INDEX IF NOT EXISTS idx_crops_quantity ON crops (quantity);
+        CREATE INDEX IF NOT EXISTS idx_crops_category_price ON crops (category, price);
+        CREATE INDEX IF NOT EXISTS idx_crops_category_created_at ON crops (category, created_at);
+        CREATE INDEX IF NOT EXISTS idx_crops_category_quantity ON crops (category, quantity);
+
+        -- My listings and per-user listing counts
+        CREATE INDEX IF NOT EXISTS idx_crops_user_created_at ON crops (user_id, created_at);
+
+        -- Purchases and sales pages, per-user order counts
+        CREATE INDEX IF NOT EXISTS idx_orders_buyer_date ON orders (buyer_id, order_date);
+        CREATE INDEX IF NOT EXISTS idx_orders_seller_date ON orders (seller_id, order_date);
+
+        -- Delivered earnings, answered from the index alone
+        CREATE INDEX IF NOT EXISTS idx_orders_seller_status_total ON orders (seller_id, status, total_price);
+    """),
+    (3, "Add crops_fts trigram full-text index over crop name, description and category", """
+        CREATE VIRTUAL TABLE IF NOT EXISTS crops_fts USING fts5(
+            name, description, category,
+            content='crops', content_rowid='id',
+            tokenize='trigram'
+        );
+
+        CREATE TRIGGER IF NOT EXISTS crops_fts_insert AFTER INSERT ON crops BEGIN
+            INSERT INTO crops_fts (rowid, name, description, category)
+            VALUES (new.id, new.name, new.description, new.category);
+        END;
+
+        CREATE TRIGGER IF NOT EXISTS crops_fts_delete AFTER DELETE ON crops BEGIN
+            INSERT INTO crops_fts (crops_fts, rowid, name, description, category)
+            VALUES ('delete', old.id, old.name, old.description, old.category);
+        END;
+
+        CREATE TRIGGER IF NOT EXISTS crops_fts_update AFTER UPDATE OF name, description, category ON crops BEGIN
+            INSERT INTO crops_fts (crops_fts, rowid, name, description, category)
+            VALUES ('delete', old.id, old.name, old.description, old.category);
+            INSERT INTO crops_fts (rowid, name, description, category)
+            VALUES (new.id, new.name, new.description, new.category);
+        END;
+
+        INSERT INTO crops_fts (crops_fts) VALUES ('rebuild');
+    """),
+    (4, "Add trigger-maintained stats counters for the dashboard and profile", """
+        -- user_id 0 holds the global totals: listings = all crops,
+        -- purchases = sales = all orders, earnings = all delivered orders
+        CREATE TABLE IF NOT EXISTS stats (
+            user_id INTEGER PRIMARY KEY,
+            listings INTEGER NOT NULL DEFAULT 0,
+            purchases INTEGER NOT NULL DEFAULT 0,
+            sales INTEGER NOT NULL DEFAULT 0,
+            earnings REAL NOT NULL DEFAULT 0,
+            users INTEGER NOT NULL DEFAULT 0
+        );
+
+        CREATE TRIGGER IF NOT EXISTS stats_users_insert AFTER INSERT ON users BEGIN
+            UPDATE stats SET users = users + 1 WHERE user_id = 0;
+        END;
+
+        CREATE TRIGGER IF NOT EXISTS stats_users_delete AFTER DELETE ON users BEGIN
+            UPDATE stats SET users = users - 1 WHERE user_id = 0;
+        END;
+
+        CREATE TRIGGER IF NOT EXISTS stats_crops_insert AFTER INSERT ON crops BEGIN
+            INSERT OR IGNORE INTO stats (user_id) SELECT new.user_id WHERE new.user_id IS NOT NULL;
+            UPDATE stats SET listings = listings + 1 WHERE user_id IN (0, new.user_id);
+        END;
+
+        CREATE TRIGGER IF NOT EXISTS stats_crops_delete AFTER DELETE ON crops BEGIN
+            UPDATE stats SET listings = listings - 1 WHERE user_id IN (0, old.user_id);
+        END;
+
+        CREATE TRIGGER IF NOT EXISTS stats_crops_update AFTER UPDATE OF user_id ON crops
+        WHEN old.user_id IS NOT new.user_id BEGIN
+            INSERT OR IGNORE INTO stats (user_id) SELECT new.user_id WHERE new.user_id IS NOT NULL;
+            UPDATE stats SET listings = listings - 1 WHERE user_id = old.user_id;
+            UPDATE stats SET listings = listings + 1 WHERE user_id = new.user_id;
+        END;
+
+        CREATE TRIGGER IF NOT EXISTS stats_orders_insert AFTER INSERT ON orders BEGIN
+            INSERT OR IGNORE INTO stats (user_id) SELECT new.buyer_id WHERE new.buyer_id IS NOT NULL;
+            INSERT OR IGNORE INTO stats (user_id) SELECT new.seller_id WHERE new.seller_id IS NOT NULL;
+            UPDATE stats SET purchases = purchases + 1 WHERE user_id IN (0, new.buyer_id);
+            UPDATE stats SET
+                sales = sales + 1,
+                earnings = earnings + IIF(new.status = 'delivered', IFNULL(new.total_price, 0), 0)
+            WHERE user_id IN (0, new.seller_id);
+        END;
+
+        CREATE TRIGGER IF NOT EXISTS stats_orders_delete AFTER DELETE ON orders BEGIN
+            UPDATE stats SET purchases = purchases - 1 WHERE user_id IN (0, old.buyer_id);
+            UPDATE stats SET
+                sales = sales - 1,
+                earnings = earnings - IIF(old.status = 'delivered', IFNULL(old.total_price, 0), 0)
+            WHERE user_id IN (0, old.seller_id);
+        END;
+
+        CREATE TRIGGER IF NOT EXISTS stats_orders_update AFTER UPDATE OF buyer_id, seller_id, status, total_price ON orders
+        WHEN old.buyer_id IS NOT new.buyer_id
+            OR old.seller_id IS NOT new.seller_id
+            OR (old.status = 'delivered') IS NOT (new.status = 'delivered')
+            OR (new.status = 'delivered' AND old.total_price IS NOT new.total_price)
+        BEGIN
+            INSERT OR IGNORE INTO stats (user_id) SELECT new.buyer_id WHERE new.buyer_id IS NOT NULL;
+            INSERT OR IGNORE INTO stats (user_id) SELECT new.seller_id WHERE new.seller_id IS NOT NULL;
+            UPDATE stats SET purchases = purchases - 1 WHERE user_id = old.buyer_id;
+            UPDATE stats SET purchases = purchases + 1 WHERE user_id = new.buyer_id;
+            UPDATE stats SET
+                sales = sales - 1,
+                earnings = earnings - IIF(old.status = 'delivered', IFNULL(old.total_price, 0), 0)
+            WHERE user_id = old.seller_id;
+            UPDATE stats SET
+                sales = sales + 1,
+                earnings = earnings + IIF(new.status = 'delivered', IFNULL(new.total_price, 0), 0)
+            WHERE user_id = new.seller_id;
+            UPDATE stats SET earnings = earnings
+                - IIF(old.status = 'delivered', IFNULL(old.total_price, 0), 0)
+                + IIF(new.status = 'delivered', IFNULL(new.total_price, 0), 0)
+            WHERE user_id = 0;
+        END;
+
+        -- Backfill from the existing rows
+        INSERT OR REPLACE INTO stats (user_id, listings, purchases, sales, earnings, users)
+        SELECT 0,
+            (SELECT COUNT(*) FROM crops),
+            (SELECT COUNT(*) FROM orders),
+            (SELECT COUNT(*) FROM orders),
+            (SELECT IFNULL(SUM(total_price), 0) FROM orders WHERE status = 'delivered'),
+            (SELECT COUNT(*) FROM users);
+
+        INSERT OR REPLACE INTO stats (user_id, listings, purchases, sales, earnings)
+        SELECT ids.id,
+            (SELECT COUNT(*) FROM crops WHERE user_id = ids.id),
+            (SELECT COUNT(*) FROM orders WHERE buyer_id = ids.id),
+            (SELECT COUNT(*) FROM orders WHERE seller_id = ids.id),
+            (SELECT IFNULL(SUM(total_price), 0) FROM orders WHERE seller_id = ids.id AND status = 'delivered')
+        FROM (
+            SELECT user_id AS id FROM crops
+            UNION SELECT buyer_id FROM orders
+            UNION SELECT seller_id FROM orders
+        ) ids
+        WHERE ids.id IS NOT NULL;
+    """),
+    (5, "Add weather_cache for geo-bucketed weather responses", """
+        CREATE TABLE IF NOT EXISTS weather_cache (
+            bucket TEXT PRIMARY KEY,
+            payload TEXT NOT NULL,
+            fetched_at REAL NOT NULL
+        );
+    """),
+    (6, "Add the price_daily rollup with trigger-tracked dirty days", """
+        CREATE INDEX IF NOT EXISTS idx_price_history_crop_date ON price_history (crop_name, date);
+
+        -- One row per crop per day, aggregated over every market
+        CREATE TABLE IF NOT EXISTS price_daily (
+            crop_name TEXT NOT NULL,
+            date DATE NOT NULL,
+            avg_price REAL NOT NULL,
+            min_price REAL NOT NULL,
+            max_price REAL NOT NULL,
+            ticks INTEGER NOT NULL,
+            markets INTEGER NOT NULL,
+            PRIMARY KEY (crop_name, date)
+        ) WITHOUT ROWID;
+
+        -- (crop, day) groups whose rollup row must be recomputed
+        CREATE TABLE IF NOT EXISTS price_daily_dirty (
+            crop_name TEXT NOT NULL,
+            date DATE NOT NULL,
+            PRIMARY KEY (crop_name, date)
+        ) WITHOUT ROWID;
+
+        CREATE TRIGGER IF NOT EXISTS price_daily_dirty_insert AFTER INSERT ON price_history
+        WHEN new.date IS NOT NULL BEGIN
+            INSERT OR IGNORE INTO price_daily_dirty (crop_name, date) VALUES (new.crop_name, new.date);
+        END;
+
+        CREATE TRIGGER IF NOT EXISTS price_daily_dirty_update AFTER UPDATE OF crop_name, price, market, date ON price_history BEGIN
+            INSERT OR IGNORE INTO price_daily_dirty (crop_name, date)
+            SELECT old.crop_name, old.date WHERE old.date IS NOT NULL;
+            INSERT OR IGNORE INTO price_daily_dirty (crop_name, date)
+            SELECT new.crop_name, new.date WHERE new.date IS NOT NULL;
+        END;
+
+        CREATE TRIGGER IF NOT EXISTS price_daily_dirty_delete AFTER DELETE ON price_history
+        WHEN old.date IS NOT NULL BEGIN
+            INSERT OR IGNORE INTO price_daily_dirty (crop_name, date) VALUES (old.crop_name, old.date);
+        END;
+
+        INSERT OR IGNORE INTO price_daily_dirty (crop_name, date)
+        SELECT DISTINCT crop_name, date FROM price_history WHERE date IS NOT NULL;
+    """),
+    (7, "Add price_alerts and the price tick watermark for alert matching", """
+        CREATE TABLE IF NOT EXISTS price_alerts (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            user_id INTEGER NOT NULL,
+            crop_name TEXT NOT NULL,
+            direction TEXT NOT NULL CHECK (direction IN ('below', 'above')),
+            threshold REAL NOT NULL,
+            status TEXT NOT NULL DEFAULT 'active',
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            triggered_at TIMESTAMP,
+            triggered_price REAL,
+            triggered_market TEXT,
+            delivered_at TIMESTAMP,
+            FOREIGN KEY (user_id) REFERENCES users (id)
+        );
+
+        -- A user's alerts, newest first
+        CREATE INDEX IF NOT EXISTS idx_price_alerts_user_created_at ON price_alerts (user_id, created_at);
+
+        -- Loading the active thresholds already sorted per crop and direction
+        CREATE INDEX IF NOT EXISTS idx_price_alerts_active
+        ON price_alerts (crop_name, direction, threshold) WHERE status = 'active';
+
+        -- Triggered alerts still waiting for delivery
+        CREATE INDEX IF NOT EXISTS idx_price_alerts_undelivered
+        ON price_alerts (triggered_at) WHERE status = 'triggered' AND delivered_at IS NULL;
+
+        -- Last price_history id the alert engine has matched; existing
+        -- history is treated as already seen
+        CREATE TABLE IF NOT EXISTS price_alert_state (
+            id INTEGER PRIMARY KEY CHECK (id = 0),
+            last_tick_id INTEGER NOT NULL
+        );
+
+        INSERT OR IGNORE INTO price_alert_state (id, last_tick_id)
+        SELECT 0, IFNULL(MAX(id), 0) FROM price_history;
+    """),
+    (8, "Make price_history unique per crop, day and market", """
+        -- Keep the newest tick of each duplicate group
+        DELETE FROM price_history
+        WHERE id NOT IN (SELECT MAX(id) FROM price_history GROUP BY crop_name, date, market);
+
+        -- Upsert target for feed ingestion; also serves the crop/date range
+        -- lookups idx_price_history_crop_date was added for
+        CREATE UNIQUE INDEX IF NOT EXISTS idx_price_history_crop_date_market
+        ON price_history (crop_name, date, market);
+
+        DROP INDEX IF EXISTS idx_price_history_crop_date;
+
+        -- An outer statement's conflict policy overrides OR IGNORE inside a
+        -- trigger, so an upsert into price_history would fail on an already
+        -- dirty day. Skip existing entries explicitly instead.
+        DROP TRIGGER IF EXISTS price_daily_dirty_insert;
+        DROP TRIGGER IF EXISTS price_daily_dirty_update;
+        DROP TRIGGER IF EXISTS price_daily_dirty_delete;
+
+        CREATE TRIGGER IF NOT EXISTS price_daily_dirty_insert AFTER INSERT ON price_history
+        WHEN new.date IS NOT NULL BEGIN
+            INSERT INTO price_daily_dirty (crop_name, date)
+            SELECT new.crop_name, new.date
+            WHERE NOT EXISTS (SELECT 1 FROM price_daily_dirty WHERE crop_name = new.crop_name AND date = new.date);
+        END;
+
+        CREATE TRIGGER IF NOT EXISTS price_daily_dirty_update AFTER UPDATE OF crop_name, price, market, date ON price_history BEGIN
+            INSERT INTO price_daily_dirty (crop_name, date)
+            SELECT old.crop_name, old.date
+            WHERE old.date IS NOT NULL
+              AND NOT EXISTS (SELECT 1 FROM price_daily_dirty WHERE crop_name = old.crop_name AND date = old.date);
+            INSERT INTO price_daily_dirty (crop_name, date)
+            SELECT new.crop_name, new.date
+            WHERE new.date IS NOT NULL
+              AND NOT EXISTS (SELECT 1 FROM price_daily_dirty WHERE crop_name = new.crop_name AND date = new.date);
+        END;
+
+        CREATE TRIGGER IF NOT EXISTS price_daily_dirty_delete AFTER DELETE ON price_history
+        WHEN old.date IS NOT NULL BEGIN
+            INSERT INTO price_daily_dirty (crop_name, date)
+            SELECT old.crop_name, old.date
+            WHERE NOT EXISTS (SELECT 1 FROM price_daily_dirty WHERE crop_name = old.crop_name AND date = old.date);
+        END;
+    """),
+    (9, "Add status-filtered order indexes for the paginated order pages", """
+        CREATE INDEX IF NOT EXISTS idx_orders_buyer_status_date ON orders (buyer_id, status, order_date);
+        CREATE INDEX IF NOT EXISTS idx_orders_seller_status_date ON orders (seller_id, status, order_date);
+    """),
+    (10, "Add prediction_cache for memoized model predictions shared across processes", """
+        CREATE TABLE IF NOT EXISTS prediction_cache (
+            model TEXT NOT NULL,
+            checksum TEXT NOT NULL,
+            inputs TEXT NOT NULL,
+            result TEXT NOT NULL,
+            created_at REAL NOT NULL,
+            PRIMARY KEY (model, checksum, inputs)
+        ) WITHOUT ROWID;
+    """),
+    (11, "Drop idx_orders_seller_status_total, which no query uses", """
+        DROP INDEX IF EXISTS idx_orders_seller_status_total;
+    """),
+]
+
+LATEST_VERSION = MIGRATIONS[-1][0]
+
+
+def _statements(script):
+    """Split a migration script into complete statements (trigger bodies included)"""
+    buffer = ""
+    for line in script.splitlines(keepends=True):
+        buffer += line
+        if sqlite3.complete_statement(buffer):
+            statement = buffer.strip()
+            buffer = ""
+            if statement.rstrip(';').strip():
+                yield statement
+    if buffer.strip():
+        raise ValueError(f"Incomplete SQL statement in migration: {buffer.strip()[:60]}")
+
+
+def current_version(conn):
+    """Return the schema version recorded in the database"""
+    return conn.execute("PRAGMA user_version").fetchone()[0]
+
+
+def migrate(conn, target=LATEST_VERSION):
+    """Apply every pending migration up to target and return the new version"""
+    version = current_version(conn)
+    if version >= target:
+        return version
+
+    if conn.in_transaction:
+        conn.commit()
+
+    for number, description, script in MIGRATIONS:
+        if number <= version or number > target:
+            continue
+
+        # Take the write lock before re-reading the version so two processes
+        # starting together cannot both apply the same migration.
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            if current_version(conn) >= number:
+                conn.rollback()
+                continue
+            for statement in _statements(script):
+                conn.execute(statement)
+            conn.execute(f"PRAGMA user_version = {number}")
+            conn.commit()
+        except BaseException:
+            conn.rollback()
+            raise
+        logger.info("Applied migration %d: %s", number, description)
+
+    return current_version(conn)
+
+
+def pending(conn):
+    """Return (version, description) for migrations not yet applied"""
+    version = current_version(conn)
+    return [(number, description) for number, description, _ in MIGRATIONS if number > version]
+
+
+if __name__ == "__main__":
+    import argparse
+
+    from database import DB_PATH, connect
+
+    parser = argparse.ArgumentParser(description="Apply pending schema migrations")
+    parser.add_argument("--db", default=DB_PATH, help="database file (default: %(default)s)")
+    parser.add_argument("--status", action="store_true", help="only list pending migrations")
+    args = parser.parse_args()
+
+    conn = connect(args.db)
+    if args.status:
+        print(f"Schema version {current_version(conn)} (latest {LATEST_VERSION})")
+        for number, description in pending(conn):
+            print(f"  pending {number}: {description}")
+    else:
+        print(f"Schema version {migrate(conn)}")
+    conn.close()
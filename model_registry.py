@@ -0,0 +1,183 @@
+import hashlib
+import logging
+import os
+import pickle
+import threading
+import time
+from collections import namedtuple
+
+logger = logging.getLogger(__name__)
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+
+# Models served by the app, keyed by the name used in app.py
+MODEL_PATHS = {
+    'crop': os.path.join(BASE_DIR, 'models', 'crop.pkl'),
+    'fertilizer': os.path.join(BASE_DIR, 'models', 'fertilizer.pkl'),
+}
+
+# Seconds between checks of the model file on disk
+CHECK_INTERVAL = float(os.environ.get('AGRIMART_MODEL_CHECK_INTERVAL', '2.0'))
+
+ModelInfo = namedtuple('ModelInfo', ['name', 'path', 'version', 'checksum', 'size', 'mtime', 'loaded_at'])
+
+
+class _Entry:
+    __slots__ = ('model', 'info', 'stamp', 'checked_at')
+
+    def __init__(self, model, info, stamp):
+        self.model = model
+        self.info = info
+        self.stamp = stamp
+        self.checked_at = time.monotonic()
+
+
+def _load_pickle(path, data):
+    return pickle.loads(data)
+
+
+def _load_compiled_fertilizer(path, source_sha256):
+    # Memory-mapped arrays, no pickle; imported here because fast_inference imports this module
+    from fast_inference import FertilizerPredictor
+
+    return FertilizerPredictor.load(path, source_sha256=source_sha256)
+
+
+# Model file suffix -> loader(path, file bytes)
+LOADERS = {
+    '.pkl': _load_pickle,
+}
+
+# Model name -> (compiled export, loader(path, sha256 of the model file)). The
+# export is served instead of unpickling the model file only while it was
+# built from that exact file; a retrained pickle wins over a stale export.
+COMPILED = {
+    'fertilizer': (os.path.join(BASE_DIR, 'models', 'fertilizer.npz'), _load_compiled_fertilizer),
+}
+
+
+def _file_stamp(path):
+    stat = os.stat(path)
+    return (stat.st_mtime_ns, stat.st_size)
+
+
+class ModelRegistry:
+    """Loads each model once per process and reloads it when the file changes"""
+
+    def __init__(self, paths=None, check_interval=CHECK_INTERVAL, compiled=None):
+        self.paths = dict(MODEL_PATHS if paths is None else paths)
+        # Custom model paths get no compiled exports unless they are given too
+        self.compiled = dict((COMPILED if paths is None else {}) if compiled is None else compiled)
+        self.check_interval = check_interval
+        self._entries = {}
+        self._versions = {}
+        self._lock = threading.Lock()
+
+    def get(self, name):
+        """Return the current model object for name"""
+        entry = self._entries.get(name)
+        if entry is not None and time.monotonic() - entry.checked_at < self.check_interval:
+            return entry.model
+        return self._refresh(name).model
+
+    def info(self, name):
+        """Return the ModelInfo of the currently loaded model"""
+        entry = self._entries.get(name)
+        if entry is None:
+            entry = self._refresh(name)
+        return entry.info
+
+    def loaded(self):
+        """Return ModelInfo for every model loaded so far"""
+        return [entry.info for entry in self._entries.values()]
+
+    def _refresh(self, name):
+        with self._lock:
+            entry = self._entries.get(name)
+            if entry is not None and time.monotonic() - entry.checked_at < self.check_interval:
+                return entry
+
+            path = self.paths[name]
+            try:
+                stamp = self._stamp(name, path)
+            except OSError:
+                if entry is None:
+                    raise
+                logger.warning("Model file %s is missing, keeping version %s", path, entry.info.version)
+                entry.checked_at = time.monotonic()
+                return entry
+
+            if entry is not None and entry.stamp == stamp:
+                entry.checked_at = time.monotonic()
+                return entry
+
+            try:
+                new_entry = self._load(name, path, stamp)
+            except Exception:
+                if entry is None:
+                    raise
+                # A half-written file must not take the running model down
+                logger.exception("Reloading model %s failed, keeping version %s", name, entry.info.version)
+                entry.checked_at = time.monotonic()
+                return entry
+
+            # Swap in the fully loaded model in one assignment
+            self._entries[name] = new_entry
+            return new_entry
+
+    def _stamp(self, name, path):
+        stamp = _file_stamp(path)
+        compiled = self.compiled.get(name)
+        if compiled is not None and os.path.exists(compiled[0]):
+            # Re-exporting without retraining must also swap the model in
+            stamp += _file_stamp(compiled[0])
+        return stamp
+
+    def _load(self, name, path, stamp):
+        with open(path, 'rb') as file:
+            data = file.read()
+        checksum = hashlib.sha256(data).hexdigest()
+        model = None
+        compiled = self.compiled.get(name)
+        if compiled is not None and os.path.exists(compiled[0]):
+            compiled_path, loader = compiled
+            try:
+                model = loader(compiled_path, checksum)
+                path = compiled_path
+            except ValueError as error:
+                logger.warning("Not serving %s from %s, loading %s instead: %s", name, compiled_path, path, error)
+        if model is None:
+            model = LOADERS[os.path.splitext(path)[1]](path, data)
+        version = self._versions.get(name, 0) + 1
+        self._versions[name] = version
+        info = ModelInfo(
+            name=name,
+            path=path,
+            version=version,
+            # Of the model file, also when the model is served from its export
+            checksum=checksum,
+            size=len(data),
+            mtime=stamp[0] / 1e9,
+            loaded_at=time.time(),
+        )
+        logger.info("Loaded model %s v%d (sha256 %s)", name, version, info.checksum[:12])
+        return _Entry(model, info, stamp)
+
+
+# Shared by every Streamlit session in this process
+registry = ModelRegistry()
+
+
+def get_model(name):
+    """Return the shared model object for name"""
+    return registry.get(name)
+
+
+def model_info(name):
+    """Return version and checksum metadata for name"""
+    return registry.info(name)
+
+
+def loaded_models():
+    """Return ModelInfo for every model this process has loaded"""
+    return registry.loaded()
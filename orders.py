@@ -0,0 +1,245 @@
+"""Order placement through a single group-committing writer
+
+Every purchase is queued to one writer thread. It takes the write lock once
+per batch (BEGIN IMMEDIATE), places each queued order inside its own
+savepoint and commits the whole batch together. Stock is taken with a
+conditional decrement, so a listing can never be oversold however many
+buyers race for it. Status changes are applied to many orders at once by
+transition().
+"""
+import json
+import logging
+import queue
+import sqlite3
+import threading
+from collections import namedtuple
+from concurrent.futures import Future, TimeoutError
+
+from database import get_pool
+
+logger = logging.getLogger(__name__)
+
+# Orders per transaction, and how long the writer waits for more to arrive
+MAX_BATCH = 64
+MAX_WAIT = 0.005
+ORDER_TIMEOUT = 30.0
+PAGE_SIZE = 10
+
+# status is one of PLACED, SOLD_OUT, NOT_FOUND, OWN_LISTING, INVALID or
+# PROCESSING; remaining is the listing's quantity after the order (or now, if
+# it failed)
+OrderResult = namedtuple('OrderResult', ['status', 'order_id', 'total_price', 'remaining'])
+
+PLACED = 'placed'
+SOLD_OUT = 'sold_out'
+NOT_FOUND = 'not_found'
+OWN_LISTING = 'own_listing'
+INVALID = 'invalid'
+# Not committed within the timeout; the writer may still place it
+PROCESSING = 'processing'
+
+STATUSES = ['pending', 'confirmed', 'delivered', 'cancelled']
+
+# Action -> (role allowed to take it, status it applies to, new status)
+TRANSITIONS = {
+    'confirm': ('seller', 'pending', 'confirmed'),
+    'reject': ('seller', 'pending', 'cancelled'),
+    'deliver': ('seller', 'confirmed', 'delivered'),
+    'cancel': ('buyer', 'pending', 'cancelled'),
+}
+
+
+def place(conn, buyer_id, crop_id, quantity):
+    """Place one order inside conn's open transaction and return an OrderResult"""
+    if quantity <= 0:
+        return OrderResult(INVALID, None, None, None)
+    row = conn.execute("""
+        UPDATE crops SET quantity = quantity - ?
+        WHERE id = ? AND quantity >= ? AND user_id IS NOT ?
+        RETURNING user_id, price, quantity
+    """, (quantity, crop_id, quantity, buyer_id)).fetchone()
+    if row is None:
+        crop = conn.execute("SELECT user_id, quantity FROM crops WHERE id = ?", (crop_id,)).fetchone()
+        if crop is None:
+            return OrderResult(NOT_FOUND, None, None, None)
+        if crop[0] == buyer_id:
+            return OrderResult(OWN_LISTING, None, None, crop[1])
+        return OrderResult(SOLD_OUT, None, None, crop[1])
+
+    seller_id, price, remaining = row
+    total_price = quantity * price
+    order_id = conn.execute("""
+        INSERT INTO orders (crop_id, buyer_id, seller_id, quantity, total_price)
+        VALUES (?, ?, ?, ?, ?)
+    """, (crop_id, buyer_id, seller_id, quantity, total_price)).lastrowid
+    return OrderResult(PLACED, order_id, total_price, remaining)
+
+
+def transition(action, user_id, order_ids, pool=None):
+    """Apply action to every order in order_ids the user may change; returns how many changed
+
+    The whole batch is one transaction. Orders in another state, or belonging
+    to someone else, are skipped. Cancelled orders put their stock back with
+    a single set-based UPDATE.
+    """
+    role, from_status, to_status = TRANSITIONS[action]
+    ids = json.dumps([int(order_id) for order_id in order_ids])
+    with (pool or get_pool()).connection() as conn:
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            # In both statements the unary + on {role}_id and status keeps the
+            # orders lookup on the primary key, not the user's whole order index
+            if to_status == 'cancelled':
+                conn.execute(f"""
+                    UPDATE crops SET quantity = crops.quantity + returned.quantity
+                    FROM (
+                        SELECT crop_id, SUM(quantity) AS quantity FROM orders
+                        WHERE id IN (SELECT value FROM json_each(?)) AND +{role}_id = ? AND +status = ?
+                        GROUP BY crop_id
+                    ) AS returned
+                    WHERE crops.id = returned.crop_id
+                """, (ids, user_id, from_status))
+            changed = conn.execute(f"""
+                UPDATE orders SET status = ?
+                WHERE id IN (SELECT value FROM json_each(?)) AND +{role}_id = ? AND +status = ?
+            """, (to_status, ids, user_id, from_status)).rowcount
+            conn.commit()
+        except BaseException:
+            conn.rollback()
+            raise
+    return changed
+
+
+def orders_query(role, user_id, status=None, after=None, page_size=PAGE_SIZE):
+    """Build the (sql, params) fetch_orders runs; query_plans checks the same statements"""
+    other = 'seller' if role == 'buyer' else 'buyer'
+    where = [f"o.{role}_id = ?"]
+    params = [user_id]
+    if status:
+        where.append("o.status = ?")
+        params.append(status)
+    if after is not None:
+        where.append("(o.order_date, o.id) < (?, ?)")
+        params.extend(after)
+    params.append(page_size + 1)
+    return f"""
+        SELECT o.*, c.name as crop_name, c.price, u.name as {other}_name, u.phone as {other}_phone
+        FROM orders o
+        JOIN crops c ON o.crop_id = c.id
+        JOIN users u ON o.{other}_id = u.id
+        WHERE {" AND ".join(where)}
+        ORDER BY o.order_date DESC, o.id DESC
+        LIMIT ?
+    """, params
+
+
+def fetch_orders(conn, role, user_id, status=None, after=None, page_size=PAGE_SIZE):
+    """Fetch one page of a user's orders as buyer or seller, newest first
+
+    Returns (rows, next_cursor) like listings.fetch_page.
+    """
+    cursor = conn.cursor()
+    cursor.row_factory = sqlite3.Row
+    rows = cursor.execute(*orders_query(role, user_id, status, after, page_size)).fetchall()
+    if len(rows) <= page_size:
+        return rows, None
+    rows = rows[:page_size]
+    return rows, (rows[-1]["order_date"], rows[-1]["id"])
+
+
+class OrderWriter:
+    """Single writer thread that places queued orders in group commits"""
+
+    def __init__(self, pool=None, max_batch=MAX_BATCH, max_wait=MAX_WAIT):
+        self.pool = pool
+        self.max_batch = max_batch
+        self.max_wait = max_wait
+        self._queue = queue.Queue()
+        self._thread = None
+        self._lock = threading.Lock()
+
+    def submit(self, buyer_id, crop_id, quantity):
+        """Queue an order; returns a Future resolving to its OrderResult"""
+        future = Future()
+        self._queue.put((future, buyer_id, crop_id, quantity))
+        self._ensure_running()
+        return future
+
+    def _ensure_running(self):
+        if self._thread is None or not self._thread.is_alive():
+            with self._lock:
+                if self._thread is None or not self._thread.is_alive():
+                    self._thread = threading.Thread(target=self._run, name='order-writer', daemon=True)
+                    self._thread.start()
+
+    def _next_batch(self):
+        batch = [self._queue.get()]
+        try:
+            # Give concurrent buyers a moment to join this commit
+            while len(batch) < self.max_batch:
+                batch.append(self._queue.get(timeout=self.max_wait))
+        except queue.Empty:
+            pass
+        return batch
+
+    def _commit(self, batch):
+        results = []
+        with (self.pool or get_pool()).connection() as conn:
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                for _, buyer_id, crop_id, quantity in batch:
+                    # A failing order rolls back to its savepoint, not the batch
+                    conn.execute("SAVEPOINT place_order")
+                    try:
+                        results.append(place(conn, buyer_id, crop_id, quantity))
+                    except Exception as e:
+                        conn.execute("ROLLBACK TO place_order")
+                        results.append(e)
+                    conn.execute("RELEASE place_order")
+                conn.commit()
+            except BaseException:
+                conn.rollback()
+                raise
+        return results
+
+    def _run(self):
+        while True:
+            batch = self._next_batch()
+            try:
+                results = self._commit(batch)
+            except Exception as e:
+                logger.exception("Committing %d orders failed", len(batch))
+                results = [e] * len(batch)
+            for (future, _, _, _), result in zip(batch, results):
+                if isinstance(result, Exception):
+                    future.set_exception(result)
+                else:
+                    future.set_result(result)
+
+
+_writer = None
+_writer_lock = threading.Lock()
+
+
+def get_writer():
+    """Return the process-wide order writer"""
+    global _writer
+    if _writer is None:
+        with _writer_lock:
+            if _writer is None:
+                _writer = OrderWriter()
+    return _writer
+
+
+def place_order(buyer_id, crop_id, quantity, timeout=ORDER_TIMEOUT):
+    """Buy quantity of a listing; blocks until committed and returns an OrderResult
+
+    Returns a PROCESSING result when the writer has not committed the order
+    within timeout. The order stays queued and may still be placed.
+    """
+    future = get_writer().submit(buyer_id, crop_id, quantity)
+    try:
+        return future.result(timeout)
+    except TimeoutError:
+        logger.warning("Order by user %s for crop %s not committed after %ss", buyer_id, crop_id, timeout)
+        return OrderResult(PROCESSING, None, None, None)
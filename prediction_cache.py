@@ -0,0 +1,161 @@
+"""Memoized model predictions keyed on quantized form inputs
+
+Inputs are rounded to the resolution the forms accept, so the defaults and
+near-identical submissions share one entry. Keys carry the model checksum,
+so a reloaded model never serves results of the one it replaced.
+
+Lookups go to a bounded in-process LRU first and then, when enabled, to the
+prediction_cache table that every process on the same database shares.
+"""
+import json
+import logging
+import os
+import threading
+import time
+from collections import OrderedDict
+
+from database import execute, get_pool
+from model_registry import get_model, model_info
+
+logger = logging.getLogger(__name__)
+
+MAX_ENTRIES = int(os.environ.get('AGRIMART_PREDICTION_CACHE_SIZE', '4096'))
+# Second tier in SQLite; set to 0 to keep the cache in memory only
+SHARED = os.environ.get('AGRIMART_PREDICTION_CACHE_SHARED', '1') != '0'
+
+# Decimal places per input, matching the number_input steps on the forms
+CROP_RESOLUTION = {'N': 0, 'P': 0, 'K': 0, 'temperature': 0, 'humidity': 0, 'ph': 1, 'rainfall': 0}
+FERTILIZER_RESOLUTION = {'N': 0, 'P': 0, 'K': 0, 'temperature': 0, 'humidity': 0, 'moisture': 0}
+
+
+def quantize(values, resolution):
+    """Round each named input to its resolution; non-numbers pass through"""
+    key = []
+    for name, value in values.items():
+        if name in resolution:
+            value = round(float(value), resolution[name])
+            # -0.0 and 0.0 must share a key
+            value = value + 0.0
+        key.append(value)
+    return tuple(key)
+
+
+class PredictionCache:
+    """Bounded LRU of predictions with an optional shared SQLite tier"""
+
+    def __init__(self, maxsize=MAX_ENTRIES, shared=SHARED):
+        self.maxsize = maxsize
+        self.shared = shared
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        # Model checksums whose stale shared rows were already pruned
+        self._pruned = set()
+        self.hits = 0
+        self.shared_hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get_or_compute(self, model, inputs, resolution, compute):
+        """Return the cached prediction for inputs, calling compute() on a miss
+
+        compute's result must be JSON-serializable when the shared tier is on.
+        """
+        get_model(model)
+        checksum = model_info(model).checksum
+        key = (model, checksum, quantize(inputs, resolution))
+
+        with self._lock:
+            if key in self._entries:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return self._entries[key]
+
+        if self.shared:
+            found, value = self._read_shared(key)
+            if found:
+                with self._lock:
+                    self.shared_hits += 1
+                self._remember(key, value)
+                return value
+
+        with self._lock:
+            self.misses += 1
+        value = compute()
+        self._remember(key, value)
+        if self.shared:
+            self._write_shared(key, value)
+        return value
+
+    def _remember(self, key, value):
+        with self._lock:
+            self._entries[key] = value
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def _read_shared(self, key):
+        model, checksum, inputs = key
+        try:
+            with get_pool().connection() as conn:
+                row = conn.execute(
+                    "SELECT result FROM prediction_cache WHERE model = ? AND checksum = ? AND inputs = ?",
+                    (model, checksum, json.dumps(inputs)),
+                ).fetchone()
+        except Exception:
+            # The shared tier only saves work; a locked or missing table must not fail a prediction
+            logger.exception("Reading the shared prediction cache failed")
+            return False, None
+        if row is None:
+            return False, None
+        return True, json.loads(row[0])
+
+    def _write_shared(self, key, value):
+        model, checksum, inputs = key
+        try:
+            with get_pool().transaction() as conn:
+                if (model, checksum) not in self._pruned:
+                    conn.execute("DELETE FROM prediction_cache WHERE model = ? AND checksum != ?", (model, checksum))
+                conn.execute("""
+                    INSERT INTO prediction_cache (model, checksum, inputs, result, created_at) VALUES (?, ?, ?, ?, ?)
+                    ON CONFLICT (model, checksum, inputs) DO NOTHING
+                """, (model, checksum, json.dumps(inputs), json.dumps(value), time.time()))
+            self._pruned.add((model, checksum))
+        except Exception:
+            logger.exception("Writing the shared prediction cache failed")
+
+    def stats(self):
+        """Counters since the process started"""
+        with self._lock:
+            lookups = self.hits + self.shared_hits + self.misses
+            return {
+                'entries': len(self._entries),
+                'max_entries': self.maxsize,
+                'hits': self.hits,
+                'shared_hits': self.shared_hits,
+                'misses': self.misses,
+                'evictions': self.evictions,
+                'hit_rate': (self.hits + self.shared_hits) / lookups if lookups else 0.0,
+            }
+
+    def clear(self, shared=False):
+        """Drop every in-memory entry, and the shared rows too when asked"""
+        with self._lock:
+            self._entries.clear()
+        if shared:
+            execute("DELETE FROM prediction_cache")
+            self._pruned.clear()
+
+
+# Shared by every Streamlit session in this process
+cache = PredictionCache()
+
+
+def cached_prediction(model, inputs, resolution, compute):
+    """Return compute() for inputs from the process-wide cache"""
+    return cache.get_or_compute(model, inputs, resolution, compute)
+
+
+def stats():
+    """Hit, miss and eviction counters of the process-wide cache"""
+    return cache.stats()
@@ -0,0 +1,299 @@
+"""Persistent price alerts matched against new price_history ticks
+
+Active thresholds are held in memory in sorted per-crop lists, so each tick
+is matched with a bisect instead of a pass over every alert. A background
+thread picks up new ticks by id, marks the alerts they trigger and hands
+them to the delivery handlers.
+"""
+import bisect
+import logging
+import os
+import threading
+from collections import namedtuple
+
+from database import get_pool
+
+logger = logging.getLogger(__name__)
+
+# Seconds between checks for new ticks, and ticks matched per transaction
+POLL_INTERVAL = float(os.environ.get('AGRIMART_ALERT_POLL_INTERVAL', '5'))
+TICK_BATCH = 5000
+# New alerts beyond this many are loaded by rebuilding the book
+SYNC_RELOAD = 1000
+
+# UI label -> direction stored in price_alerts
+DIRECTIONS = {'Price Drop Below': 'below', 'Price Rise Above': 'above'}
+
+TriggeredAlert = namedtuple('TriggeredAlert', ['id', 'user_id', 'crop_name', 'direction', 'threshold',
+                                               'price', 'market'])
+
+
+class ThresholdBook:
+    """Active alert thresholds per (crop, direction), kept sorted for bisect"""
+
+    def __init__(self):
+        # (crop_name, direction) -> (thresholds, alert ids), both in threshold order
+        self._books = {}
+
+    def __len__(self):
+        return sum(len(ids) for _, ids in self._books.values())
+
+    def load(self, rows):
+        """Replace the book with rows of (id, crop_name, direction, threshold) sorted by key and threshold"""
+        self._books = {}
+        for alert_id, crop_name, direction, threshold in rows:
+            thresholds, ids = self._books.setdefault((crop_name, direction), ([], []))
+            thresholds.append(threshold)
+            ids.append(alert_id)
+
+    def add(self, alert_id, crop_name, direction, threshold):
+        thresholds, ids = self._books.setdefault((crop_name, direction), ([], []))
+        i = bisect.bisect_right(thresholds, threshold)
+        thresholds.insert(i, threshold)
+        ids.insert(i, alert_id)
+
+    def remove(self, alert_id, crop_name, direction, threshold):
+        """Remove one alert; returns False if it was not in the book"""
+        book = self._books.get((crop_name, direction))
+        if book is None:
+            return False
+        thresholds, ids = book
+        lo = bisect.bisect_left(thresholds, threshold)
+        hi = bisect.bisect_right(thresholds, threshold, lo)
+        for i in range(lo, hi):
+            if ids[i] == alert_id:
+                del thresholds[i], ids[i]
+                return True
+        return False
+
+    def match(self, crop_name, price):
+        """Remove and return the ids of every alert price triggers"""
+        fired = []
+        below = self._books.get((crop_name, 'below'))
+        if below:
+            # Drop-below alerts fire for every threshold above the price
+            i = bisect.bisect_right(below[0], price)
+            fired.extend(below[1][i:])
+            del below[0][i:], below[1][i:]
+        above = self._books.get((crop_name, 'above'))
+        if above:
+            # Rise-above alerts fire for every threshold below the price
+            i = bisect.bisect_left(above[0], price)
+            fired.extend(above[1][:i])
+            del above[0][:i], above[1][:i]
+        return fired
+
+
+def _has_new_ticks(conn):
+    # Read outside a transaction, so idle polls never take the write lock
+    return conn.execute("""
+        SELECT (SELECT IFNULL(MAX(id), 0) FROM price_history) > last_tick_id
+        FROM price_alert_state WHERE id = 0
+    """).fetchone()[0]
+
+
+def _log_delivery(alert):
+    logger.info("Price alert %d for user %d: %s %s %.2f (now %.2f at %s)", alert.id, alert.user_id,
+                alert.crop_name, alert.direction, alert.threshold, alert.price, alert.market)
+
+
+class AlertEngine:
+    """Matches new price ticks against active alerts and delivers the triggered ones"""
+
+    def __init__(self, pool=None, poll_interval=POLL_INTERVAL):
+        self.pool = pool
+        self.poll_interval = poll_interval
+        # Called with each TriggeredAlert from the worker thread
+        self.handlers = [_log_delivery]
+        self.book = ThresholdBook()
+        self._max_id = None
+        self._lock = threading.Lock()
+        self._wake = threading.Event()
+        self._stop = threading.Event()
+        self._thread = None
+
+    def _pool(self):
+        return self.pool or get_pool()
+
+    def _sync(self, conn):
+        """Load the book, or add alerts created since the last sync (possibly by another process)"""
+        if self._max_id is None:
+            self.book.load(conn.execute("""
+                SELECT id, crop_name, direction, threshold FROM price_alerts
+                WHERE status = 'active'
+                ORDER BY crop_name, direction, threshold, id
+            """))
+            self._max_id = conn.execute("SELECT IFNULL(MAX(id), 0) FROM price_alerts").fetchone()[0]
+            return
+        rows = conn.execute("""
+            SELECT id, crop_name, direction, threshold FROM price_alerts
+            WHERE id > ? AND status = 'active'
+        """, (self._max_id,)).fetchall()
+        if len(rows) > SYNC_RELOAD:
+            # Cheaper to reload sorted than to insert one by one
+            self._max_id = None
+            self._sync(conn)
+            return
+        for row in rows:
+            self.book.add(*row)
+            self._max_id = max(self._max_id, row[0])
+
+    def reload(self):
+        """Rebuild the book from the database on the next match"""
+        with self._lock:
+            self._max_id = None
+
+    def create_alert(self, user_id, crop_name, direction, threshold):
+        """Persist a new active alert and return its id"""
+        with self._pool().transaction() as conn:
+            alert_id = conn.execute("""
+                INSERT INTO price_alerts (user_id, crop_name, direction, threshold) VALUES (?, ?, ?, ?)
+            """, (user_id, crop_name, direction, threshold)).lastrowid
+        with self._pool().connection() as conn, self._lock:
+            if self._max_id is not None:
+                self._sync(conn)
+        return alert_id
+
+    def cancel_alert(self, alert_id, user_id):
+        """Cancel one of a user's active alerts; returns False if there was none"""
+        with self._pool().transaction() as conn:
+            row = conn.execute("""
+                UPDATE price_alerts SET status = 'cancelled'
+                WHERE id = ? AND user_id = ? AND status = 'active'
+                RETURNING crop_name, direction, threshold
+            """, (alert_id, user_id)).fetchone()
+        if row is None:
+            return False
+        with self._lock:
+            self.book.remove(alert_id, *row)
+        return True
+
+    def match_ticks(self, conn, ticks):
+        """Trigger the alerts matched by ticks of (crop_name, price, market) inside conn's transaction
+
+        Returns the TriggeredAlerts actually marked, skipping alerts another
+        process already triggered or cancelled. Call reload() if the
+        transaction is rolled back.
+        """
+        fired = []
+        with self._lock:
+            self._sync(conn)
+            for crop_name, price, market in ticks:
+                fired.extend((price, market, alert_id) for alert_id in self.book.match(crop_name, price))
+        triggered = []
+        for price, market, alert_id in fired:
+            row = conn.execute("""
+                UPDATE price_alerts SET status = 'triggered', triggered_at = CURRENT_TIMESTAMP,
+                    triggered_price = ?, triggered_market = ?
+                WHERE id = ? AND status = 'active'
+                RETURNING id, user_id, crop_name, direction, threshold, triggered_price, triggered_market
+            """, (price, market, alert_id)).fetchone()
+            if row is not None:
+                triggered.append(TriggeredAlert(*row))
+        return triggered
+
+    def check(self):
+        """Match every tick added since the last check; returns the alerts triggered"""
+        triggered = []
+        with self._pool().connection() as conn:
+            while _has_new_ticks(conn):
+                # The write lock keeps two processes from matching the same ticks
+                conn.execute("BEGIN IMMEDIATE")
+                try:
+                    last_tick_id = conn.execute("SELECT last_tick_id FROM price_alert_state WHERE id = 0").fetchone()[0]
+                    ticks = conn.execute("""
+                        SELECT id, crop_name, price, market FROM price_history
+                        WHERE id > ? ORDER BY id LIMIT ?
+                    """, (last_tick_id, TICK_BATCH)).fetchall()
+                    if not ticks:
+                        conn.rollback()
+                        break
+                    batch = self.match_ticks(conn, [tick[1:] for tick in ticks])
+                    conn.execute("UPDATE price_alert_state SET last_tick_id = ? WHERE id = 0", (ticks[-1][0],))
+                    conn.commit()
+                except BaseException:
+                    conn.rollback()
+                    # Matched alerts were already taken out of the book
+                    self.reload()
+                    raise
+                triggered.extend(batch)
+        return triggered
+
+    def deliver(self):
+        """Hand every undelivered triggered alert to the handlers; returns how many were delivered"""
+        with self._pool().transaction() as conn:
+            alerts = [TriggeredAlert(*row) for row in conn.execute("""
+                UPDATE price_alerts SET delivered_at = CURRENT_TIMESTAMP
+                WHERE status = 'triggered' AND delivered_at IS NULL
+                RETURNING id, user_id, crop_name, direction, threshold, triggered_price, triggered_market
+            """).fetchall()]
+        failed = []
+        for alert in alerts:
+            try:
+                for handler in self.handlers:
+                    handler(alert)
+            except Exception:
+                logger.exception("Delivering price alert %d failed", alert.id)
+                failed.append(alert.id)
+        if failed:
+            # Retried on the next pass
+            with self._pool().transaction() as conn:
+                conn.executemany("UPDATE price_alerts SET delivered_at = NULL WHERE id = ?",
+                                 [(alert_id,) for alert_id in failed])
+        return len(alerts) - len(failed)
+
+    def _run(self):
+        while not self._stop.is_set():
+            try:
+                self.check()
+                self.deliver()
+            except Exception:
+                logger.exception("Price alert check failed")
+            self._wake.wait(self.poll_interval)
+            self._wake.clear()
+
+    def start(self):
+        """Start the background worker if it is not running"""
+        with self._lock:
+            if self._thread is None or not self._thread.is_alive():
+                self._stop.clear()
+                self._thread = threading.Thread(target=self._run, name='price-alerts', daemon=True)
+                self._thread.start()
+
+    def wake(self):
+        """Check for new ticks now instead of at the next poll"""
+        self._wake.set()
+
+    def stop(self, timeout=None):
+        self._stop.set()
+        self._wake.set()
+        if self._thread is not None:
+            self._thread.join(timeout)
+
+
+_engine = None
+_engine_lock = threading.Lock()
+
+
+def get_engine():
+    """Return the process-wide alert engine, starting its worker on first use"""
+    global _engine
+    if _engine is None:
+        with _engine_lock:
+            if _engine is None:
+                engine = AlertEngine()
+                engine.start()
+                _engine = engine
+    return _engine
+
+
+def user_alerts(user_id):
+    """A user's alerts, newest first"""
+    with get_pool().connection() as conn:
+        return conn.execute("""
+            SELECT id, crop_name, direction, threshold, status, created_at, triggered_at,
+                triggered_price, triggered_market
+            FROM price_alerts
+            WHERE user_id = ? AND status != 'cancelled'
+            ORDER BY created_at DESC, id DESC
+        """, (user_id,)).fetchall()
@@ -0,0 +1,114 @@
+"""Market price analytics over price_history and its price_daily rollup
+
+price_history holds raw ticks (one price per crop, market and day). Triggers
+mark every (crop, day) a write touches in price_daily_dirty, and
+refresh_rollup() recomputes only those groups, so reads never aggregate the
+raw table.
+"""
+import json
+
+import pandas as pd
+
+TREND_DAYS = 30
+ROLLING_WINDOW = 7
+
+
+def refresh_rollup(conn):
+    """Recompute the price_daily rows marked dirty; returns how many groups were refreshed"""
+    if conn.execute("SELECT 1 FROM price_daily_dirty LIMIT 1").fetchone() is None:
+        return 0
+    try:
+        # The first DELETE takes the write lock, so no tick can be marked dirty
+        # between recomputing the groups and clearing the dirty list.
+        conn.execute("""
+            DELETE FROM price_daily
+            WHERE (crop_name, date) IN (SELECT crop_name, date FROM price_daily_dirty)
+        """)
+        # CROSS JOIN keeps the dirty list as the outer loop so only the
+        # touched groups are read from price_history
+        conn.execute("""
+            INSERT INTO price_daily (crop_name, date, avg_price, min_price, max_price, ticks, markets)
+            SELECT p.crop_name, p.date, AVG(p.price), MIN(p.price), MAX(p.price), COUNT(*), COUNT(DISTINCT p.market)
+            FROM price_daily_dirty d
+            CROSS JOIN price_history p ON p.crop_name = d.crop_name AND p.date = d.date
+            GROUP BY p.crop_name, p.date
+        """)
+        refreshed = conn.execute("DELETE FROM price_daily_dirty").rowcount
+        conn.commit()
+    except BaseException:
+        conn.rollback()
+        raise
+    return refreshed
+
+
+def price_summary(conn):
+    """Current, last-week and last-month price per crop, as a DataFrame
+
+    "Current" is the average over all markets on the crop's latest day with
+    ticks; last week and last month are the latest days at least 7 and 30 days
+    before that. Deltas are absolute and percent changes from those days.
+    """
+    summary = pd.read_sql_query("""
+        WITH latest AS (
+            SELECT crop_name, MAX(date) AS date FROM price_daily GROUP BY crop_name
+        )
+        SELECT latest.crop_name, latest.date, cur.avg_price AS current,
+            cur.min_price, cur.max_price, cur.markets,
+            (SELECT avg_price FROM price_daily p
+             WHERE p.crop_name = latest.crop_name AND p.date <= date(latest.date, '-7 days')
+             ORDER BY p.date DESC LIMIT 1) AS last_week,
+            (SELECT avg_price FROM price_daily p
+             WHERE p.crop_name = latest.crop_name AND p.date <= date(latest.date, '-30 days')
+             ORDER BY p.date DESC LIMIT 1) AS last_month
+        FROM latest
+        JOIN price_daily cur ON cur.crop_name = latest.crop_name AND cur.date = latest.date
+        ORDER BY latest.crop_name
+    """, conn)
+    summary['week_change'] = summary['current'] - summary['last_week']
+    summary['week_change_pct'] = summary['week_change'] / summary['last_week'] * 100
+    summary['month_change'] = summary['current'] - summary['last_month']
+    summary['month_change_pct'] = summary['month_change'] / summary['last_month'] * 100
+    summary['spread'] = summary['max_price'] - summary['min_price']
+    return summary
+
+
+def price_trends(conn, crop_names, days=TREND_DAYS, window=ROLLING_WINDOW):
+    """Daily average price and its rolling mean for each crop over its last days
+
+    Days without ticks are left out of the rolling window rather than filled.
+    """
+    trends = pd.read_sql_query("""
+        SELECT p.crop_name, p.date, p.avg_price, p.min_price, p.max_price, p.ticks
+        FROM price_daily p
+        JOIN (SELECT value AS crop_name FROM json_each(?)) wanted ON wanted.crop_name = p.crop_name
+        WHERE p.date > (SELECT date(MAX(date), ?) FROM price_daily WHERE crop_name = p.crop_name)
+        ORDER BY p.crop_name, p.date
+    """, conn, params=[json.dumps(list(crop_names)), f'-{days} days'])
+    trends['date'] = pd.to_datetime(trends['date'])
+    # Rows arrive sorted by crop and date and sort=False keeps the groups in
+    # that order, so the rolled values line up with the rows as they are.
+    # apply() would return a DataFrame instead of a Series for a single crop.
+    rolled = trends.groupby('crop_name', sort=False).rolling(f'{window}D', on='date')['avg_price'].mean()
+    trends['rolling_mean'] = rolled.to_numpy()
+    return trends
+
+
+def market_prices(conn, crop_name, days=TREND_DAYS):
+    """Latest price in each market for a crop, with its spread from the cross-market mean
+
+    Markets without a tick in the crop's last days are left out.
+    """
+    markets = pd.read_sql_query("""
+        SELECT market, price, date FROM (
+            SELECT IFNULL(market, 'Unknown') AS market, price, date,
+                ROW_NUMBER() OVER (PARTITION BY market ORDER BY date DESC, id DESC) AS rn
+            FROM price_history
+            WHERE crop_name = ?
+              AND date > (SELECT date(MAX(date), ?) FROM price_history WHERE crop_name = ?)
+        )
+        WHERE rn = 1
+        ORDER BY price
+    """, conn, params=[crop_name, f'-{days} days', crop_name])
+    markets['spread'] = markets['price'] - markets['price'].mean()
+    return markets
+
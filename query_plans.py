@@ -0,0 +1,128 @@
+"""Check that the app's hot queries are answered from the indexes in migrations.py
+
+    python query_plans.py               # fresh in-memory schema
+    python query_plans.py --db big.db   # a real or generated database
+
+Exits non-zero if a query scans a table, sorts through a temp B-tree or
+stops using the index it was designed around.
+"""
+import sqlite3
+import sys
+
+from migrations import migrate
+
+# Marketplace sort option -> index its keyset pages walk, without and with a category
+SORT_INDEXES = {
+    "Price (Low to High)": ("idx_crops_price", "idx_crops_category_price"),
+    "Price (High to Low)": ("idx_crops_price", "idx_crops_category_price"),
+    "Newest": ("idx_crops_created_at", "idx_crops_category_created_at"),
+    "Quantity": ("idx_crops_quantity", "idx_crops_category_quantity"),
+}
+# Sample values for the parameters the pages bind
+USER_ID = 1
+CATEGORY = "Vegetables"
+SEARCH_TERM = "tomato"
+# Ranked search orders its hits by FTS rank with the c.id tie-break the keyset
+# cursor needs. No index provides that order, but the sort only covers the
+# matching rows, never the whole table.
+SORTED_HITS = {"marketplace search"}
+
+
+def _pages(build, **filters):
+    """First and next-page variants of a keyset-paginated query builder"""
+    return [build(after=None, **filters), build(after=(1, 1), **filters)]
+
+
+def hot_queries(conn):
+    """[(label, query, params, index the plan must use)], built by the app's own query builders
+
+    conn only decides between an exact and a corrected search expression.
+    """
+    from listings import BEST_MATCH, page_query
+    from orders import orders_query
+
+    def marketplace(**filters):
+        return page_query(conn, exclude_user=USER_ID, in_stock=True, **filters)
+
+    queries = []
+    for sort, (index, category_index) in SORT_INDEXES.items():
+        label = sort.lower()
+        queries += [(f"marketplace {label}", *query, index) for query in _pages(marketplace, sort=sort)]
+        queries += [(f"marketplace category {label}", *query, category_index)
+                    for query in _pages(marketplace, sort=sort, category=CATEGORY)]
+    queries += [("marketplace search", *query, "crops_fts VIRTUAL TABLE")
+                for query in _pages(marketplace, sort=BEST_MATCH, search_term=SEARCH_TERM)]
+    queries += [("my listings", *query, "idx_crops_user_created_at")
+                for query in _pages(lambda **filters: page_query(conn, owner=USER_ID, **filters))]
+    for role, index in [('buyer', "idx_orders_buyer"), ('seller', "idx_orders_seller")]:
+        label = "purchase orders" if role == 'buyer' else "sales orders"
+        queries += [(label, *query, f"{index}_date") for query in _pages(orders_query, role=role, user_id=USER_ID)]
+        queries += [(f"{label} by status", *query, f"{index}_status_date")
+                    for query in _pages(orders_query, role=role, user_id=USER_ID, status='pending')]
+    # Written inline in app.py, which cannot be imported outside Streamlit
+    queries += [
+        ("dashboard recent crops", """
+            SELECT c.name, c.price, c.quantity, u.name as seller, c.created_at
+            FROM crops c
+            JOIN users u ON c.user_id = u.id
+            ORDER BY c.created_at DESC
+            LIMIT 5
+        """, [], "idx_crops_created_at"),
+        ("dashboard and profile counters", "SELECT * FROM stats WHERE user_id IN (0, ?)", [USER_ID],
+         "INTEGER PRIMARY KEY"),
+    ]
+    return queries
+
+
+def explain(conn, query, params=()):
+    """Return the EXPLAIN QUERY PLAN detail lines for query"""
+    return [row[3] for row in conn.execute("EXPLAIN QUERY PLAN " + query, params)]
+
+
+def plan_problems(plan, index, allow_sort=False):
+    """Return what is wrong with a plan that should use index"""
+    problems = []
+    if not any(index in line for line in plan):
+        problems.append(f"does not use {index}")
+    for line in plan:
+        if line.startswith("SCAN") and "USING" not in line and "VIRTUAL TABLE" not in line:
+            problems.append(f"full table scan: {line}")
+        if "USE TEMP B-TREE" in line and not allow_sort:
+            problems.append(f"sorts in a temp B-tree: {line}")
+    return problems
+
+
+def check(conn, queries=None):
+    """Return {label: problems} for every hot query whose plan is wrong"""
+    failures = {}
+    for label, query, params, index in hot_queries(conn) if queries is None else queries:
+        problems = plan_problems(explain(conn, query, params), index, label in SORTED_HITS)
+        if problems:
+            failures.setdefault(label, []).extend(problems)
+    return failures
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--db", default=":memory:", help="database to check (default: fresh schema)")
+    parser.add_argument("-v", "--verbose", action="store_true", help="print every plan")
+    args = parser.parse_args()
+
+    conn = sqlite3.connect(args.db)
+    migrate(conn)
+    queries = hot_queries(conn)
+    for label, query, params, index in queries:
+        if args.verbose:
+            print(label)
+            for line in explain(conn, query, params):
+                print("    " + line)
+
+    failures = check(conn, queries)
+    for label, problems in failures.items():
+        for problem in problems:
+            print(f"FAIL {label}: {problem}")
+    labels = {label for label, *_ in queries}
+    print(f"{len(labels) - len(failures)}/{len(labels)} query plans OK")
+    sys.exit(1 if failures else 0)
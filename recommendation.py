@@ -0,0 +1,166 @@
+"""Crop recommendation for single fields and uploaded soil-lab sheets
+
+A single field is scored by one predict_proba call on the compiled crop
+tree that yields the recommended crop and its runners-up together. A sheet
+is validated column by column over all rows at once, and every valid row
+is scored by a single vectorized predict_proba call. Invalid rows get an
+error message instead of a crop, so one bad row never fails the batch.
+"""
+import os
+from collections import namedtuple
+from functools import lru_cache
+
+import numpy as np
+import pandas as pd
+
+from fast_inference import get_crop_predictor
+from instrumentation import MODEL_SECONDS, timed
+from prediction_cache import CROP_RESOLUTION, cached_prediction, quantize
+
+FEATURES = ['N', 'P', 'K', 'temperature', 'humidity', 'ph', 'rainfall']
+
+# Lower-cased sheet headers -> model feature
+COLUMN_ALIASES = {
+    'n': 'N', 'nitrogen': 'N',
+    'p': 'P', 'phosphorus': 'P', 'phosphorous': 'P',
+    'k': 'K', 'potassium': 'K',
+    'temperature': 'temperature', 'temp': 'temperature',
+    'humidity': 'humidity',
+    'ph': 'ph', 'ph level': 'ph',
+    'rainfall': 'rainfall', 'rain': 'rainfall',
+}
+
+# Accepted range per feature, inclusive. These are plausible lab readings,
+# a little wider than the training data (K reaches 205 there).
+RANGES = {
+    'N': (0, 200),
+    'P': (0, 200),
+    'K': (0, 250),
+    'temperature': (-10, 50),
+    'humidity': (0, 100),
+    'ph': (0, 14),
+    'rainfall': (0, 500),
+}
+
+# Excel suffix -> package pandas reads it with; neither is a hard dependency
+EXCEL_ENGINES = {'.xlsx': 'openpyxl', '.xls': 'xlrd'}
+
+GUIDE_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'data', 'crop_guide.csv')
+
+# Crops shown on the single-field result panel: the pick and its alternatives
+TOP_K = 4
+
+Suggestion = namedtuple('Suggestion', ['crop', 'probability'])
+
+
+def top_k(proba, classes, k=TOP_K):
+    """Return the k most probable classes of every row of proba
+
+    Returns (labels, probabilities), both of shape (n, k) and ordered from
+    most to least probable. Ties keep the model's class order, so column 0
+    is what predict() returns.
+    """
+    k = min(k, proba.shape[1])
+    order = np.argsort(-proba, axis=1, kind='stable')[:, :k]
+    return classes[order], np.take_along_axis(proba, order, axis=1)
+
+
+@timed(MODEL_SECONDS, model='crop')
+def suggest(N, P, K, temperature, humidity, ph, rainfall, k=TOP_K):
+    """Rank crops for one field from a single predict_proba call
+
+    Returns up to k Suggestions, best first. Crops the model gives no
+    probability at all are left out, so the list can be shorter than k.
+    Inputs are rounded to the form's resolution and results are memoized.
+    """
+    inputs = {'N': N, 'P': P, 'K': K, 'temperature': temperature, 'humidity': humidity, 'ph': ph,
+              'rainfall': rainfall, 'k': k}
+
+    def compute():
+        predictor = get_crop_predictor()
+        proba = predictor.predict_proba_one(*quantize(inputs, CROP_RESOLUTION)[:len(FEATURES)])
+        labels, probabilities = top_k(proba[None, :], predictor.classes_, k)
+        return [[str(crop), float(probability)]
+                for crop, probability in zip(labels[0], probabilities[0])
+                if probability > 0]
+
+    return [Suggestion(*suggestion) for suggestion in cached_prediction('crop', inputs, CROP_RESOLUTION, compute)]
+
+
+@lru_cache(maxsize=1)
+def crop_guide():
+    """Cultivation guide per crop label, read once from data/crop_guide.csv"""
+    guide = pd.read_csv(GUIDE_PATH)
+    return {row['label']: row for row in guide.to_dict('records')}
+
+
+def read_sheet(file, name):
+    """Read an uploaded CSV or Excel file into a DataFrame"""
+    engine = EXCEL_ENGINES.get(os.path.splitext(name.lower())[1])
+    if engine is not None:
+        try:
+            return pd.read_excel(file, engine=engine)
+        except ImportError:
+            raise ValueError(f"Reading {name} needs the {engine} package; upload a CSV instead")
+    return pd.read_csv(file)
+
+
+def validate(sheet):
+    """Check every row of a sheet at once
+
+    Returns (features, errors): features holds the 7 model inputs as floats,
+    errors is a Series of messages, empty for rows that can be scored.
+    Raises ValueError when whole feature columns are missing.
+    """
+    sheet = sheet.rename(columns=lambda column: COLUMN_ALIASES.get(str(column).strip().lower(), column))
+    missing = [feature for feature in FEATURES if feature not in sheet.columns]
+    if missing:
+        raise ValueError(f"Missing columns: {', '.join(missing)}")
+
+    features = sheet[FEATURES].apply(pd.to_numeric, errors='coerce').astype(float)
+    errors = pd.Series('', index=sheet.index, dtype=object)
+    for feature in FEATURES:
+        low, high = RANGES[feature]
+        values = features[feature]
+        raw = sheet[feature]
+        not_number = values.isna() & raw.notna() & (raw.astype(str).str.strip() != '')
+        blank = values.isna() & ~not_number
+        out_of_range = values.notna() & ((values < low) | (values > high))
+        errors += np.where(blank, f"{feature} is missing; ", '')
+        errors += np.where(not_number, f"{feature} is not a number; ", '')
+        errors += np.where(out_of_range, f"{feature} must be between {low} and {high}; ", '')
+    return features, errors.str.rstrip('; ')
+
+
+@timed(MODEL_SECONDS, model='crop')
+def recommend_batch(sheet):
+    """Recommend a crop for every row of a sheet
+
+    Returns the sheet with recommended_crop, confidence and error columns
+    appended.
+    """
+    features, errors = validate(sheet)
+    valid = (errors == '').to_numpy()
+
+    crops = np.full(len(sheet), None, dtype=object)
+    confidence = np.full(len(sheet), np.nan)
+    if valid.any():
+        predictor = get_crop_predictor()
+        proba = predictor.predict_proba(features[valid].to_numpy())
+        labels, probabilities = top_k(proba, predictor.classes_, 1)
+        crops[valid] = labels[:, 0]
+        confidence[valid] = probabilities[:, 0]
+
+    result = sheet.copy()
+    result['recommended_crop'] = crops
+    result['confidence'] = confidence
+    result['error'] = errors.where(~valid, None)
+    return result
+
+
+def template():
+    """An example sheet with the expected columns"""
+    return pd.DataFrame([
+        {'N': 90, 'P': 42, 'K': 43, 'temperature': 20.9, 'humidity': 82.0, 'ph': 6.5, 'rainfall': 202.9},
+        {'N': 20, 'P': 67, 'K': 19, 'temperature': 26.0, 'humidity': 55.0, 'ph': 7.1, 'rainfall': 60.0},
+    ], columns=FEATURES)
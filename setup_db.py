@@ -1,70 +1,37 @@
+"""Sample and synthetic data for the Smart Agriculture database
+
+    python setup_db.py                              # a handful of demo rows
+    python setup_db.py --generate --db loadtest.db  # production-sized data
+    python setup_db.py --generate --db big.db --users 1000000 --listings 2000000 \\
+        --orders 5000000 --ticks 5000000 --seed 7 --as-of 2026-01-01
+
+--generate builds a fresh database next to the target with triggers and
+indexes dropped, bulk-loads every table with executemany in one transaction,
+rebuilds the derived tables (stats, crops_fts, price_daily) in bulk, restores
+the triggers and indexes and only then moves the file into place. The same
+seed and --as-of always produce the same database.
+"""
+import os
 import sqlite3
 import random
-from datetime import datetime, timedelta
+import sys
+import time
+from datetime import date, datetime, timedelta, timezone
+
+import numpy as np
+
+from database import DB_PATH, connect
+from migrations import migrate
+from orders import STATUSES as ORDER_STATUSES
 
 def setup_sample_data():
     """Setup sample data for demonstration"""
     
-    # Connect to database
-    conn = sqlite3.connect('smart_agriculture.db')
+    # Connect to database and bring the schema up to date
+    conn = connect(DB_PATH)
+    migrate(conn)
     cursor = conn.cursor()
     
-    # Create tables (same as in main app)
-    cursor.execute('''
-        CREATE TABLE IF NOT EXISTS users (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            name TEXT NOT NULL,
-            phone TEXT UNIQUE NOT NULL,
-            email TEXT,
-            location TEXT,
-            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-        )
-    ''')
-    
-    cursor.execute('''
-        CREATE TABLE IF NOT EXISTS crops (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            name TEXT NOT NULL,
-            description TEXT,
-            price REAL NOT NULL,
-            quantity INTEGER NOT NULL,
-            unit TEXT DEFAULT 'kg',
-            user_id INTEGER,
-            image_url TEXT,
-            category TEXT,
-            harvest_date DATE,
-            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-            FOREIGN KEY (user_id) REFERENCES users (id)
-        )
-    ''')
-    
-    cursor.execute('''
-        CREATE TABLE IF NOT EXISTS orders (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            crop_id INTEGER,
-            buyer_id INTEGER,
-            seller_id INTEGER,
-            quantity INTEGER,
-            total_price REAL,
-            status TEXT DEFAULT 'pending',
-            order_date TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-            FOREIGN KEY (crop_id) REFERENCES crops (id),
-            FOREIGN KEY (buyer_id) REFERENCES users (id),
-            FOREIGN KEY (seller_id) REFERENCES users (id)
-        )
-    ''')
-    
-    cursor.execute('''
-        CREATE TABLE IF NOT EXISTS price_history (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            crop_name TEXT NOT NULL,
-            price REAL NOT NULL,
-            market TEXT,
-            date DATE,
-            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-        )
-    ''')
-    
     # Sample users
     sample_users = [
         ('Rajesh Kumar', '9876543210', 'rajesh@email.com', 'Delhi'),
@@ -147,6 +114,320 @@ def setup_sample_data():
     conn.commit()
     conn.close()
 
+
+# Synthetic data: crop -> (category, base price in Rs/kg, seasonal swing, month prices peak)
+CATALOGUE = {
+    'Rice': ('Grains', 38, 0.10, 9),
+    'Wheat': ('Grains', 27, 0.12, 2),
+    'Maize': ('Grains', 21, 0.15, 8),
+    'Barley': ('Grains', 24, 0.12, 2),
+    'Bajra': ('Grains', 23, 0.14, 8),
+    'Jowar': ('Grains', 30, 0.14, 8),
+    'Cotton': ('Fibres', 66, 0.10, 9),
+    'Sugarcane': ('Cash Crops', 3.5, 0.05, 10),
+    'Soybean': ('Pulses', 46, 0.12, 8),
+    'Chickpea': ('Pulses', 58, 0.10, 1),
+    'Lentil': ('Pulses', 65, 0.10, 1),
+    'Pigeon Pea': ('Pulses', 85, 0.12, 10),
+    'Groundnut': ('Oilseeds', 60, 0.12, 9),
+    'Mustard': ('Oilseeds', 55, 0.10, 1),
+    'Potato': ('Vegetables', 18, 0.35, 11),
+    'Tomato': ('Vegetables', 25, 0.60, 7),
+    'Onion': ('Vegetables', 28, 0.55, 11),
+    'Banana': ('Fruits', 30, 0.20, 5),
+    'Mango': ('Fruits', 70, 0.45, 2),
+    'Turmeric': ('Spices', 120, 0.10, 6),
+}
+UNITS = (['kg', 'quintal', 'ton'], [0.7, 0.25, 0.05])
+FIRST_NAMES = ['Aarav', 'Anita', 'Arjun', 'Bhavna', 'Deepak', 'Divya', 'Ganesh', 'Geeta', 'Harish', 'Kavita',
+               'Kiran', 'Lakshmi', 'Mahesh', 'Meera', 'Mohan', 'Neha', 'Pooja', 'Prakash', 'Priya', 'Rajesh',
+               'Ramesh', 'Rekha', 'Sanjay', 'Sunita', 'Suresh', 'Usha', 'Vijay', 'Vikram', 'Anil', 'Savita']
+LAST_NAMES = ['Kumar', 'Sharma', 'Singh', 'Patel', 'Reddy', 'Yadav', 'Gupta', 'Verma', 'Jadhav', 'Naidu',
+              'Patil', 'Chauhan', 'Das', 'Nair', 'Mishra', 'Rao', 'Thakur', 'Pandey', 'Joshi', 'Gowda']
+# Farming districts, weighted roughly by how many users a district brings
+CITIES = (['Ludhiana', 'Karnal', 'Meerut', 'Agra', 'Indore', 'Nashik', 'Pune', 'Nagpur', 'Guntur', 'Warangal',
+           'Mysuru', 'Belagavi', 'Coimbatore', 'Madurai', 'Patna', 'Bardhaman', 'Rajkot', 'Jaipur', 'Kota',
+           'Raipur', 'Cuttack', 'Bhopal', 'Lucknow', 'Hisar', 'Bathinda', 'Delhi', 'Mumbai', 'Bangalore',
+           'Hyderabad', 'Ahmedabad'],
+          [6, 5, 5, 4, 5, 5, 4, 4, 4, 3, 3, 3, 3, 3, 4, 3, 3, 4, 2, 2, 2, 3, 4, 3, 2, 3, 3, 3, 3, 3])
+MARKET_KINDS = ['Mandi', 'APMC', 'Market Yard', 'Bazaar']
+DESCRIPTIONS = ['Fresh {} from organic farming', 'Grade A {}, machine cleaned', '{} from this season\'s harvest',
+                'Sun-dried {}, ready for pickup', 'Bulk {} at farm-gate price']
+
+# Share of users who list crops. Listings per seller and orders per listing
+# follow Zipf laws with these exponents, so a few sellers and listings dominate
+SELLER_SHARE = 0.2
+SELLER_SKEW = 0.8
+LISTING_SKEW = 0.7
+ORDER_STATUS_MIX = dict(zip(ORDER_STATUSES, [0.12, 0.18, 0.60, 0.10]))
+HISTORY_DAYS = 730
+
+
+def _epoch_seconds(as_of, days_ago):
+    """Unix times for fractional days before the end of as_of; SQLite formats them on insert"""
+    end = datetime(as_of.year, as_of.month, as_of.day, 23, 59, 59, tzinfo=timezone.utc).timestamp()
+    return (end - np.asarray(days_ago) * 86400).astype(np.int64)
+
+
+def _zipf_choice(rng, n, size, skew):
+    """size draws from range(n) with Zipf weights over a random ranking"""
+    weights = 1.0 / np.arange(1, n + 1) ** skew
+    ranking = rng.permutation(n)
+    return ranking[rng.choice(n, size, p=weights / weights.sum())]
+
+
+def generate_users(rng, n, as_of):
+    """User rows with unique phones and district-weighted locations"""
+    ids = np.arange(1, n + 1)
+    first = np.array(FIRST_NAMES)[rng.integers(0, len(FIRST_NAMES), n)].tolist()
+    last = np.array(LAST_NAMES)[rng.integers(0, len(LAST_NAMES), n)].tolist()
+    # One random number per slot of the 6xxxxxxxxx-9xxxxxxxxx range: unique, and
+    # increasing with id so the UNIQUE index on phone is filled in order
+    slot = 4_000_000_000 // max(n, 1)
+    phones = 6_000_000_000 + (ids - 1) * slot + rng.integers(0, slot, n)
+    cities, weights = CITIES
+    locations = np.array(cities)[rng.choice(len(cities), n, p=np.array(weights) / sum(weights))]
+    created = _epoch_seconds(as_of, rng.uniform(0, HISTORY_DAYS, n))
+    names = [f"{a} {b}" for a, b in zip(first, last)]
+    emails = [f"{a.lower()}.{b.lower()}{i}@example.com" for a, b, i in zip(first, last, range(1, n + 1))]
+    return zip(ids.tolist(), names, phones.astype(str).tolist(), emails, locations.tolist(), created.tolist())
+
+
+def generate_listings(rng, n, n_users, as_of):
+    """Listing rows plus the (owner, price, created days ago) arrays orders need"""
+    names = np.array(list(CATALOGUE))
+    crop = rng.integers(0, len(names), n)
+    base = np.array([CATALOGUE[name][1] for name in names])
+    price = np.round(base[crop] * rng.lognormal(0, 0.25, n), 2)
+    quantity = np.maximum(1, rng.lognormal(5, 1.2, n)).astype(np.int64)
+    units, unit_weights = UNITS
+    unit = np.array(units)[rng.choice(len(units), n, p=unit_weights)]
+
+    sellers = rng.choice(n_users, max(1, int(n_users * SELLER_SHARE)), replace=False) + 1
+    owner = sellers[_zipf_choice(rng, len(sellers), n, SELLER_SKEW)]
+    # Most listings are recent; the marketplace sorts by created_at
+    age = np.minimum(rng.exponential(90, n), HISTORY_DAYS)
+    created = _epoch_seconds(as_of, age)
+    # Harvest from two months before listing to a month after
+    harvest = _epoch_seconds(as_of, age - rng.integers(-60, 30, n))
+    categories = np.array([CATALOGUE[name][0] for name in names])
+    descriptions = np.array([[template.format(name.lower()) for template in DESCRIPTIONS] for name in names])
+    description = descriptions[crop, rng.integers(0, len(DESCRIPTIONS), n)]
+
+    rows = zip(range(1, n + 1), names[crop].tolist(), description.tolist(), price.tolist(), quantity.tolist(),
+               unit.tolist(), owner.tolist(), categories[crop].tolist(), harvest.tolist(), created.tolist())
+    return rows, owner, price, age
+
+
+def generate_orders(rng, n, n_users, owner, price, age, as_of):
+    """Order rows concentrated on popular listings, with a realistic status mix"""
+    listing = _zipf_choice(rng, len(owner), n, LISTING_SKEW)
+    seller = owner[listing]
+    buyer = rng.integers(1, n_users + 1, n)
+    # Nobody buys their own listing
+    buyer = np.where(buyer == seller, buyer % n_users + 1, buyer)
+    quantity = rng.integers(1, 101, n)
+    total = np.round(price[listing] * quantity, 2)
+    # Placed some time after the listing went up
+    order_age = rng.uniform(0, 1, n) * age[listing]
+    ordered = _epoch_seconds(as_of, order_age)
+    statuses, weights = zip(*ORDER_STATUS_MIX.items())
+    status = rng.choice(len(statuses), n, p=weights)
+    # Sellers act within weeks, so old orders are no longer pending or confirmed
+    settled = np.where(rng.random(n) < 0.85, statuses.index('delivered'), statuses.index('cancelled'))
+    open_ = np.isin(status, [statuses.index('pending'), statuses.index('confirmed')])
+    status = np.array(statuses)[np.where((order_age > 21) & open_, settled, status)]
+    return zip((listing + 1).tolist(), buyer.tolist(), seller.tolist(), quantity.tolist(), total.tolist(),
+               status.tolist(), ordered.tolist())
+
+
+def generate_ticks(rng, n, as_of):
+    """Seasonal price ticks for the latest n (day, crop, market) cells"""
+    names = list(CATALOGUE)
+    cities, _ = CITIES
+    markets = [f"{city} {MARKET_KINDS[i % len(MARKET_KINDS)]}" for i, city in enumerate(cities)]
+    # About a year of history per market unless that cannot reach n
+    n_markets = int(min(len(markets), max(4, np.ceil(n / (len(names) * 365)))))
+    markets = markets[:n_markets]
+    days = int(np.ceil(n / (len(names) * n_markets)))
+
+    base = np.array([CATALOGUE[name][1] for name in names])
+    swing = np.array([CATALOGUE[name][2] for name in names])
+    peak = np.array([CATALOGUE[name][3] for name in names])
+    dates = np.datetime64(as_of, 'D') - np.arange(days - 1, -1, -1).astype('timedelta64[D]')
+    day_of_year = (dates - dates.astype('datetime64[Y]')).astype(np.int64)
+    season = 1 + swing[None, :] * np.cos(2 * np.pi * (day_of_year[:, None] - (peak[None, :] - 0.5) * 30.4) / 365.25)
+    # 5% a year of inflation towards as_of, a fixed premium per market and daily noise
+    trend = 1.05 ** ((np.arange(days) - days + 1) / 365.25)
+    premium = rng.lognormal(0, 0.08, (len(names), n_markets))
+    noise = rng.lognormal(0, 0.04, (days, len(names), n_markets))
+    prices = np.round(base[None, :, None] * season[:, :, None] * trend[:, None, None] * premium[None] * noise, 2)
+
+    day_index, crop_index, market_index = np.unravel_index(np.arange(prices.size - n, prices.size), prices.shape)
+    return zip(np.array(names)[crop_index].tolist(), prices.ravel()[prices.size - n:].tolist(),
+               np.array(markets)[market_index].tolist(),
+               np.datetime_as_string(dates, unit='D')[day_index].tolist())
+
+
+
+# Derived tables, rebuilt in bulk once the triggers that maintain them are back
+REBUILD = [
+    "DELETE FROM stats",
+    """
+    INSERT INTO stats (user_id, listings, purchases, sales, earnings, users)
+    SELECT 0,
+        (SELECT COUNT(*) FROM crops),
+        (SELECT COUNT(*) FROM orders),
+        (SELECT COUNT(*) FROM orders),
+        (SELECT IFNULL(SUM(total_price), 0) FROM orders WHERE status = 'delivered'),
+        (SELECT COUNT(*) FROM users)
+    """,
+    """
+    INSERT INTO stats (user_id, listings, purchases, sales, earnings)
+    SELECT id, SUM(listings), SUM(purchases), SUM(sales), SUM(earnings) FROM (
+        SELECT user_id AS id, 1 AS listings, 0 AS purchases, 0 AS sales, 0 AS earnings
+        FROM crops WHERE user_id IS NOT NULL
+        UNION ALL
+        SELECT buyer_id, 0, 1, 0, 0 FROM orders WHERE buyer_id IS NOT NULL
+        UNION ALL
+        SELECT seller_id, 0, 0, 1, IIF(status = 'delivered', IFNULL(total_price, 0), 0)
+        FROM orders WHERE seller_id IS NOT NULL
+    )
+    GROUP BY id
+    """,
+    "INSERT INTO crops_fts (crops_fts) VALUES ('rebuild')",
+    "DELETE FROM price_daily_dirty",
+    """
+    INSERT INTO price_daily (crop_name, date, avg_price, min_price, max_price, ticks, markets)
+    SELECT crop_name, date, AVG(price), MIN(price), MAX(price), COUNT(*), COUNT(DISTINCT market)
+    FROM price_history WHERE date IS NOT NULL
+    GROUP BY crop_name, date
+    """,
+    # Generated history is old news to the alert engine
+    "UPDATE price_alert_state SET last_tick_id = (SELECT IFNULL(MAX(id), 0) FROM price_history) WHERE id = 0",
+]
+
+
+def generate(path, users=10000, listings=50000, orders=200000, ticks=500000, seed=0, as_of=None,
+             force=False, progress=None):
+    """Build a synthetic database at path and return the row counts written
+
+    The file is assembled beside path and moved into place at the end, so a
+    failed run never leaves a half-filled database behind. Refuses to replace
+    an existing file unless force is set; stop the app before forcing.
+    """
+    if os.path.exists(path) and not force:
+        raise FileExistsError(f"{path} exists; pass force=True (--force) to replace it")
+    if listings and not users:
+        raise ValueError("Listings need at least one user")
+    if orders and (users < 2 or not listings):
+        raise ValueError("Orders need at least two users and one listing")
+    as_of = as_of or date.today()
+    rng = np.random.default_rng(seed)
+    progress = progress or (lambda step: None)
+
+    building = f"{path}.building"
+    for leftover in (building, f"{building}-journal"):
+        if os.path.exists(leftover):
+            os.remove(leftover)
+    conn = sqlite3.connect(building)
+    try:
+        migrate(conn)
+        conn.execute("PRAGMA journal_mode = OFF")
+        conn.execute("PRAGMA synchronous = OFF")
+        conn.execute("PRAGMA cache_size = -262144")
+        conn.execute("PRAGMA temp_store = MEMORY")
+        # Lets CREATE INDEX sort with worker threads
+        conn.execute("PRAGMA threads = 4")
+
+        # Every index and trigger is dropped for the load and recreated from
+        # its own definition afterwards
+        deferred = conn.execute("""
+            SELECT type, name, sql FROM sqlite_master
+            WHERE type IN ('index', 'trigger') AND sql IS NOT NULL
+        """).fetchall()
+        for kind, name, _ in deferred:
+            conn.execute(f"DROP {kind.upper()} {name}")
+
+        counts = {}
+        conn.execute("BEGIN")
+        progress("users")
+        counts['users'] = conn.executemany(
+            "INSERT INTO users (id, name, phone, email, location, created_at)"
+            " VALUES (?, ?, ?, ?, ?, datetime(?, 'unixepoch'))",
+            generate_users(rng, users, as_of)).rowcount
+        progress("listings")
+        rows, owner, price, age = generate_listings(rng, listings, users, as_of)
+        counts['listings'] = conn.executemany("""
+            INSERT INTO crops (id, name, description, price, quantity, unit, user_id, category, harvest_date, created_at)
+            VALUES (?, ?, ?, ?, ?, ?, ?, ?, date(?, 'unixepoch'), datetime(?, 'unixepoch'))
+        """, rows).rowcount
+        progress("orders")
+        counts['orders'] = conn.executemany("""
+            INSERT INTO orders (crop_id, buyer_id, seller_id, quantity, total_price, status, order_date)
+            VALUES (?, ?, ?, ?, ?, ?, datetime(?, 'unixepoch'))
+        """, generate_orders(rng, orders, users, owner, price, age, as_of) if orders else []).rowcount
+        progress("ticks")
+        counts['ticks'] = conn.executemany(
+            # created_at is set too, so reruns with the same seed give the same file
+            "INSERT INTO price_history (crop_name, price, market, date, created_at) VALUES (?1, ?2, ?3, ?4, ?4 || ' 18:00:00')",
+            generate_ticks(rng, ticks, as_of) if ticks else []).rowcount
+
+        progress("indexes")
+        for kind, _, sql in deferred:
+            if kind == 'index':
+                conn.execute(sql)
+        progress("derived tables")
+        for statement in REBUILD:
+            conn.execute(statement)
+        for kind, _, sql in deferred:
+            if kind == 'trigger':
+                conn.execute(sql)
+        conn.commit()
+        progress("analyze")
+        conn.execute("ANALYZE")
+        conn.execute("PRAGMA journal_mode = WAL")
+    finally:
+        conn.close()
+
+    # A WAL left by the old file would be replayed into the new one
+    for stale in (f"{path}-wal", f"{path}-shm"):
+        if os.path.exists(stale):
+            os.remove(stale)
+    os.replace(building, path)
+    return counts
+
+
 # Run setup
 if __name__ == "__main__":
-    setup_sample_data()
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Fill the database with demo rows or synthetic load-test data")
+    parser.add_argument("--generate", action="store_true", help="build a synthetic database instead of demo rows")
+    parser.add_argument("--db", default=DB_PATH, help="database file (default: %(default)s)")
+    parser.add_argument("--users", type=int, default=10000)
+    parser.add_argument("--listings", type=int, default=50000)
+    parser.add_argument("--orders", type=int, default=200000)
+    parser.add_argument("--ticks", type=int, default=500000, help="price_history rows")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--as-of", type=date.fromisoformat, help="last day of generated history (default: today)")
+    parser.add_argument("--force", action="store_true", help="replace an existing database file")
+    args = parser.parse_args()
+
+    if not args.generate:
+        setup_sample_data()
+        sys.exit(0)
+
+    started = time.perf_counter()
+
+    def progress(step):
+        print(f"[{time.perf_counter() - started:6.1f}s] {step}", flush=True)
+
+    try:
+        counts = generate(args.db, args.users, args.listings, args.orders, args.ticks, args.seed, args.as_of,
+                          args.force, progress)
+    except (FileExistsError, ValueError) as e:
+        print(e, file=sys.stderr)
+        sys.exit(1)
+    summary = ", ".join(f"{count:,} {name}" for name, count in counts.items())
+    print(f"Wrote {summary} to {args.db} in {time.perf_counter() - started:.1f}s")
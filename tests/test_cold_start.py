@@ -0,0 +1,13 @@
+import cold_start
+
+
+def test_login_page_cold_start():
+    assert cold_start.check(cold_start.measure()) == []
+
+
+def test_lazy_imports_and_budget_are_reported():
+    imports = [('pandas', 90_000, 120_000, 0), ('pandas.core', 30_000, 30_000, 1)]
+    assert cold_start.check(imports, budget_ms=100) == [
+        "pandas was imported while rendering the login page",
+        "imports after Streamlit took 120ms, over the 100ms budget",
+    ]
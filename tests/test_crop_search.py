@@ -0,0 +1,50 @@
+import pytest
+
+from crop_search import FUZZY_CANDIDATES, search_join
+from listings import BEST_MATCH, fetch_page
+
+
+@pytest.fixture
+def market(conn):
+    conn.executemany("INSERT INTO users (id, name, phone) VALUES (?, ?, ?)",
+                     [(1, "Asha", "9000000001"), (2, "Ravi", "9000000002")])
+    # More tomato listings than the typo fallback collects words from, most of them the buyer's own
+    rows = [("Tomato", "Fresh red tomatoes", 20.0, 10, 1, "Vegetables") for _ in range(FUZZY_CANDIDATES + 50)]
+    rows += [("Tomato", "Desi tomatoes", 25.0, 5, 2, "Vegetables") for _ in range(30)]
+    rows += [("Tomato", "Sold out", 22.0, 0, 2, "Vegetables"),
+             ("Potato", "Hill potatoes", 15.0, 8, 2, "Vegetables"),
+             ("Basmati Rice", "Aged rice", 80.0, 4, 2, "Grains")]
+    conn.executemany("""
+        INSERT INTO crops (name, description, price, quantity, user_id, category) VALUES (?, ?, ?, ?, ?, ?)
+    """, rows)
+    return conn
+
+
+def all_pages(conn, **filters):
+    rows, cursor = fetch_page(conn, page_size=50, **filters)
+    while cursor is not None:
+        page, cursor = fetch_page(conn, page_size=50, after=cursor, **filters)
+        rows += page
+    return rows
+
+
+@pytest.mark.parametrize("term", ["tomato", "tomatto", "tomatos"])
+def test_typos_find_every_listing(market, term):
+    assert len(all_pages(market, search_term=term, sort=BEST_MATCH)) == FUZZY_CANDIDATES + 81
+
+
+def test_typo_results_are_filtered_like_exact_ones(market):
+    rows = all_pages(market, search_term="tomatto", exclude_user=1, in_stock=True, category="Vegetables")
+    assert len(rows) == 30
+    assert {row["description"] for row in rows} == {"Desi tomatoes"}
+
+
+def test_every_word_must_be_close(market):
+    assert len(all_pages(market, search_term="basmatti rcie")) == 1
+    assert all_pages(market, search_term="tomatto zucchini") == []
+
+
+def test_exact_matches_skip_the_correction(market):
+    join, params, _ = search_join(market, "pota")
+    assert params == ['"pota"']
+    assert [row["name"] for row in all_pages(market, search_term="pota")] == ["Potato"]
@@ -0,0 +1,89 @@
+import copy
+import hashlib
+import os
+import pickle
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from fast_inference import (BASE_DIR, COMPILED_PATH, PICKLE_PATH, SMALL_BATCH, CropPredictor, FertilizerPredictor,
+                            _sample_records)
+from model_registry import MODEL_PATHS
+
+SAMPLES = 5000
+
+
+@pytest.fixture(scope='module')
+def pipeline():
+    with open(PICKLE_PATH, 'rb') as file:
+        return pickle.load(file)
+
+
+@pytest.fixture(scope='module')
+def records(pipeline):
+    return _sample_records(pipeline, SAMPLES, seed=0)
+
+
+@pytest.fixture(scope='module')
+def crop_model():
+    with open(MODEL_PATHS['crop'], 'rb') as file:
+        return pickle.load(file)
+
+
+def assert_fertilizer_parity(pipeline, predictor, records):
+    frame = records[list(pipeline.feature_names_in_)]
+    expected_proba = pipeline.predict_proba(frame)
+    assert (predictor.predict(records) == pipeline.predict(frame)).all()
+    assert np.array_equal(predictor.predict_proba(records), expected_proba)
+    # Small batches take the one-step sum
+    small = records.iloc[:SMALL_BATCH // 2]
+    assert np.array_equal(predictor.predict_proba(small), expected_proba[:len(small)])
+    row = frame.iloc[0]
+    assert predictor.predict_one(row['Nitrogen'], row['Phosphorous'], row['Potassium'], row['Crop Type'],
+                                 row['Soil Type'], row['Temparature'], row['Humidity '],
+                                 row['Moisture']) == pipeline.predict(frame.iloc[[0]])[0]
+
+
+def test_fertilizer_compiled_matches_pipeline(pipeline, records):
+    assert_fertilizer_parity(pipeline, FertilizerPredictor.from_pipeline(pipeline), records)
+
+
+@pytest.mark.parametrize("handle_unknown", ['ignore', 'infrequent_if_exist'])
+def test_fertilizer_lenient_encoder_is_refused(pipeline, handle_unknown):
+    retrained = copy.deepcopy(pipeline)
+    encoder = retrained.named_steps['preprocessor'].named_transformers_['nominal'].named_steps['onehot']
+    encoder.handle_unknown = handle_unknown
+    with pytest.raises(ValueError, match="handle_unknown"):
+        FertilizerPredictor.from_pipeline(retrained)
+
+
+def test_fertilizer_npz_round_trip_matches_pipeline(pipeline, records, tmp_path):
+    path = str(tmp_path / 'fertilizer.npz')
+    FertilizerPredictor.from_pipeline(pipeline).save(path)
+    assert_fertilizer_parity(pipeline, FertilizerPredictor.load(path), records)
+
+
+def test_checked_in_export_matches_pickle(pipeline, records):
+    with open(PICKLE_PATH, 'rb') as file:
+        checksum = hashlib.sha256(file.read()).hexdigest()
+    predictor = FertilizerPredictor.load(COMPILED_PATH, source_sha256=checksum)
+    assert_fertilizer_parity(pipeline, predictor, records)
+
+
+def test_crop_compiled_matches_tree(crop_model):
+    predictor = CropPredictor(crop_model)
+    X = pd.read_csv(os.path.join(BASE_DIR, 'data', 'recommendation.csv'))[predictor.features].to_numpy(np.float64)
+    rng = np.random.default_rng(0)
+    random = rng.uniform(X.min(axis=0) - 5, X.max(axis=0) + 5, (SAMPLES, X.shape[1]))
+    random[: SAMPLES // 2] = np.round(random[: SAMPLES // 2], 1)
+
+    for rows in (X, random):
+        frame = pd.DataFrame(rows, columns=predictor.features)
+        expected = crop_model.predict(frame)
+        expected_proba = crop_model.predict_proba(frame)
+        assert (predictor.predict(rows) == expected).all()
+        assert np.array_equal(predictor.predict_proba(rows), expected_proba)
+        assert [predictor.predict_one(*row) for row in rows.tolist()] == list(expected)
+        assert all(np.array_equal(predictor.predict_proba_one(*row), proba)
+                   for row, proba in zip(rows.tolist(), expected_proba))
@@ -0,0 +1,36 @@
+import threading
+import urllib.request
+
+import instrumentation
+
+
+def test_metrics_server_binds_to_loopback_by_default():
+    server = instrumentation._metrics_server(0)
+    try:
+        assert server.server_address[0] == "127.0.0.1"
+    finally:
+        server.server_close()
+
+
+def test_metrics_server_serves_the_registry(monkeypatch):
+    monkeypatch.setattr(instrumentation, 'registry', instrumentation.Registry())
+    instrumentation.observe(instrumentation.SQL_SECONDS, 0.002, statement="SELECT 1")
+    server = instrumentation._metrics_server(0)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    try:
+        with urllib.request.urlopen(f"http://127.0.0.1:{server.server_port}/metrics") as response:
+            body = response.read().decode()
+    finally:
+        server.shutdown()
+        server.server_close()
+    assert 'agrimart_sql_seconds_count{statement="SELECT 1"} 1' in body
+
+
+def test_metrics_page_is_for_admins_only(monkeypatch):
+    monkeypatch.setattr(instrumentation, 'ENABLED', True)
+    monkeypatch.setattr(instrumentation, 'ADMIN_USER_IDS', frozenset({7}))
+    assert instrumentation.can_view_metrics(7)
+    assert not instrumentation.can_view_metrics(8)
+    assert not instrumentation.can_view_metrics(None)
+    monkeypatch.setattr(instrumentation, 'ENABLED', False)
+    assert not instrumentation.can_view_metrics(7)
@@ -0,0 +1,22 @@
+import sqlite3
+
+from migrations import LATEST_VERSION, current_version, migrate
+
+
+def indexes(conn):
+    return {name for name, in conn.execute("SELECT name FROM sqlite_master WHERE type = 'index'")}
+
+
+def test_unused_order_index_is_dropped():
+    conn = sqlite3.connect(":memory:")
+    migrate(conn, target=10)
+    assert "idx_orders_seller_status_total" in indexes(conn)
+    assert migrate(conn) == LATEST_VERSION
+    assert "idx_orders_seller_status_total" not in indexes(conn)
+    # The status-filtered sales pages keep their own index
+    assert "idx_orders_seller_status_date" in indexes(conn)
+
+
+def test_fresh_schema_is_at_latest_version(conn):
+    assert current_version(conn) == LATEST_VERSION
+    assert "idx_orders_seller_status_total" not in indexes(conn)
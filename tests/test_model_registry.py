@@ -0,0 +1,52 @@
+import logging
+import os
+import pickle
+import shutil
+
+import pytest
+
+from fast_inference import COMPILED_PATH, PICKLE_PATH, FertilizerPredictor
+from model_registry import COMPILED, ModelRegistry
+
+
+@pytest.fixture
+def models(tmp_path):
+    """Registry over copies of the fertilizer pickle and its export"""
+    pickle_path = str(tmp_path / 'fertilizer.pkl')
+    compiled_path = str(tmp_path / 'fertilizer.npz')
+    shutil.copy(PICKLE_PATH, pickle_path)
+    shutil.copy(COMPILED_PATH, compiled_path)
+    registry = ModelRegistry({'fertilizer': pickle_path}, check_interval=0,
+                             compiled={'fertilizer': (compiled_path, COMPILED['fertilizer'][1])})
+    return registry, pickle_path, compiled_path
+
+
+def test_export_served_while_built_from_the_pickle(models):
+    registry, _, compiled_path = models
+    assert isinstance(registry.get('fertilizer'), FertilizerPredictor)
+    assert registry.info('fertilizer').path == compiled_path
+
+
+def test_retrained_pickle_wins_over_stale_export(models, caplog):
+    registry, pickle_path, _ = models
+    registry.get('fertilizer')
+    with open(pickle_path, 'rb') as file:
+        pipeline = pickle.load(file)
+    # Same model, new bytes: anything but the exported pickle counts as retrained
+    with open(pickle_path, 'wb') as file:
+        pickle.dump(pipeline, file, protocol=4)
+    stat = os.stat(pickle_path)
+    os.utime(pickle_path, ns=(stat.st_atime_ns, stat.st_mtime_ns + 10**9))
+
+    with caplog.at_level(logging.WARNING, logger='model_registry'):
+        model = registry.get('fertilizer')
+    assert not isinstance(model, FertilizerPredictor)
+    assert registry.info('fertilizer').path == pickle_path
+    assert registry.info('fertilizer').version == 2
+    assert "Not serving fertilizer" in caplog.text
+
+
+def test_export_without_source_checksum_is_refused(models):
+    registry, pickle_path, compiled_path = models
+    FertilizerPredictor.load(COMPILED_PATH, mmap=False).save(compiled_path)
+    assert registry.info('fertilizer').path == pickle_path
@@ -0,0 +1,16 @@
+from concurrent.futures import Future
+
+import orders
+
+
+class StalledWriter:
+    """Writer that queues orders but never commits them"""
+
+    def submit(self, buyer_id, crop_id, quantity):
+        return Future()
+
+
+def test_order_not_committed_in_time_is_reported_as_processing(monkeypatch):
+    monkeypatch.setattr(orders, 'get_writer', StalledWriter)
+    result = orders.place_order(1, 2, 3, timeout=0.01)
+    assert result == orders.OrderResult(orders.PROCESSING, None, None, None)
@@ -0,0 +1,61 @@
+import sqlite3
+
+import pytest
+
+from database import ConnectionPool
+from migrations import migrate
+from price_alerts import AlertEngine
+
+
+@pytest.fixture
+def pool(tmp_path):
+    pool = ConnectionPool(str(tmp_path / "alerts.db"))
+    with pool.connection() as conn:
+        migrate(conn)
+        conn.execute("INSERT INTO users (id, name, phone) VALUES (1, 'Asha', '9000000001')")
+        conn.commit()
+    yield pool
+    pool.close()
+
+
+def test_idle_check_does_not_take_the_write_lock(pool, tmp_path):
+    engine = AlertEngine(pool)
+    other = sqlite3.connect(str(tmp_path / "alerts.db"), timeout=0)
+    other.execute("BEGIN IMMEDIATE")
+    try:
+        with pool.connection() as conn:
+            conn.execute("PRAGMA busy_timeout = 0")
+        # Would fail with "database is locked" if it tried BEGIN IMMEDIATE
+        assert engine.check() == []
+    finally:
+        other.rollback()
+        other.close()
+
+
+def test_check_matches_new_ticks_and_moves_the_watermark(pool):
+    engine = AlertEngine(pool)
+    engine.create_alert(1, 'Rice', 'below', 25.0)
+    with pool.transaction() as conn:
+        conn.execute("INSERT INTO price_history (crop_name, price, market, date) VALUES ('Rice', 20, 'Delhi', '2025-01-01')")
+
+    triggered = engine.check()
+
+    assert [(alert.crop_name, alert.price) for alert in triggered] == [('Rice', 20.0)]
+    with pool.connection() as conn:
+        assert conn.execute("SELECT last_tick_id FROM price_alert_state").fetchone()[0] == \
+            conn.execute("SELECT MAX(id) FROM price_history").fetchone()[0]
+    assert engine.check() == []
+
+
+def test_create_alert_picks_up_alerts_from_other_processes(pool):
+    engine = AlertEngine(pool)
+    engine.create_alert(1, 'Rice', 'above', 90.0)
+    with pool.transaction() as conn:
+        conn.execute("INSERT INTO price_history (crop_name, price, market, date) VALUES ('Rice', 20, 'Delhi', '2025-01-01')")
+    # Loads the book while matching the tick
+    assert engine.check() == []
+    # Inserted behind the engine's back, as another process would
+    with pool.transaction() as conn:
+        conn.execute("INSERT INTO price_alerts (user_id, crop_name, direction, threshold) VALUES (1, 'Rice', 'below', 25)")
+    engine.create_alert(1, 'Wheat', 'above', 40.0)
+    assert len(engine.book) == 3
@@ -0,0 +1,50 @@
+from datetime import date, timedelta
+
+import pytest
+
+from price_analytics import price_trends, refresh_rollup
+
+
+@pytest.fixture
+def prices(conn):
+    start = date(2025, 1, 1)
+    ticks = [(crop, price + day, 'Delhi', (start + timedelta(days=day)).isoformat())
+             for crop, price in [('Rice', 20.0), ('Wheat', 30.0)]
+             for day in range(10)]
+    conn.executemany("INSERT INTO price_history (crop_name, price, market, date) VALUES (?, ?, ?, ?)", ticks)
+    conn.commit()
+    refresh_rollup(conn)
+    return conn
+
+
+def test_price_trends_single_crop(prices):
+    trends = price_trends(prices, ['Rice'], window=3)
+    assert list(trends['crop_name'].unique()) == ['Rice']
+    # Mean of days 7, 8 and 9
+    assert trends['rolling_mean'].iloc[-1] == pytest.approx(28.0)
+    assert trends['rolling_mean'].iloc[0] == pytest.approx(20.0)
+
+
+def test_price_trends_several_crops(prices):
+    trends = price_trends(prices, ['Wheat', 'Rice'], window=3)
+    last = trends.groupby('crop_name')['rolling_mean'].last()
+    assert last['Rice'] == pytest.approx(28.0)
+    assert last['Wheat'] == pytest.approx(38.0)
+    # Windows never mix crops
+    first = trends.groupby('crop_name')['rolling_mean'].first()
+    assert first['Wheat'] == pytest.approx(30.0)
+
+
+@pytest.mark.parametrize('crops', [[], ['Barley']])
+def test_price_trends_no_matching_crop(prices, crops):
+    trends = price_trends(prices, crops)
+    assert trends.empty
+    assert 'rolling_mean' in trends.columns
+
+
+def test_price_trends_only_crop_in_database(conn):
+    conn.execute("INSERT INTO price_history (crop_name, price, market, date) VALUES ('Rice', 20, 'Delhi', '2025-01-01')")
+    conn.commit()
+    refresh_rollup(conn)
+    trends = price_trends(conn, ['Rice'])
+    assert trends['rolling_mean'].tolist() == [20.0]
@@ -0,0 +1,20 @@
+import query_plans
+
+
+def test_hot_queries_use_their_indexes(conn):
+    assert query_plans.check(conn) == {}
+
+
+def test_missing_index_is_reported(conn):
+    conn.execute("DROP INDEX idx_crops_price")
+    failures = query_plans.check(conn)
+    assert set(failures) == {"marketplace price (low to high)", "marketplace price (high to low)"}
+    assert "does not use idx_crops_price" in failures["marketplace price (low to high)"]
+
+
+def test_plans_follow_the_shipped_queries(conn, monkeypatch):
+    import listings
+
+    # A sort the indexes were not built for must show up in the check
+    monkeypatch.setitem(listings.SORTS, "Newest", ("c.harvest_date", "DESC"))
+    assert "does not use idx_crops_created_at" in query_plans.check(conn)["marketplace newest"]
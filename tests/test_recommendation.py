@@ -0,0 +1,19 @@
+import io
+import sys
+
+import pytest
+
+from recommendation import read_sheet
+
+
+@pytest.mark.parametrize("name, package", [("lab.xls", "xlrd"), ("LAB.XLSX", "openpyxl")])
+def test_missing_excel_reader_is_named(monkeypatch, name, package):
+    # A None entry makes the import fail as if the package was not installed
+    monkeypatch.setitem(sys.modules, package, None)
+    with pytest.raises(ValueError, match=f"needs the {package} package"):
+        read_sheet(io.BytesIO(b""), name)
+
+
+def test_csv_is_read_without_excel_readers():
+    sheet = read_sheet(io.BytesIO(b"N,P\n1,2\n"), "lab.csv")
+    assert sheet.to_dict('records') == [{'N': 1, 'P': 2}]
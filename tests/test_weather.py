@@ -0,0 +1,120 @@
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+import pytest
+
+import database
+import weather
+
+
+class StubHandler(BaseHTTPRequestHandler):
+    """OpenWeatherMap stand-in; every payload carries a new temperature"""
+
+    def do_GET(self):
+        server = self.server
+        params = {key: values[0] for key, values in parse_qs(urlparse(self.path).query).items()}
+        with server.lock:
+            server.requests.append(params)
+            temp = len(server.requests)
+        place = params.get('q') or f"{params['lat']},{params['lon']}"
+        status = 500 if place in server.failing else server.status
+        body = (b'{"name": "%s", "main": {"temp": %d, "humidity": 50}, "weather": [{"description": "clear"}]}'
+                % (place.encode(), temp))
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+@pytest.fixture
+def upstream(tmp_path, monkeypatch):
+    server = ThreadingHTTPServer(('127.0.0.1', 0), StubHandler)
+    server.daemon_threads = True
+    server.lock = threading.Lock()
+    server.requests = []
+    server.status = 200
+    server.failing = set()
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    # AGRIMART_WEATHER_URL is read when weather is imported
+    monkeypatch.setattr(weather, 'WEATHER_URL', f"http://127.0.0.1:{server.server_port}/data/2.5/weather")
+    previous = database._pool_path
+    database.use_database(str(tmp_path / 'weather.db'))
+    yield server
+    database.use_database(previous)
+    server.shutdown()
+    server.server_close()
+
+
+def cache_entry(lat, lon, temp, age):
+    key = weather.bucket_key(lat, lon)
+    weather._write_cache(key, {'name': key, 'main': {'temp': temp}}, time.time() - age)
+
+
+def test_nearby_coordinates_share_one_request(upstream):
+    first = weather.get_weather(12.97, 77.59)
+    second = weather.get_weather(12.99, 77.61)
+    assert second == first
+    assert len(upstream.requests) == 1
+    # The bucket centre is what goes upstream
+    assert (upstream.requests[0]['lat'], upstream.requests[0]['lon']) == ('13.0', '77.6')
+
+
+def test_fresh_entry_skips_the_network(upstream):
+    cache_entry(12.97, 77.59, temp=-1, age=weather.CACHE_TTL / 2)
+    assert weather.get_weather(12.97, 77.59)['main']['temp'] == -1
+    assert upstream.requests == []
+
+
+def test_expired_entry_is_refetched_inline(upstream):
+    cache_entry(12.97, 77.59, temp=-1, age=weather.MAX_STALE + 1)
+    assert weather.get_weather(12.97, 77.59)['main']['temp'] == 1
+    assert len(upstream.requests) == 1
+
+
+def test_stale_entry_is_served_while_refreshing(upstream):
+    cache_entry(12.97, 77.59, temp=-1, age=weather.CACHE_TTL + 1)
+    assert weather.get_weather(12.97, 77.59)['main']['temp'] == -1
+
+    deadline = time.monotonic() + 5
+    while weather._read_cache(weather.bucket_key(12.97, 77.59))[0]['main']['temp'] == -1:
+        assert time.monotonic() < deadline, "background refresh never stored a new entry"
+        time.sleep(0.01)
+    assert len(upstream.requests) == 1
+    assert weather.get_weather(12.97, 77.59)['main']['temp'] == 1
+
+
+def test_server_errors_fall_back_to_the_last_good_entry(upstream):
+    upstream.status = 503
+    cache_entry(12.97, 77.59, temp=-1, age=weather.MAX_STALE + 1)
+    assert weather.get_weather(12.97, 77.59)['main']['temp'] == -1
+    assert weather.get_weather(28.61, 77.21) is None
+    assert len(upstream.requests) == 2
+
+
+def test_fetch_many_sources(upstream):
+    cache_entry(12.97, 77.59, temp=-1, age=0)
+    cache_entry(19.07, 72.87, temp=-2, age=weather.CACHE_TTL + 1)
+    upstream.failing = {'19.1,72.9', 'Nowhere'}
+
+    frame = weather.fetch_many([(12.97, 77.59), (12.99, 77.61), (19.07, 72.87), 'Pune', 'Nowhere'], retries=0)
+    sources = dict(zip(frame['location'], frame['source']))
+    assert sources == {
+        '12.97, 77.59': 'cache',
+        '12.99, 77.61': 'cache',
+        '19.07, 72.87': 'stale',
+        'Pune': 'api',
+        'Nowhere': 'error',
+    }
+    temps = dict(zip(frame['location'], frame['temp']))
+    assert temps['19.07, 72.87'] == -2
+    assert frame.loc[frame['location'] == 'Nowhere', 'place'].isna().all()
+    assert sorted(request.get('q', request.get('lat')) for request in upstream.requests) == ['19.1', 'Nowhere', 'Pune']
+    # Only the successful fetch is cached
+    assert weather._read_cache('q:pune')[0]['name'] == 'Pune'
+    assert weather._read_cache('q:nowhere') == (None, None)
@@ -0,0 +1,297 @@
+"""OpenWeatherMap client with a geo-bucketed, SQLite-backed cache
+
+Nearby coordinates share one cache entry. Fresh entries are served as-is;
+stale ones are served immediately while a background thread refreshes them.
+"""
+import json
+import logging
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import requests
+from requests.adapters import HTTPAdapter
+
+from database import get_pool
+
+logger = logging.getLogger(__name__)
+
+WEATHER_URL = os.environ.get('AGRIMART_WEATHER_URL', 'https://api.openweathermap.org/data/2.5/weather')
+API_KEY = os.environ.get('OPENWEATHER_API_KEY', '7e8545f84e0a5f340abc6b9f0e78ef8a')
+REQUEST_TIMEOUT = 5
+
+# Grid size in degrees; 0.1 is roughly 11 km, about one district
+BUCKET_DEGREES = float(os.environ.get('AGRIMART_WEATHER_BUCKET', '0.1'))
+# Entries younger than CACHE_TTL are fresh; up to MAX_STALE they are served
+# while a refresh runs in the background; older ones are refetched inline.
+CACHE_TTL = float(os.environ.get('AGRIMART_WEATHER_TTL', '600'))
+MAX_STALE = float(os.environ.get('AGRIMART_WEATHER_MAX_STALE', '21600'))
+
+HTTP_POOL_SIZE = 16
+
+# Bulk fetches: worker threads, upstream requests per second, and retries
+# (with exponential backoff) for timeouts, 429s and 5xx responses
+BULK_WORKERS = int(os.environ.get('AGRIMART_WEATHER_WORKERS', '8'))
+RATE_LIMIT = float(os.environ.get('AGRIMART_WEATHER_RATE', '10'))
+RETRIES = 3
+RETRY_BACKOFF = 0.5
+
+_session = None
+_session_lock = threading.Lock()
+_refresher = ThreadPoolExecutor(max_workers=4, thread_name_prefix='weather-refresh')
+_refreshing = set()
+_refreshing_lock = threading.Lock()
+
+
+def get_session():
+    """Return the shared HTTP session with pooled keep-alive connections"""
+    global _session
+    if _session is None:
+        with _session_lock:
+            if _session is None:
+                session = requests.Session()
+                adapter = HTTPAdapter(pool_connections=HTTP_POOL_SIZE, pool_maxsize=HTTP_POOL_SIZE)
+                session.mount('http://', adapter)
+                session.mount('https://', adapter)
+                _session = session
+    return _session
+
+
+def bucket(lat, lon, degrees=BUCKET_DEGREES):
+    """Snap coordinates to the centre of their grid cell"""
+    return (round(round(lat / degrees) * degrees, 4), round(round(lon / degrees) * degrees, 4))
+
+
+def bucket_key(lat, lon, degrees=BUCKET_DEGREES):
+    """Cache key shared by every coordinate in the same grid cell"""
+    lat, lon = bucket(lat, lon, degrees)
+    return f"{lat:.4f},{lon:.4f}"
+
+
+class RateLimiter:
+    """Token bucket shared by all bulk fetch workers"""
+
+    def __init__(self, rate, burst=None):
+        self.rate = rate
+        self.capacity = burst or max(1.0, rate)
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+        self.lock = threading.Lock()
+
+    def acquire(self):
+        while True:
+            with self.lock:
+                now = time.monotonic()
+                self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+                self.updated = now
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+                wait = (1 - self.tokens) / self.rate
+            time.sleep(wait)
+
+
+def _request(query, label):
+    """One API call; returns (payload, retryable)"""
+    params = dict(query, appid=API_KEY, units='metric')
+    try:
+        response = get_session().get(WEATHER_URL, params=params, timeout=REQUEST_TIMEOUT)
+    except requests.RequestException as e:
+        # The exception text carries the URL, and with it the API key
+        logger.warning("Weather request for %s failed: %s", label, type(e).__name__)
+        return None, True
+    if response.status_code != 200:
+        logger.warning("Weather request for %s returned HTTP %s", label, response.status_code)
+        return None, response.status_code == 429 or response.status_code >= 500
+    try:
+        return response.json(), False
+    except ValueError:
+        logger.warning("Weather response for %s is not JSON", label)
+        return None, False
+
+
+def _fetch(query, label, retries=0, limiter=None):
+    for attempt in range(retries + 1):
+        if attempt:
+            time.sleep(RETRY_BACKOFF * 2 ** (attempt - 1))
+        if limiter is not None:
+            limiter.acquire()
+        payload, retryable = _request(query, label)
+        if payload is not None or not retryable:
+            return payload
+    return None
+
+
+def fetch_weather(lat, lon, retries=0):
+    """Call the weather API directly; returns the JSON payload or None"""
+    return _fetch({'lat': lat, 'lon': lon}, f"{lat},{lon}", retries)
+
+
+def _read_cache(key):
+    with get_pool().connection() as conn:
+        row = conn.execute("SELECT payload, fetched_at FROM weather_cache WHERE bucket = ?", (key,)).fetchone()
+    if row is None:
+        return None, None
+    return json.loads(row[0]), row[1]
+
+
+def _write_cache(key, payload, fetched_at=None):
+    with get_pool().transaction() as conn:
+        conn.execute("""
+            INSERT INTO weather_cache (bucket, payload, fetched_at) VALUES (?, ?, ?)
+            ON CONFLICT (bucket) DO UPDATE SET payload = excluded.payload, fetched_at = excluded.fetched_at
+        """, (key, json.dumps(payload), time.time() if fetched_at is None else fetched_at))
+
+
+def refresh(lat, lon):
+    """Fetch the bucket containing lat/lon and store it; returns the payload or None"""
+    key = bucket_key(lat, lon)
+    payload = fetch_weather(*bucket(lat, lon))
+    if payload is not None:
+        _write_cache(key, payload)
+    return payload
+
+
+def _refresh_in_background(lat, lon):
+    key = bucket_key(lat, lon)
+    with _refreshing_lock:
+        # One refresh per bucket at a time
+        if key in _refreshing:
+            return
+        _refreshing.add(key)
+
+    def run():
+        try:
+            refresh(lat, lon)
+        except Exception:
+            logger.exception("Background weather refresh for %s failed", key)
+        finally:
+            with _refreshing_lock:
+                _refreshing.discard(key)
+
+    _refresher.submit(run)
+
+
+def get_weather(lat, lon):
+    """Return current weather for lat/lon, from cache when possible"""
+    key = bucket_key(lat, lon)
+    payload, fetched_at = _read_cache(key)
+    if payload is not None:
+        age = time.time() - fetched_at
+        if age < CACHE_TTL:
+            return payload
+        if age < MAX_STALE:
+            _refresh_in_background(lat, lon)
+            return payload
+
+    fresh = refresh(lat, lon)
+    # An old entry beats nothing when the API is down
+    return fresh if fresh is not None else payload
+
+
+def _location_query(location):
+    """Return (cache key, API query, label) for a (lat, lon) pair or a place name"""
+    if isinstance(location, str):
+        name = " ".join(location.split())
+        return f"q:{name.lower()}", {'q': name}, name
+    lat, lon = bucket(float(location[0]), float(location[1]))
+    return bucket_key(lat, lon), {'lat': lat, 'lon': lon}, f"{location[0]},{location[1]}"
+
+
+def _read_many(keys):
+    with get_pool().connection() as conn:
+        rows = conn.execute("""
+            SELECT bucket, payload, fetched_at FROM weather_cache
+            WHERE bucket IN (SELECT value FROM json_each(?))
+        """, (json.dumps(keys),)).fetchall()
+    return {key: (json.loads(payload), fetched_at) for key, payload, fetched_at in rows}
+
+
+def fetch_many(locations, max_workers=BULK_WORKERS, rate=RATE_LIMIT, retries=RETRIES):
+    """Current weather for many locations at once, as a DataFrame
+
+    locations may mix (lat, lon) pairs and place names. Locations in the same
+    bucket share one request, fresh cache entries skip the network entirely,
+    and the rest are fetched concurrently under a shared rate limit.
+    """
+    import pandas as pd
+
+    queries = {}
+    for location in locations:
+        key, query, label = _location_query(location)
+        queries.setdefault(key, (query, label, []))[2].append(location)
+
+    cached = _read_many(list(queries))
+    now = time.time()
+    results = {}
+    to_fetch = []
+    for key in queries:
+        if key in cached and now - cached[key][1] < CACHE_TTL:
+            results[key] = (cached[key][0], 'cache')
+        else:
+            to_fetch.append(key)
+
+    if to_fetch:
+        limiter = RateLimiter(rate)
+
+        def fetch(key):
+            query, label, _ = queries[key]
+            return key, _fetch(query, label, retries, limiter)
+
+        with ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='weather-bulk') as pool:
+            fetched = list(pool.map(fetch, to_fetch))
+
+        fresh = [(key, payload) for key, payload in fetched if payload is not None]
+        if fresh:
+            with get_pool().transaction() as conn:
+                conn.executemany("""
+                    INSERT INTO weather_cache (bucket, payload, fetched_at) VALUES (?, ?, ?)
+                    ON CONFLICT (bucket) DO UPDATE SET payload = excluded.payload, fetched_at = excluded.fetched_at
+                """, [(key, json.dumps(payload), now) for key, payload in fresh])
+
+        for key, payload in fetched:
+            if payload is not None:
+                results[key] = (payload, 'api')
+            elif key in cached:
+                results[key] = (cached[key][0], 'stale')
+            else:
+                results[key] = (None, 'error')
+
+    rows = []
+    for key, (_, _, requested) in queries.items():
+        payload, source = results[key]
+        payload = payload or {}
+        main = payload.get('main', {})
+        for location in requested:
+            rows.append({
+                'location': location if isinstance(location, str) else f"{location[0]}, {location[1]}",
+                'place': payload.get('name'),
+                'temp': main.get('temp'),
+                'feels_like': main.get('feels_like'),
+                'humidity': main.get('humidity'),
+                'pressure': main.get('pressure'),
+                'wind_speed': payload.get('wind', {}).get('speed'),
+                'description': (payload.get('weather') or [{}])[0].get('description'),
+                'source': source,
+            })
+    return pd.DataFrame(rows, columns=['location', 'place', 'temp', 'feels_like', 'humidity',
+                                       'pressure', 'wind_speed', 'description', 'source'])
+
+
+def parse_locations(text):
+    """Parse one location per line: 'lat, lon' or a place name"""
+    locations = []
+    for line in text.splitlines():
+        line = line.strip()
+        if not line:
+            continue
+        parts = [part.strip() for part in line.split(',')]
+        try:
+            if len(parts) == 2:
+                locations.append((float(parts[0]), float(parts[1])))
+                continue
+        except ValueError:
+            pass
+        locations.append(line)
+    return locations